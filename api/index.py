@@ -1,31 +1,86 @@
 import os
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
-from .sunsave.simulate import calculate_daily_solar_generation
-from .sunsave.dispatch import run_dispatch_simulation
+# Route modules are imported inside their handlers: a cold serverless
+# start then only pays for the route it serves, and the summary /
+# columnar paths (pipeline, profiles, kernels) never load pandas.
+from .sunsave.pipeline import UpstreamTimeout
+from .sunsave.upstream import UpstreamError
+from .sunsave import metrics, response_cache
+from .sunsave.encoding import install_gzip, ndjson
 #from .sunsave.octopus_prices import agile_prices as get_current_agile_prices
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
+metrics.instrument(app)
+install_gzip(app)
 
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your_super_secret_key_here")
 
+
+@app.errorhandler(UpstreamTimeout)
+def upstream_timeout(e):
+    return jsonify({"error": str(e), "stage": e.stage}), 504
+
+
+@app.errorhandler(UpstreamError)
+def upstream_error(e):
+    # postcodes.io 404 → the user typed a bad postcode
+    status = 400 if e.status in (400, 404) else 502
+    return jsonify({"error": str(e), "upstream": e.host}), status
+
+
+def _demand():
+    """
+    Household load: ``profile`` / ``annual_kwh`` query parameters, or a
+    smart-meter CSV POSTed as the body or as a ``file`` form part.
+    """
+    from .sunsave.demand import demand_from
+    csv = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        csv = upload.read() if upload else request.get_data()
+    return demand_from(request.args.get("profile"),
+                       request.args.get("annual_kwh", type=float), csv)
+
+
+def _with_planes(args: dict):
+    """
+    Roof planes from ``planes=kwp:tilt:azim,…`` (e.g. an east/west pair
+    ``3:35:-90,3:35:90``), or None for one south-facing ``kwp`` array.
+    Given planes, ``args["kwp"]`` becomes their total.
+    """
+    text = request.args.get("planes")
+    if not text:
+        return None
+    from .sunsave.profiles import parse_planes
+    planes = parse_planes(text)
+    args["kwp"] = sum(p.kwp for p in planes)
+    return planes
+
 # ----------  API ROUTES  ----------
 
 @app.get("/api/simulate")
+@response_cache.cached()
 def simulate():
-    postcode = request.args.get("postcode")
-    kwp      = request.args.get("kwp", type=float)
-
-    if postcode is None or kwp is None:
-        return jsonify({"error": "postcode and kwp are required"}), 400
+    args = {"postcode": request.args.get("postcode"),
+            "kwp":      request.args.get("kwp", type=float)}
+    try:
+        planes = _with_planes(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if None in args.values():
+        return jsonify({"error": "postcode and kwp (or planes) are required"}), 400
 
-    daily_kwh = calculate_daily_solar_generation(postcode, kwp)
+    from .sunsave.simulate import calculate_daily_solar_generation
+    daily_kwh = calculate_daily_solar_generation(**args, planes=planes)
     return jsonify({"daily_kwh": daily_kwh})
 
 
-@app.get("/api/dispatch")
+@app.route("/api/dispatch", methods=["GET", "POST"])   # POST: smart-meter CSV body
+@response_cache.cached(bypass=lambda: request.args.get("format") == "ndjson")
 def dispatch():
     args = {
         "postcode": request.args.get("postcode"),
@@ -34,12 +89,240 @@ def dispatch():
         "pow_kw":   request.args.get("pow_kw",   type=float),
         "eta":      request.args.get("eta",      type=float),
     }
+    try:
+        planes = _with_planes(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     missing = [k for k, v in args.items() if v is None]
     if missing:
         return jsonify({"error": f"Missing query param(s): {', '.join(missing)}"}), 400
 
-    results = run_dispatch_simulation(**args)   # wrapper does PV + prices + dispatch
-    return jsonify(results)
+    strategy = request.args.get("strategy", "greedy")   # or "optimal"
+    mode     = request.args.get("mode", "day")
+    annual   = mode == "annual"
+    if mode == "ensemble":
+        # P10/P50/P90 over every SARAH-3 weather year (years=2010:2023 to narrow)
+        from .sunsave.ensemble import YEARS, run_ensemble
+        from .sunsave.sweep import parse_axis
+        try:
+            years = parse_axis(request.args.get("years", f"{YEARS[0]}:{YEARS[-1]}:1"))
+            return jsonify(run_ensemble(
+                **args, years=years, tariff=request.args.get("tariff", "agile"),
+                strategy=strategy, demand=_demand(), planes=planes))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    stream   = request.args.get("format") == "ndjson"
+    # records (day default) | columns (ndjson default) | summary (annual default)
+    detail   = request.args.get("detail", "columns" if stream else
+                                          "summary" if annual else "records")
+    decimals = request.args.get("decimals", type=int)
+    if stream and detail == "records":
+        return jsonify({"error": "format=ndjson needs detail=columns or detail=summary"}), 400
+
+    try:
+        demand = _demand()
+        if annual:
+            from .sunsave.annual import run_annual_simulation
+            # whole SARAH year, SOC carried across midnight
+            results = run_annual_simulation(
+                **args, tariff=request.args.get("tariff", "agile"), strategy=strategy,
+                detail=detail, decimals=decimals, demand=demand, planes=planes)
+        else:
+            from .sunsave.dispatch import run_dispatch_simulation
+            results = run_dispatch_simulation(   # PV + prices + dispatch
+                **args, strategy=strategy, detail=detail, decimals=decimals,
+                demand=demand, planes=planes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if stream:
+        # summary line first, then the slots a week at a time
+        cols = results.pop("slots" if annual else "frame", None)
+        return Response(stream_with_context(ndjson(results, cols)),
+                        mimetype="application/x-ndjson")
+    with metrics.stage("serialise"):
+        return jsonify(results)
+
+
+@app.route("/api/site", methods=["GET", "POST"])
+@response_cache.cached()
+def site():
+    """
+    Generation summary and dispatch economics in one call – one geocode
+    and one PVGIS series instead of /api/simulate + /api/dispatch.
+    """
+    args = {
+        "postcode": request.args.get("postcode"),
+        "kwp":      request.args.get("kwp",      type=float),
+        "cap_kwh":  request.args.get("cap_kwh",  type=float),
+        "pow_kw":   request.args.get("pow_kw",   type=float),
+        "eta":      request.args.get("eta",      type=float),
+    }
+    try:
+        planes = _with_planes(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    missing = [k for k, v in args.items() if v is None]
+    if missing:
+        return jsonify({"error": f"Missing query param(s): {', '.join(missing)}"}), 400
+
+    from .sunsave.summary import run_site_summary
+    try:
+        summary = run_site_summary(**args, strategy=request.args.get("strategy", "greedy"),
+                                   tariff=request.args.get("tariff", "agile"),
+                                   demand=_demand(), planes=planes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(summary)
+
+
+@app.get("/api/tariffs")
+@response_cache.cached()
+def tariffs():
+    """
+    One day's bills with and without the battery under each tariff
+    (``tariffs=agile,flat,go`` – default: the whole catalogue).
+    """
+    args = {
+        "postcode": request.args.get("postcode"),
+        "kwp":      request.args.get("kwp",      type=float),
+        "cap_kwh":  request.args.get("cap_kwh",  type=float),
+        "pow_kw":   request.args.get("pow_kw",   type=float),
+        "eta":      request.args.get("eta",      type=float),
+    }
+    try:
+        planes = _with_planes(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    missing = [k for k, v in args.items() if v is None]
+    if missing:
+        return jsonify({"error": f"Missing query param(s): {', '.join(missing)}"}), 400
+
+    from .sunsave.tariffs import run_tariff_comparison
+    names = [n.strip() for n in request.args.get("tariffs", "").split(",") if n.strip()]
+    try:
+        return jsonify(run_tariff_comparison(
+            **args, tariffs=names,
+            strategy=request.args.get("strategy", "greedy"), demand=_demand(),
+            planes=planes))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.post("/api/dispatch/batch")
+def dispatch_batch():
+    """
+    Portfolio run.  Body: ``{"rows": [{"postcode", "kwp", "cap_kwh",
+    "pow_kw", "eta", "strategy", "profile", "annual_kwh", "planes"}, ...]}``.
+    Streams one NDJSON line per row as results finish; each line carries
+    its ``row`` index.  Inputs are fetched before the stream starts, so
+    upstream failures still get their 502 / 504.
+    """
+    body = request.get_json(silent=True) or {}
+    rows = body.get("rows") if isinstance(body, dict) else body
+    from .sunsave.batch import run_batch
+    try:
+        # workers: optional int, 1 → in-process (bounded by SUNSAVE_MAX_WORKERS)
+        results = run_batch(rows, workers=body.get("workers") if isinstance(body, dict) else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    lines = (json.dumps(r) + "\n" for r in results)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+@app.get("/api/sweep")
+@response_cache.cached()
+def sweep():
+    """
+    Savings surface over battery sizes.  cap_kwh / pow_kw / eta each take
+    a list ("5,10,13.5") or an inclusive range ("5:15:1").
+    """
+    args = {"postcode": request.args.get("postcode"),
+            "kwp":      request.args.get("kwp", type=float)}
+    try:
+        planes = _with_planes(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if None in args.values():
+        return jsonify({"error": "postcode and kwp (or planes) are required"}), 400
+
+    from .sunsave.sweep import parse_axis, run_sweep
+    try:
+        axes = {name: parse_axis(request.args.get(name, default))
+                for name, default in (("cap_kwh", "5"), ("pow_kw", "3"), ("eta", "0.92"))}
+        return jsonify(run_sweep(**args, **axes, demand=_demand(), planes=planes))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.post("/api/rolling/sites")
+def rolling_register():
+    """
+    Register (or update) a real battery for rolling-horizon planning.
+    Body: a batch row plus ``site_id`` and optional ``soc_kwh``.  The
+    site is planned at once; the reply is its schedule.
+    """
+    from .sunsave import rolling
+    try:
+        site_id = rolling.register(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rolling.replan([site_id])
+    return jsonify(rolling.schedule(site_id, decimals=request.args.get("decimals", type=int)))
+
+
+@app.post("/api/rolling/soc")
+def rolling_soc():
+    """Measured SOC: ``{"site_id", "soc_kwh"}``; replans that site from it."""
+    from .sunsave import rolling
+    body = request.get_json(silent=True) or {}
+    try:
+        rolling.report_soc(str(body["site_id"]), float(body["soc_kwh"]))
+    except KeyError:
+        return jsonify({"error": "unknown site_id (or missing site_id / soc_kwh)"}), 404
+    except (TypeError, ValueError):
+        return jsonify({"error": "soc_kwh must be a number"}), 400
+    rolling.replan([str(body["site_id"])])
+    return jsonify(rolling.schedule(str(body["site_id"]),
+                                    decimals=request.args.get("decimals", type=int)))
+
+
+@app.post("/api/rolling/replan")
+def rolling_replan():
+    """
+    Replan ``{"sites": [...]}`` (default: every site) from the current
+    slot.  Publication-driven replans belong to the standalone
+    ``python -m api.sunsave.rolling watch`` worker, not to this process.
+    """
+    from .sunsave import rolling
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    sites = body.get("sites")
+    if sites is not None and not (isinstance(sites, list)
+                                  and all(isinstance(x, str) for x in sites)):
+        return jsonify({"error": "sites must be a list of site_id strings"}), 400
+    try:
+        return jsonify(rolling.replan(sites, workers=body.get("workers")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.get("/api/rolling/schedule")
+def rolling_schedule():
+    """The remaining plan for ``site_id`` in :func:`encoding.columns` form."""
+    from .sunsave import rolling
+    try:
+        return jsonify(rolling.schedule(request.args.get("site_id", ""),
+                                        decimals=request.args.get("decimals", type=int)))
+    except KeyError:
+        return jsonify({"error": "unknown site_id"}), 404
+
+
+@app.get("/api/metrics")
+def metrics_endpoint():
+    """Prometheus text: stage/route histograms, cache and upstream counters."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
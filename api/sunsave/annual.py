@@ -0,0 +1,172 @@
+"""
+Full-year continuous dispatch – the whole SARAH year in one kernel run.
+
+Unlike the one-day view, state of charge carries across midnight, so an
+evening's leftover charge is there for the next morning and an empty
+winter battery stays empty.  PVGIS hourly kWh are split into half-hours
+(8,760 → 17,520 slots) and fed through :func:`dispatch.dispatch_arrays`,
+then rolled up into monthly and annual totals.
+"""
+
+from __future__ import annotations
+
+import calendar
+import datetime as dt
+import logging
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from . import encoding, price_archive
+from .demand import DEFAULT as DEFAULT_DEMAND, Demand
+from .dispatch import BatteryCfg, engine
+from .geo import resolve
+from .octopus_prices import PricesUnavailable, agile_prices, mock_prices
+from .profiles import Plane
+from .simulate import hourly_generation_series
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+MONTH_FIELDS = ("pv_kwh", "import_kwh", "export_kwh", "kwh_shifted",
+                "baseline_cost", "with_batt_cost", "money_saved")
+
+
+def _slot_of_day(index: pd.DatetimeIndex) -> np.ndarray:
+    return index.hour.to_numpy() * 2 + index.minute.to_numpy() // 30
+
+
+def _align_year(values: np.ndarray, year: int, index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Calendar-*year* half-hours read at *index*'s month, day and time of
+    day.  Whichever side is a leap year, 29 February is dropped (or read
+    from the 28th) instead of shifting every later day.
+    """
+    first = np.cumsum([0] + [calendar.monthrange(year, m)[1] for m in range(1, 12)])
+    month, day = index.month.to_numpy(), index.day.to_numpy()
+    if not calendar.isleap(year):
+        day = np.where((month == 2) & (day == 29), 28, day)
+    doy = first[month - 1] + day - 1
+    return values[doy * 48 + _slot_of_day(index)]
+
+
+def _year_prices(index: pd.DatetimeIndex, region: str, tariff: str) -> tuple[np.ndarray, str]:
+    """
+    Half-hourly £/kWh for every slot of *index*.
+
+    ``agile``  – the latest complete calendar year in the price archive,
+                 laid over the PV year by date and time of day; failing
+                 that, today's Agile day repeated across the year
+    ``mock``   – the 3-tier mock tariff
+    """
+    if tariff == "agile":
+        this_year = dt.date.today().year
+        for year in (this_year - 1, this_year - 2):
+            archived = price_archive.calendar_year(region, year)
+            if archived is not None:
+                return _align_year(archived, year, index), f"agile_archive_{year}"
+        try:
+            day = agile_prices(dt.date.today(), region=region)
+            if not day.isna().any():
+                return day.to_numpy()[_slot_of_day(index)], "agile_today_repeated"
+        except PricesUnavailable as e:
+            log.warning("Agile unavailable (%s) – using mock prices.", e)
+    return mock_prices(index).to_numpy(), "mock"
+
+
+def annual_arrays(
+    pv: np.ndarray,
+    prices: np.ndarray,
+    months: np.ndarray,
+    battery: BatteryCfg,
+    demand: np.ndarray | None = None,
+    dt_h: float = 0.5,
+    strategy: str = "greedy",
+) -> dict:
+    """
+    Continuous dispatch over *pv*/*prices* (any length) with month labels
+    1–12 per slot.  Returns per-month arrays (length 12), annual sums and
+    the slot-level flows.
+    """
+    demand = np.zeros_like(pv) if demand is None else demand
+    res = engine(strategy)(pv, prices, demand, battery.cap_kwh, battery.pow_kw,
+                           battery.eta, dt_h=dt_h)
+
+    soc = res["soc_kwh"]
+    soc_prev = np.concatenate(([0.0], soc[:-1]))
+    slot = {
+        "pv_kwh":         pv,
+        "import_kwh":     res["import_grid"],
+        "export_kwh":     res["export_grid"],
+        "kwh_shifted":    np.maximum(soc_prev - soc, 0.0),     # SOC drawn down
+        "baseline_cost":  (demand - pv) * prices,
+        "with_batt_cost": (res["import_grid"] - res["export_grid"]) * prices,
+    }
+    slot["money_saved"] = slot["baseline_cost"] - slot["with_batt_cost"]
+
+    m = months.astype(np.intp) - 1
+    monthly = {k: np.bincount(m, weights=v, minlength=12) for k, v in slot.items()}
+    annual  = {k: float(v.sum()) for k, v in monthly.items()}
+    annual["end_soc_kwh"] = float(soc[-1]) if len(soc) else 0.0
+    slots = {"pv_kwh": pv, "demand_kwh": demand, "import_grid": res["import_grid"],
+             "export_grid": res["export_grid"], "soc_kwh": soc}
+    return {"monthly": monthly, "annual": annual, "slots": slots}
+
+
+def run_annual_simulation(
+    postcode: str,
+    kwp: float,
+    cap_kwh: float,
+    pow_kw: float,
+    eta: float = BatteryCfg().eta,
+    *,
+    year: int = 2023,
+    tariff: str = "agile",
+    strategy: str = "greedy",
+    detail: str = "summary",
+    decimals: int | None = None,
+    demand: Demand | None = None,
+    planes: Sequence[Plane] | None = None,
+) -> dict:
+    """
+    JSON-ready annual economics for one site and battery.  With
+    ``detail="columns"`` the 17,520 slot-level flows are added as
+    ``slots`` in :func:`encoding.columns` form ("records" is refused –
+    a year of per-row dicts is what the columnar form replaces).
+    """
+    battery = BatteryCfg(cap_kwh, pow_kw, eta)
+    if cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
+        raise ValueError("cap_kwh>0, pow_kw>0, 0<eta≤1")
+    if encoding.check_detail(detail) == "records":
+        raise ValueError("annual mode supports detail=summary or detail=columns")
+    engine(strategy)
+
+    site = resolve(postcode)
+    hourly = hourly_generation_series(site.lat, site.lon, kwp, year=year, planes=planes)
+
+    half_idx = pd.date_range(hourly.index[0], periods=2 * len(hourly),
+                             freq="30min", tz="UTC")
+    pv = np.repeat(hourly.to_numpy() / 2.0, 2)        # split each kWh in half
+    prices, price_basis = _year_prices(half_idx, site.region, tariff)
+
+    demand = demand or DEFAULT_DEMAND
+    load = demand.year(year)
+    out = annual_arrays(pv, prices, half_idx.month.to_numpy(), battery,
+                        demand=load, strategy=strategy)
+    result = {
+        "year": year,
+        "strategy": strategy,
+        "price_basis": price_basis,
+        "battery": {"cap_kwh": cap_kwh, "pow_kw": pow_kw, "eta": eta},
+        "demand": demand.describe(),
+        "annual": out["annual"],
+        "monthly": [
+            {"month": i + 1, **{k: float(out["monthly"][k][i]) for k in MONTH_FIELDS}}
+            for i in range(12)
+        ],
+    }
+    if detail == "columns":
+        result["slots"] = encoding.columns(int(half_idx[0].timestamp()), 1800,
+                                           {**out["slots"], "price": prices}, decimals)
+    return result
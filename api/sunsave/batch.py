@@ -0,0 +1,236 @@
+"""
+Portfolio batch dispatch – hundreds of properties in one request.
+
+Rows share most of their inputs, so work is grouped before anything is
+fetched:
+
+    postcodes ─► one bulk postcodes.io lookup
+    region    ─► one Agile price vector per region
+    site      ─► one 1 kWp PV profile per rounded location and roof
+                 orientation (pv_cache key), weighted by each row's kWp
+    demand    ─► one day of load per (profile, annual_kwh)
+
+Distinct inputs are fetched concurrently on the pipeline thread pool,
+then the dispatch runs are chunked across a process pool and results are
+yielded as each chunk finishes.  Cost grows with distinct sites and
+cores, not with the number of rows.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import scheduler
+from .demand import demand_from
+from .dispatch import BatteryCfg, engine
+from .geo import normalise, resolve_many
+from .pipeline import STAGE_TIMEOUTS, _wait, fetch_pool, price_array_or_mock
+from .profiles import (DEFAULT_RAD_DB, Plane, check_planes, day_slice_array, orientations,
+                       parse_planes, plane_weights, unit_profile)
+from .pv_cache import profile_key
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+MAX_ROWS   = 5000
+CHUNK_ROWS = 32                       # rows per process-pool task
+PV_YEAR    = 2023
+BUDGET_S   = 120.0                    # all input fetches, many sites
+
+MAX_WORKERS = int(os.environ.get("SUNSAVE_MAX_WORKERS", os.cpu_count() or 1))
+
+_procs: Dict[int, ProcessPoolExecutor] = {}      # one pool per size asked for
+
+
+def check_workers(workers) -> Optional[int]:
+    """*workers* as given by a client: None, or an int in 1–MAX_WORKERS."""
+    if workers is None:
+        return None
+    if isinstance(workers, bool) or not isinstance(workers, int) \
+            or not 1 <= workers <= MAX_WORKERS:
+        raise ValueError(f"workers must be an integer 1–{MAX_WORKERS}")
+    return workers
+
+
+def _process_pool(workers: Optional[int]) -> Optional[ProcessPoolExecutor]:
+    size = check_workers(workers) or MAX_WORKERS
+    if size <= 1:
+        return None
+    if size not in _procs:
+        try:
+            _procs[size] = ProcessPoolExecutor(max_workers=size)
+        except (OSError, NotImplementedError) as e:     # e.g. no /dev/shm on serverless
+            log.warning("Process pool unavailable (%s) – dispatching in-process.", e)
+            return None
+    return _procs[size]
+
+
+# ─── worker side ─────────────────────────────────────────
+def _dispatch_chunk(tasks: List[Tuple[int, np.ndarray, np.ndarray, np.ndarray, tuple, str]]
+                    ) -> List[dict]:
+    """Runs in a worker process: one summary dict per task."""
+    out = []
+    for row, pv, prices, demand, (cap_kwh, pow_kw, eta), strategy in tasks:
+        try:
+            res = engine(strategy)(pv, prices, demand, cap_kwh, pow_kw, eta)
+        except ValueError as e:
+            out.append({"row": row, "error": str(e)})
+            continue
+        out.append({
+            "row": row,
+            "baseline_cost":  res["baseline_cost"],
+            "with_batt_cost": res["with_batt_cost"],
+            "money_saved":    res["money_saved"],
+            "kwh_shifted":    res["kwh_shifted"],
+        })
+    return out
+
+
+# ─── request side ────────────────────────────────────────
+def _row_planes(raw: dict) -> List[Plane]:
+    """``planes`` as "kwp:tilt:azim,…" or a list of {kwp, tilt, azim}; else kwp."""
+    planes = raw.get("planes")
+    if planes is None:
+        return [Plane(float(raw["kwp"]))]
+    if isinstance(planes, str):
+        return parse_planes(planes)
+    planes = [Plane(**{k: float(v) for k, v in p.items()}) for p in planes]
+    check_planes(planes)
+    return planes
+
+
+def _parse_row(i: int, raw: dict) -> dict:
+    try:
+        row = {
+            "postcode": normalise(str(raw["postcode"])),
+            "planes":   _row_planes(raw),
+            "battery":  (float(raw.get("cap_kwh", BatteryCfg().cap_kwh)),
+                         float(raw.get("pow_kw",  BatteryCfg().pow_kw)),
+                         float(raw.get("eta",     BatteryCfg().eta))),
+            "strategy": str(raw.get("strategy", "greedy")),
+            "demand":   (None if raw.get("profile") is None else str(raw["profile"]),
+                         None if raw.get("annual_kwh") is None else float(raw["annual_kwh"])),
+        }
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"row {i}: need postcode and kwp or planes ({e})") from None
+    try:
+        engine(row["strategy"])
+        demand_from(*row["demand"])
+    except ValueError as e:
+        raise ValueError(f"row {i}: {e}") from None
+    return row
+
+
+def run_batch(raw_rows: List[dict], *, when: Optional[dt.date] = None,
+              workers: Optional[int] = None) -> Iterator[dict]:
+    """
+    Iterator over one result dict per row (tagged with its ``row`` index)
+    in completion order.  Rows that cannot be served yield
+    ``{"row", "error"}``.
+
+    Geocoding and the PV / price fetches happen here, before the iterator
+    is returned, each bounded by the pipeline's ``STAGE_TIMEOUTS`` within
+    ``BUDGET_S``.  A malformed batch raises ``ValueError``; a geocode or
+    price failure raises ``UpstreamError`` / ``UpstreamTimeout`` while the
+    caller can still answer with a status code.  A PV profile that fails
+    or times out only fails its rows.  Only the dispatch runs are
+    streamed.
+    """
+    if not isinstance(raw_rows, list) or not 0 < len(raw_rows) <= MAX_ROWS:
+        raise ValueError(f"rows must be a list of 1–{MAX_ROWS} objects")
+    workers = check_workers(workers)
+    errors, tasks, meta = _gather(raw_rows, when or dt.date.today())
+    return _run(errors, tasks, meta, workers)
+
+
+def _gather(raw_rows: List[dict], when: dt.date
+            ) -> Tuple[List[dict], List[tuple], Dict[int, dict]]:
+    """``(error lines, dispatch tasks, per-row meta)`` for :func:`_run`."""
+    deadline = time.monotonic() + BUDGET_S
+    errors: List[dict] = []
+    rows: Dict[int, dict] = {}
+    for i, raw in enumerate(raw_rows):
+        try:
+            rows[i] = _parse_row(i, raw)
+        except ValueError as e:
+            errors.append({"row": i, "error": str(e)})
+
+    # 1) one bulk geocode for all postcodes – below interactive traffic
+    postcodes = [r["postcode"] for r in rows.values()]
+    sites = _wait(fetch_pool.submit(scheduler.in_lane("batch", resolve_many), postcodes),
+                  "geocode", deadline, STAGE_TIMEOUTS)
+
+    # 2) distinct PV profiles and price vectors, fetched concurrently
+    pv_jobs: Dict[tuple, Future] = {}
+    price_jobs: Dict[str, Future] = {}
+    for i, r in list(rows.items()):
+        site = sites.get(r["postcode"])
+        if site is None:
+            del rows[i]
+            errors.append({"row": i, "error": f"unknown postcode {r['postcode']}"})
+            continue
+        r["pv_keys"] = [profile_key(site.lat, site.lon, *o, PV_YEAR, DEFAULT_RAD_DB)
+                        for o in orientations(r["planes"])]
+        r["region"] = site.region
+        for key in r["pv_keys"]:
+            if key not in pv_jobs:
+                pv_jobs[key] = fetch_pool.submit(scheduler.in_lane("batch", unit_profile),
+                                                 *key[:4], year=PV_YEAR)
+        if site.region not in price_jobs:
+            price_jobs[site.region] = fetch_pool.submit(
+                scheduler.in_lane("batch", price_array_or_mock), when, site.region)
+
+    try:
+        prices: Dict[str, tuple] = {region: _wait(fut, "prices", deadline, STAGE_TIMEOUTS)
+                                    for region, fut in price_jobs.items()}
+    except BaseException:
+        for fut in (*pv_jobs.values(), *price_jobs.values()):
+            fut.cancel()
+        raise
+    unit_pv: Dict[tuple, np.ndarray] = {}
+    for key, fut in pv_jobs.items():
+        try:
+            unit_pv[key] = day_slice_array(_wait(fut, "pvgis", deadline, STAGE_TIMEOUTS),
+                                           PV_YEAR, when)
+        except Exception as e:
+            unit_pv[key] = e                                     # reported per row
+
+    # 3) one dispatch task per servable row
+    tasks, meta = [], {}
+    loads: Dict[tuple, np.ndarray] = {}
+    for i, r in rows.items():
+        units = [unit_pv[key] for key in r["pv_keys"]]
+        failed = next((u for u in units if isinstance(u, Exception)), None)
+        if failed is not None:
+            errors.append({"row": i, "error": f"PV unavailable: {failed}"})
+            continue
+        pv = plane_weights(r["planes"], orientations(r["planes"])) @ np.stack(units)
+        price, fallback = prices[r["region"]]
+        if r["demand"] not in loads:
+            loads[r["demand"]] = demand_from(*r["demand"]).day(when)
+        tasks.append((i, pv, price, loads[r["demand"]], r["battery"],
+                      r["strategy"]))
+        meta[i] = {"postcode": r["postcode"], "region": r["region"], "fallback": fallback}
+    return errors, tasks, meta
+
+
+def _run(errors: List[dict], tasks: List[tuple], meta: Dict[int, dict],
+         workers: Optional[int]) -> Iterator[dict]:
+    yield from errors
+    chunks = [tasks[k:k + CHUNK_ROWS] for k in range(0, len(tasks), CHUNK_ROWS)]
+    pool = _process_pool(workers)
+    if pool is None or len(chunks) <= 1:
+        done = (_dispatch_chunk(c) for c in chunks)
+    else:
+        done = (f.result() for f in as_completed([pool.submit(_dispatch_chunk, c)
+                                                  for c in chunks]))
+    for results in done:
+        for res in results:
+            yield {**meta[res["row"]], **res}
@@ -0,0 +1,341 @@
+"""
+Household demand – standard UK load shapes or the customer's own meter.
+
+Library
+-------
+``data/load_profiles.npy`` holds one float32 array
+
+    [profile class, season, day type, 48 local half-hours]
+
+for three classes (``domestic`` ≈ Elexon PC1, ``economy7`` ≈ PC2 with
+night storage heating, ``business`` ≈ PC3), five Elexon-style seasons
+(winter, spring, summer, high summer, autumn) and three day types
+(weekday, Saturday, Sunday).  Shapes are relative; a profile is laid over
+a calendar year and scaled so the year sums to the customer's annual kWh
+(``DEFAULT_ANNUAL_KWH`` – Ofgem's typical domestic use – if not given).
+Profile ``none`` is zero demand – the PV-only economics of old.
+Rebuild the file with ``python -m api.sunsave.demand build``.
+
+Upload
+------
+:func:`parse_csv` reads a half-hourly (or 15-min / hourly) smart-meter
+export – Octopus "Consumption (kWh), Start, End", n3rgy/Glow
+"timestamp,value" and similar – into a typical 365-day year of UTC
+half-hours.  Days missing from the upload are filled from the same
+half-hour's average in that month (then across the upload).  A full year
+of 17,520 rows parses in a few tens of milliseconds, so it runs inline.
+
+Every slot array here is UTC half-hours, like the PV and price arrays.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import io
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .price_store import utc_offset_slots
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+PROFILES  = ("domestic", "economy7", "business")
+ALIASES   = {"pc1": "domestic", "pc2": "economy7", "pc3": "business"}
+SEASONS   = ("winter", "spring", "summer", "high_summer", "autumn")
+DAY_TYPES = ("weekday", "saturday", "sunday")
+NO_DEMAND = "none"                          # PV-only, as before profiles existed
+DEFAULT_PROFILE    = "domestic"
+DEFAULT_ANNUAL_KWH = 2700.0                 # Ofgem TDCV, medium domestic
+REFERENCE_YEAR     = 2023                   # calendar used for the 365-day year
+DAYS = 365
+MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+MAX_UPLOAD_BYTES = 8 * 2**20
+
+LIBRARY_PATH = Path(os.environ.get(
+    "SUNSAVE_LOAD_PROFILES", Path(__file__).with_name("data") / "load_profiles.npy"))
+
+
+# ─── library ─────────────────────────────────────────────
+def build_library() -> np.ndarray:
+    """
+    Synthesise the relative shapes: a base load plus morning, midday and
+    evening peaks whose height, timing and width move with season and day
+    type; E7 adds a night heating block, business a working-hours plateau.
+    """
+    h = (np.arange(48) + 0.5) / 2                            # local hour, slot centre
+
+    def bump(centre, width, height):
+        return height * np.exp(-0.5 * ((h - centre) / width) ** 2)
+
+    def plateau(start, end, height, edge=0.5):
+        return height / ((1 + np.exp(-(h - start) / edge)) * (1 + np.exp((h - end) / edge)))
+
+    # per season: overall level, evening peak height, evening centre (lighting)
+    season_shape = {"winter": (1.25, 0.75, 18.0), "spring": (1.0, 0.55, 18.75),
+                    "summer": (0.85, 0.45, 19.5), "high_summer": (0.8, 0.42, 19.75),
+                    "autumn": (1.0, 0.6, 18.5)}
+    night_heat = {"winter": 1.0, "spring": 0.5, "summer": 0.15,
+                  "high_summer": 0.12, "autumn": 0.5}
+
+    lib = np.zeros((len(PROFILES), len(SEASONS), len(DAY_TYPES), 48), dtype=np.float32)
+    for s, season in enumerate(SEASONS):
+        level, evening, eve_at = season_shape[season]
+        for d, day in enumerate(DAY_TYPES):
+            weekend = day != "weekday"
+            base = 0.18 * np.where((h >= 1) & (h < 5.5), 0.7, 1.0)
+            home = (base
+                    + bump(9.0 if weekend else 7.5, 1.5 if weekend else 1.0, 0.25)
+                    + bump(13.0, 2.5, 0.3 if day == "sunday" else 0.22 if weekend else 0.1)
+                    + bump(eve_at, 2.0, evening)
+                    + bump(21.5, 1.5, 0.2))
+            lib[0, s, d] = level * home
+            lib[1, s, d] = 0.8 * level * home + plateau(0.5, 7.5, 1.2 * night_heat[season])
+            work = {"weekday": plateau(8, 18, 0.8), "saturday": plateau(9, 13, 0.35),
+                    "sunday": 0.0}[day]
+            lib[2, s, d] = (1.15 if season == "winter" else 1.0) * (0.15 + work)
+    return lib
+
+
+@lru_cache(maxsize=1)
+def library() -> np.ndarray:
+    try:
+        lib = np.load(LIBRARY_PATH, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        log.warning("Load profile library unavailable (%s) – synthesising it.", e)
+        lib = build_library()
+    lib.flags.writeable = False
+    return lib
+
+
+def profile_index(profile: str) -> int:
+    name = ALIASES.get(profile.lower(), profile.lower())
+    if name not in PROFILES:
+        raise ValueError(f"profile must be one of {', '.join(PROFILES + (NO_DEMAND,))}")
+    return PROFILES.index(name)
+
+
+# ─── calendar ────────────────────────────────────────────
+def _season(month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    mid = day >= 15
+    return np.select(
+        [np.isin(month, (11, 12, 1, 2)),
+         np.isin(month, (3, 4)) | ((month == 5) & ~mid),
+         ((month == 5) & mid) | (month == 6) | ((month == 7) & ~mid),
+         ((month == 7) & mid) | (month == 8)],
+        [0, 1, 2, 3], default=4)
+
+
+@lru_cache(maxsize=8)
+def _calendar(year: int) -> tuple:
+    """(season, day type, UTC shift in slots) for every day of *year*."""
+    days = np.arange(np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01"))
+    month = days.astype("M8[M]").astype(int) % 12 + 1
+    dom = (days - days.astype("M8[M]")).astype(int) + 1
+    weekday = (days.astype(int) + 3) % 7                     # 1970-01-01 was a Thursday
+    day_type = np.where(weekday < 5, 0, weekday - 4)         # Sat → 1, Sun → 2
+    shift = np.array([utc_offset_slots(d) for d in days.astype(dt.date)])
+    return _season(month, dom), day_type, shift
+
+
+def _to_utc(local: np.ndarray, shift: np.ndarray) -> np.ndarray:
+    """(days × 48) local-time rows → UTC rows (each day rolled by its offset)."""
+    cols = (np.arange(48)[None, :] + shift[:, None]) % 48
+    return np.take_along_axis(local, cols, axis=1)
+
+
+@lru_cache(maxsize=16)
+def _shape_year(p: int, year: int) -> np.ndarray:
+    """Unscaled (days × 48) UTC shape of profile *p* over *year*."""
+    season, day_type, shift = _calendar(year)
+    out = _to_utc(library()[p, season, day_type].astype(np.float64), shift)
+    out.flags.writeable = False
+    return out
+
+
+@lru_cache(maxsize=8)
+def _scale(p: int) -> float:
+    """kWh per shape unit for 1 kWh/yr, fixed on the reference year."""
+    return 1.0 / float(_shape_year(p, REFERENCE_YEAR).sum())
+
+
+def _doy365(month: np.ndarray, dom: np.ndarray) -> np.ndarray:
+    """Day of a 365-day year; 29 February maps onto the 28th."""
+    starts = np.concatenate(([0], np.cumsum(MONTH_DAYS)[:-1]))
+    return starts[month - 1] + np.minimum(dom, MONTH_DAYS[month - 1]) - 1
+
+
+# ─── smart-meter upload ──────────────────────────────────
+def _pick(names: list, *hints: str) -> Optional[int]:
+    for hint in hints:
+        for i, name in enumerate(names):
+            if hint in name:
+                return i
+    return None
+
+
+def parse_csv(data: bytes | str) -> np.ndarray:
+    """
+    Smart-meter CSV → ``(365 × 48)`` UTC kWh, a typical year.  Readings at
+    any step are put on half-hours (finer ones summed, coarser ones spread
+    evenly); several years of data are averaged per calendar slot.
+    """
+    import pandas as pd                                 # C parser – fast enough inline
+
+    if isinstance(data, str):
+        data = data.encode()
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ValueError(f"CSV larger than {MAX_UPLOAD_BYTES // 2**20} MB")
+    try:
+        frame = pd.read_csv(io.BytesIO(data), skipinitialspace=True)
+    except (ValueError, pd.errors.ParserError) as e:
+        raise ValueError(f"unreadable CSV: {e}") from None
+
+    names = [str(c).strip().lower() for c in frame.columns]
+    t_col = _pick(names, "start", "interval", "timestamp", "time", "date")
+    v_col = _pick(names, "kwh", "consumption", "value", "energy", "usage")
+    if t_col is None or v_col is None:
+        raise ValueError("CSV needs a timestamp column and a kWh column")
+
+    raw = frame.iloc[:, t_col]
+    ts = pd.to_datetime(raw, utc=True, errors="coerce", format="ISO8601")
+    if ts.isna().mean() > 0.5:                          # e.g. "01/03/2024 00:30"
+        ts = pd.to_datetime(raw, utc=True, errors="coerce", dayfirst=True)
+    kwh = pd.to_numeric(frame.iloc[:, v_col], errors="coerce").to_numpy(np.float64)
+    ok = ts.notna().to_numpy() & np.isfinite(kwh) & (kwh >= 0)
+    if ok.sum() < 48:
+        raise ValueError("CSV has fewer than one day of readable half-hours")
+    if not kwh[ok].sum() > 0:                           # nothing to scale or dispatch
+        raise ValueError("CSV readings total 0 kWh")
+    secs = ts[ok].dt.tz_localize(None).to_numpy().astype("datetime64[s]").astype(np.int64)
+    kwh = kwh[ok]
+    order = np.argsort(secs)
+    secs, kwh = secs[order], kwh[order]
+
+    step = int(np.median(np.diff(secs))) if len(secs) > 1 else 1800
+    if step > 1800:                                     # hourly etc. → spread evenly
+        k = max(round(step / 1800), 1)
+        secs = (secs[:, None] + 1800 * np.arange(k)[None, :]).ravel()
+        kwh = np.repeat(kwh / k, k)
+    slot = secs // 1800
+
+    # absolute half-hour → (day of a 365-day year, slot of day)
+    day = (slot // 48).astype("M8[D]")
+    month = day.astype("M8[M]").astype(int) % 12 + 1
+    dom = (day - day.astype("M8[M]")).astype(int) + 1
+    # sum within each real half-hour, then average over days that share a cell
+    uniq, first = np.unique(slot, return_index=True)
+    per_slot = np.add.reduceat(kwh, first)
+    cell = _doy365(month[first], dom[first]) * 48 + uniq % 48
+    total = np.bincount(cell, weights=per_slot, minlength=DAYS * 48)
+    count = np.bincount(cell, minlength=DAYS * 48)
+    year = np.where(count > 0, total / np.maximum(count, 1), np.nan).reshape(DAYS, 48)
+
+    # gaps: same half-hour's mean in that month, then across the upload
+    seen = count > 0
+    if not seen.all():
+        seen = seen.reshape(DAYS, 48)
+        month_of = np.repeat(np.arange(12), MONTH_DAYS)
+        m_sum = np.zeros((12, 48))
+        m_cnt = np.zeros((12, 48))
+        np.add.at(m_sum, month_of, np.where(seen, year, 0.0))
+        np.add.at(m_cnt, month_of, seen)
+        overall = m_sum.sum(axis=0) / np.maximum(m_cnt.sum(axis=0), 1)
+        fill = np.where(m_cnt > 0, m_sum / np.maximum(m_cnt, 1), overall)
+        year = np.where(seen, year, fill[month_of])
+    return year
+
+
+# ─── demand spec ─────────────────────────────────────────
+@dataclass(slots=True)
+class Demand:
+    """What a household draws: a library profile, or an uploaded meter year."""
+    profile: str = DEFAULT_PROFILE
+    annual_kwh: Optional[float] = None        # None → default / the upload as is
+    upload: Optional[np.ndarray] = None       # (365 × 48) from :func:`parse_csv`
+
+    def _rows(self, year: int) -> np.ndarray:
+        """(days × 48) UTC kWh over calendar *year*."""
+        if self.upload is not None:
+            rows = self.upload
+            if self.annual_kwh is not None:
+                rows = rows * (self.annual_kwh / rows.sum())
+            if len(_calendar(year)[0]) == 366:              # repeat 28 Feb
+                rows = np.insert(rows, 59, rows[58], axis=0)
+            return rows
+        if self.profile == NO_DEMAND:
+            return np.zeros((len(_calendar(year)[0]), 48))
+        p = profile_index(self.profile)
+        kwh = DEFAULT_ANNUAL_KWH if self.annual_kwh is None else self.annual_kwh
+        return _shape_year(p, year) * (_scale(p) * kwh)
+
+    def year(self, year: int) -> np.ndarray:
+        """UTC half-hour kWh for every slot of calendar *year*."""
+        return self._rows(year).ravel()
+
+    def year365(self) -> np.ndarray:
+        """The reference 365-day year, 17,520 slots."""
+        return self._rows(REFERENCE_YEAR).ravel()
+
+    def day(self, when: dt.date) -> np.ndarray:
+        """48 UTC half-hour kWh for *when*."""
+        doy = (when - dt.date(when.year, 1, 1)).days
+        if self.upload is None and self.profile != NO_DEMAND:   # skip scaling a year
+            p = profile_index(self.profile)
+            kwh = DEFAULT_ANNUAL_KWH if self.annual_kwh is None else self.annual_kwh
+            return _shape_year(p, when.year)[doy] * (_scale(p) * kwh)
+        return np.array(self._rows(when.year)[doy])
+
+    def describe(self) -> dict:
+        """For responses: where the load came from and its yearly kWh."""
+        return {"profile": "upload" if self.upload is not None else self.profile,
+                "annual_kwh": round(float(self.year365().sum()), 1)}
+
+
+def demand_from(profile: Optional[str] = None, annual_kwh: Optional[float] = None,
+                csv: bytes | str | None = None) -> Demand:
+    """Validated :class:`Demand` from request-style inputs."""
+    if annual_kwh is not None and not 0 < annual_kwh <= 1e6:
+        raise ValueError("annual_kwh must be > 0")
+    if csv:
+        return Demand(annual_kwh=annual_kwh, upload=parse_csv(csv))
+    profile = (profile or DEFAULT_PROFILE).lower()
+    if profile != NO_DEMAND:
+        profile_index(profile)
+    return Demand(ALIASES.get(profile, profile), annual_kwh)
+
+
+DEFAULT = Demand()
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Household demand profiles")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Write the load profile library")
+    b.add_argument("-o", "--output", type=Path, default=LIBRARY_PATH)
+    s = sub.add_parser("show", help="Print a profile's daily kWh for a date")
+    s.add_argument("profile", choices=PROFILES)
+    s.add_argument("--date", type=dt.date.fromisoformat, default=dt.date.today())
+    s.add_argument("--annual-kwh", type=float, default=DEFAULT_ANNUAL_KWH)
+    c = sub.add_parser("csv", help="Parse a smart-meter CSV and summarise it")
+    c.add_argument("path", type=Path)
+
+    args = p.parse_args()
+    if args.cmd == "build":
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        np.save(args.output, build_library())
+        print(f"Wrote {args.output}")
+    elif args.cmd == "show":
+        day = Demand(args.profile, args.annual_kwh).day(args.date)
+        print(f"{args.profile} {args.date}: {day.sum():.2f} kWh, peak slot {int(day.argmax())}")
+    else:
+        year = parse_csv(args.path.read_bytes())
+        print(f"{year.sum():.0f} kWh/yr typical, {year.sum(axis=1).mean():.2f} kWh/day")
@@ -20,11 +20,16 @@ can show a full breakdown.
 
 from __future__ import annotations
 from dataclasses import dataclass
-from .simulate import geocode, hourly_generation_series 
+from typing import TYPE_CHECKING, Sequence
 import numpy as np
-import pandas as pd
-import datetime as _dt
-from .octopus_prices import agile_prices, mock_prices
+from . import encoding, metrics
+from .demand import DEFAULT as DEFAULT_DEMAND, Demand
+from .optimal import optimal_arrays
+from .pipeline import fetch_site_inputs
+from .profiles import Plane
+
+if TYPE_CHECKING:                       # pandas only loads for the adapter below
+    import pandas as pd
 
 
 @dataclass(slots=True)
@@ -34,14 +39,144 @@ class BatteryCfg:
     eta:     float = 0.92               # round-trip
 
 
-# ─────────────────────────────────────────────────────────
+# slots=True turns the class attributes into descriptors, so defaults
+# have to come from an instance
+_DEFAULT = BatteryCfg()
+
+# ─── array kernel ────────────────────────────────────────
+def greedy_kernel(
+    pv: np.ndarray,
+    demand: np.ndarray,
+    cap_kwh: float,
+    step_limit: float,
+    eff: float,
+    soc0: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """
+    Core greedy loop on plain float64 arrays.
+
+    Returns ``(import_grid, export_grid, soc_kwh, kwh_discharged)``.
+
+    Only the SOC recurrence is sequential.  A run of deficit slots can only
+    drain the battery towards zero, so each run collapses to one step
+    (``max(soc + Σmove, 0)``) and the Python loop walks one float per
+    surplus slot plus one per deficit run.  SOC inside the runs and all
+    grid flows are then recovered with NumPy.
+    """
+    net = np.asarray(pv, dtype=np.float64) - np.asarray(demand, dtype=np.float64)
+    surplus = net > 0
+    deficit = ~surplus
+    # signed per-slot move before the SOC limits: +charge / -discharge
+    move = np.where(surplus, np.minimum(net, step_limit),
+                    -np.minimum(-net, step_limit))
+
+    # events: every surplus slot on its own, every deficit run as one
+    run_start  = deficit & ~np.concatenate(([False], deficit[:-1]))
+    new_event  = surplus | run_start
+    first_slot = np.flatnonzero(new_event)
+    event_id   = np.cumsum(new_event) - 1
+    event_move = np.bincount(event_id, weights=move, minlength=len(first_slot))
+
+    soc = float(soc0)
+    soc_after = []
+    append = soc_after.append
+    for m in event_move.tolist():
+        if m > 0:                                     # surplus → battery
+            room = cap_kwh - soc
+            soc += (m if m < room else room) * eff
+        else:                                         # deficit run ← battery
+            left = soc + m
+            soc = left if left > 0 else 0.0
+        append(soc)
+
+    after  = np.array(soc_after)
+    before = np.concatenate(([float(soc0)], after))[:-1]
+
+    # SOC inside a deficit run = start SOC + running sum of moves, floored at 0
+    drained = np.cumsum(np.where(deficit, move, 0.0))
+    run_base = (drained - move)[first_slot][event_id]
+    soc_arr = np.where(surplus, after[event_id],
+                       np.maximum(before[event_id] + drained - run_base, 0.0))
+    soc_prev = np.concatenate(([float(soc0)], soc_arr))[:-1]
+
+    charge    = np.where(surplus, np.minimum(move, cap_kwh - soc_prev), 0.0)
+    discharge = np.where(surplus, 0.0, np.minimum(-move, soc_prev))
+    export_grid = np.where(surplus, net - charge, 0.0)       # leftover → grid
+    import_grid = np.where(surplus, 0.0, -net - discharge)   # unmet → grid
+
+    return import_grid, export_grid, soc_arr, float(discharge.sum())
+
+
+def dispatch_arrays(
+    pv: np.ndarray,
+    prices: np.ndarray,
+    demand: np.ndarray | None = None,
+    cap_kwh: float = _DEFAULT.cap_kwh,
+    pow_kw:  float = _DEFAULT.pow_kw,
+    eta:     float = _DEFAULT.eta,
+    dt_h:    float = 0.5,
+    soc0:    float = 0.0,
+) -> dict:
+    """
+    Array-in/array-out greedy dispatch plus economics.
+
+    Same keys as :func:`greedy_dispatch` except that the slot detail comes
+    back as separate arrays (``import_grid``, ``export_grid``, ``soc_kwh``)
+    instead of a DataFrame.
+    """
+    pv     = np.ascontiguousarray(pv, dtype=np.float64)
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    demand = (np.zeros_like(pv) if demand is None
+              else np.ascontiguousarray(demand, dtype=np.float64))
+
+    if not (pv.shape == prices.shape == demand.shape):
+        raise ValueError("pv, prices, demand must share the same shape")
+    if cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
+        raise ValueError("cap_kwh>0, pow_kw>0, 0<eta≤1")
+
+    import_grid, export_grid, soc_log, kwh_shifted = greedy_kernel(
+        pv, demand, cap_kwh, pow_kw * dt_h, eta ** 0.5, soc0)
+
+    # Baseline (no battery): grid_kwh = demand - pv; export reduces bill
+    baseline_cost  = float(np.dot(demand - pv, prices))
+    with_batt_cost = float(np.dot(import_grid - export_grid, prices))
+
+    return {
+        "import_grid": import_grid,
+        "export_grid": export_grid,
+        "soc_kwh": soc_log,
+        "baseline_cost": baseline_cost,
+        "with_batt_cost": with_batt_cost,
+        "money_saved": baseline_cost - with_batt_cost,
+        "kwh_shifted": kwh_shifted,
+    }
+
+
+# engines with the dispatch_arrays signature, selectable by name
+ARRAY_ENGINES = {
+    "greedy":  dispatch_arrays,
+    "optimal": optimal_arrays,
+}
+
+
+def engine(strategy: str):
+    """Array engine for *strategy* ('greedy' or 'optimal')."""
+    try:
+        return ARRAY_ENGINES[strategy]
+    except KeyError:
+        raise ValueError(f"strategy must be one of {', '.join(ARRAY_ENGINES)}") from None
+
+
+# ─── pandas adapter ──────────────────────────────────────
 def greedy_dispatch(
     pv_kwh: pd.Series,
     prices: pd.Series,
-    cap_kwh: float = BatteryCfg.cap_kwh,
-    pow_kw:  float = BatteryCfg.pow_kw,
-    eta:     float = BatteryCfg.eta,
-    demand_kwh: pd.Series | None = None,          # ★ NEW ★
+    cap_kwh: float = _DEFAULT.cap_kwh,
+    pow_kw:  float = _DEFAULT.pow_kw,
+    eta:     float = _DEFAULT.eta,
+    demand_kwh: pd.Series | None = None,
+    *,
+    strategy: str = "greedy",
 ) -> dict:
     """
     Return a dict with:
@@ -50,78 +185,58 @@ def greedy_dispatch(
       • with_batt_cost
       • money_saved
       • kwh_shifted (energy the battery actually cycled)
+
+    Thin wrapper over :func:`dispatch_arrays` (or, with
+    ``strategy="optimal"``, :func:`optimal.optimal_arrays`).
     """
+    import pandas as pd
+
+    run = engine(strategy)
     if demand_kwh is None:
         demand_kwh = pd.Series(0.0, index=pv_kwh.index)
 
     # ── guards ──
     if not (pv_kwh.index.equals(prices.index) and pv_kwh.index.equals(demand_kwh.index)):
         raise ValueError("pv, prices, demand must share the same index")
-    if cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
-        raise ValueError("cap_kwh>0, pow_kw>0, 0<eta≤1")
 
     dt_h = (pv_kwh.index[1] - pv_kwh.index[0]).total_seconds()/3600
-    step_limit = pow_kw * dt_h
-    eff        = eta ** 0.5
-
-    n = len(pv_kwh)
-    soc            = 0.0
-    soc_log        = np.zeros(n)
-    import_grid    = np.zeros(n)   # +ve = buy
-    export_grid    = np.zeros(n)   # +ve = sell
-    batt_in_kwh    = 0.0           # to report kWh cycled
-
-    for i in range(n):
-        pv   = pv_kwh.iat[i]
-        load = demand_kwh.iat[i]
-
-        # 1) Use PV to serve load first
-        net = pv - load                               # +ve surplus, -ve deficit
-
-        # 2) Surplus path  ───────────────────────────
-        if net > 0:
-            room   = cap_kwh - soc
-            charge = min(net, room, step_limit)
-            soc   += charge * eff
-            export_grid[i] = net - charge             # leftover → grid
-
-        # 3) Deficit path  ───────────────────────────
-        else:
-            need = -net                               # kWh short
-            discharge = min(need, soc, step_limit)
-            soc      -= discharge
-            batt_in_kwh += discharge
-            import_grid[i] = need - discharge         # unmet part → grid import
-
-        soc_log[i] = soc
-
-    # ── economics ───────────────────────────────────
-    # Baseline (no battery): grid_kwh = demand - pv
-    baseline_grid = demand_kwh - pv_kwh
-    baseline_cost = (baseline_grid * prices).sum()
-
-    with_batt_grid = import_grid - export_grid        # export reduces bill
-    with_batt_cost = (with_batt_grid * prices).sum()
-
-    money_saved = baseline_cost - with_batt_cost
-    kwh_shifted = batt_in_kwh
+    res = run(
+        pv_kwh.to_numpy(np.float64), prices.to_numpy(np.float64),
+        demand_kwh.to_numpy(np.float64),
+        cap_kwh=cap_kwh, pow_kw=pow_kw, eta=eta, dt_h=dt_h,
+    )
 
     df = pd.DataFrame({
         "pv_kwh": pv_kwh,
         "demand_kwh": demand_kwh,
-        "import_grid": import_grid,
-        "export_grid": export_grid,
-        "soc_kwh": soc_log,
+        "import_grid": res.pop("import_grid"),
+        "export_grid": res.pop("export_grid"),
+        "soc_kwh": res.pop("soc_kwh"),
     })
 
-    return {
-        "frame": df,
-        "baseline_cost": baseline_cost,
-        "with_batt_cost": with_batt_cost,
-        "money_saved": money_saved,
-        "kwh_shifted": kwh_shifted,
-    }
+    return {"frame": df, **res}
+
+
+def optimal_dispatch(pv_kwh: pd.Series, prices: pd.Series, *args, **kwargs) -> dict:
+    """:func:`greedy_dispatch` signature and result, optimal engine."""
+    return greedy_dispatch(pv_kwh, prices, *args, strategy="optimal", **kwargs)
+
+
+def day_inputs(postcode: str, kwp: float) -> tuple[pd.Series, pd.Series, bool]:
+    """
+    Fetch everything a one-day dispatch needs for *postcode*:
+    ``(pv_halfhour, price, fallback)`` on the same 48-slot index.
+
+    • PV for *today* cut from the hourly SARAH-3 2023 year, split into
+      48 half-hours.
+    • Agile prices for the same day from the shared price store; the mock
+      tariff – flagged as ``fallback`` – only stands in when no prices are
+      held and Octopus is unreachable.
 
+    Both legs are fetched concurrently by :func:`pipeline.fetch_site_inputs`.
+    """
+    inputs = fetch_site_inputs(postcode, kwp)
+    return inputs.pv_halfhour, inputs.prices, inputs.fallback
 
 
 def run_dispatch_simulation(
@@ -129,48 +244,65 @@ def run_dispatch_simulation(
     kwp: float,
     cap_kwh: float,
     pow_kw: float,
-    eta: float = BatteryCfg.eta,
+    eta: float = _DEFAULT.eta,
+    strategy: str = "greedy",
+    detail: str = "records",
+    decimals: int | None = None,
+    demand: Demand | None = None,
+    planes: Sequence[Plane] | None = None,
 ) -> dict:
     """
     Wrapper that keeps the old call-site in api/index.py.
 
-    • Builds a 24-hour PV series for *today* (hourly SARAH-3 2023 data).
-    • Fetches Agile prices for the same day (48 half-hours); falls back to
-      mock tariff if the API returns an incomplete set.
-    • Upsamples the hourly PV to 48 half-hours so its index matches prices.
-    • Calls greedy_dispatch and returns its dict unchanged.
+    Gathers the day's PV and prices (:func:`pipeline.fetch_site_inputs`),
+    runs the chosen *strategy* ('greedy' or 'optimal') against the
+    household *demand* (the default domestic profile if None) for the
+    roof *planes* (one south-facing *kwp* array if None) and returns the
+    economics plus the ``fallback`` flag and ``demand`` description, with
+    the slot-level ``frame`` as
+
+      • ``detail="records"`` – one dict per slot (the original format)
+      • ``detail="columns"`` – :func:`encoding.columns`, values rounded to
+        *decimals* if given
+      • ``detail="summary"`` – no frame at all (never built)
     """
-    # 1) Site location
-    lat, lon = geocode(postcode)
-
-    # 2) PV generation for next 24 h  – 24 hourly kWh
-    pv_hourly = hourly_generation_series(lat, lon, kwp, year=2023).tail(24)
-
-    # 3) Price series – 48 half-hours
-    today  = _dt.date.today()
-    price  = agile_prices(today, postcode=postcode)
-    if len(price) < 48:                         # API glitch → mock tariff
-        price = mock_prices(price.index if len(price) == 48 else None)
-
-    # 4) Align PV to the same 48-slot index
-    if not pv_hourly.index.equals(price.index):
-        pv_halfhour = pd.Series(
-            np.repeat(pv_hourly.values / 2.0, 2),   # split each kWh in half
-            index=price.index,
-            name="pv_kwh",
+    run = engine(strategy)                      # reject bad names before fetching
+    encoding.check_detail(detail)
+    demand = demand or DEFAULT_DEMAND
+
+    inputs = fetch_site_inputs(postcode, kwp, planes=planes)
+    load = demand.day(inputs.when)
+    if detail != "records":                     # arrays end to end, no pandas
+        pv = inputs.pv_day
+        with metrics.stage("dispatch"):
+            result = run(pv, inputs.price_day, load, cap_kwh, pow_kw, eta)
+        slots = {k: result.pop(k) for k in ("import_grid", "export_grid", "soc_kwh")}
+        if detail == "columns":
+            with metrics.stage("frame_columns"):
+                result["frame"] = encoding.columns(
+                    int(inputs.day_start.timestamp()), 1800, {
+                        "pv_kwh": pv, "demand_kwh": load, **slots},
+                    decimals)
+        result["fallback"] = inputs.fallback
+        result["demand"] = demand.describe()
+        return result
+
+    import pandas as pd                         # the records frame is pandas anyway
+    pv_halfhour = inputs.pv_halfhour
+    with metrics.stage("dispatch"):
+        result = greedy_dispatch(
+            pv_kwh=pv_halfhour,
+            prices=inputs.prices,
+            cap_kwh=cap_kwh,
+            pow_kw=pow_kw,
+            eta=eta,
+            demand_kwh=pd.Series(load, index=pv_halfhour.index, name="demand_kwh"),
+            strategy=strategy,
         )
-    else:
-        pv_halfhour = pv_hourly
-
-    # 5) Run greedy dispatch
-    result = greedy_dispatch(
-        pv_kwh=pv_halfhour,
-        prices=price,
-        cap_kwh=cap_kwh,
-        pow_kw=pow_kw,
-        eta=eta,
-    )
-    
-    result["frame"] = result["frame"].to_dict(orient="records")
+
+    with metrics.stage("frame_records"):
+        result["frame"] = result["frame"].to_dict(orient="records")
+    result["fallback"] = inputs.fallback
+    result["demand"] = demand.describe()
 
     return result
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Compact wire formats for slot-level results.
+
+``to_dict(orient="records")`` repeats every column name and a Timestamp
+per slot; for a year of half-hours that is megabytes of JSON and most of
+the request's CPU.  The columnar form sends one array per column and a
+single epoch start + step instead of per-row timestamps:
+
+    {"start": 1735689600, "step_s": 1800, "n": 48,
+     "columns": {"pv_kwh": [...], "soc_kwh": [...], ...}}
+
+Slot *i* is at ``start + i * step_s`` (Unix seconds, UTC).  ``decimals``
+rounds values (4 → 0.1 Wh / 0.01 p) so the JSON floats stay short.
+
+Long horizons can also be streamed as NDJSON – a summary line, then one
+columnar block per chunk of slots – and gzip-compressed on the fly when
+the client accepts it (:func:`install_gzip`).
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+# ─────────────────────────────────────────────────────────
+DETAILS    = ("records", "columns", "summary")
+BLOCK_SLOTS = 48 * 7                   # NDJSON: one line per week of half-hours
+GZIP_MIN_BYTES = 1024
+
+
+def check_detail(detail: str) -> str:
+    if detail not in DETAILS:
+        raise ValueError(f"detail must be one of {', '.join(DETAILS)}")
+    return detail
+
+
+def _values(arr, decimals: Optional[int]) -> list:
+    a = np.asarray(arr, dtype=np.float64)
+    if decimals is not None:
+        a = np.round(a, decimals) + 0.0           # + 0.0 drops "-0.0"
+    return a.tolist()
+
+
+def columns(start: int, step_s: int, data: Dict[str, np.ndarray],
+            decimals: Optional[int] = None) -> dict:
+    """Columnar encoding of equally spaced slots from *start* (Unix s, UTC)."""
+    n = len(next(iter(data.values()))) if data else 0
+    return {
+        "start":   int(start) if n else None,
+        "step_s":  int(step_s),
+        "n":       n,
+        "columns": {name: _values(v, decimals) for name, v in data.items()},
+    }
+
+
+def ndjson(summary: dict, cols: Optional[dict] = None,
+           block: int = BLOCK_SLOTS) -> Iterator[str]:
+    """Summary line, then *cols* split into blocks of *block* slots."""
+    yield json.dumps({"type": "summary", **summary}) + "\n"
+    if not cols or not cols["n"]:
+        return
+    for a in range(0, cols["n"], block):
+        b = min(a + block, cols["n"])
+        yield json.dumps({
+            "type": "slots", "start": cols["start"] + a * cols["step_s"],
+            "step_s": cols["step_s"], "n": b - a,
+            "columns": {k: v[a:b] for k, v in cols["columns"].items()},
+        }) + "\n"
+
+
+# ─── gzip ────────────────────────────────────────────────
+def gzip_stream(chunks: Iterable[bytes | str], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip *chunks* as they come.  Each chunk is sync-flushed, so the client
+    can decompress every line the moment it arrives instead of waiting
+    for the end of the stream.
+    """
+    z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)   # gzip framing
+    for chunk in chunks:
+        out = z.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        out += z.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def install_gzip(app, min_bytes: int = GZIP_MIN_BYTES) -> None:
+    """Gzip JSON/NDJSON responses for clients that send ``Accept-Encoding: gzip``."""
+    from flask import request
+
+    @app.after_request
+    def _gzip(resp):
+        if ("gzip" not in request.headers.get("Accept-Encoding", "")
+                or resp.status_code < 200 or resp.status_code >= 300
+                or "Content-Encoding" in resp.headers
+                or not (resp.mimetype or "").startswith(("application/json",
+                                                         "application/x-ndjson"))):
+            return resp
+        if resp.is_streamed:
+            resp.response = gzip_stream(resp.response)
+            resp.headers.pop("Content-Length", None)
+        else:
+            data = resp.get_data()
+            if len(data) < min_bytes:
+                return resp
+            resp.set_data(gzip.compress(data, 6))
+        resp.headers["Content-Encoding"] = "gzip"
+        etag = resp.headers.get("ETag")
+        if etag:                        # strong tags differ per encoding
+            resp.headers["ETag"] = etag[:-1] + '-gzip"'
+        resp.vary.add("Accept-Encoding")
+        return resp
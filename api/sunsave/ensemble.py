@@ -0,0 +1,151 @@
+"""
+Weather-ensemble savings – every SARAH-3 year instead of just 2023.
+
+One year of weather makes a quote hostage to whether that summer was
+dull.  Here the site's 1 kWp profile is fetched for each year PVGIS
+offers (2005–2023, concurrently, cached like any other profile), every
+year is cut to 365 days and stacked into one ``(years × slots)`` array,
+and each row runs the full-year continuous dispatch (SOC carried across
+midnight, as in :mod:`annual`) against the same price and demand year.  Rows are
+fanned out over the process pool shared with :mod:`batch`; workers send
+back only 365 daily savings per year.
+
+The answer is a distribution, not a point:
+
+• ``annual_savings`` – P10/P50/P90 of the yearly saving across years
+• ``daily_savings``  – P10/P50/P90 over every year × day
+• ``today``          – P10/P50/P90 for *when*'s calendar day across years
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from . import metrics
+from .batch import MAX_WORKERS, _process_pool
+from .demand import DEFAULT as DEFAULT_DEMAND, Demand
+from .dispatch import BatteryCfg, engine
+from .geo import resolve
+from .pipeline import fetch_pool
+from .profiles import DEFAULT_RAD_DB, Plane, orientations, plane_weights, unit_profile
+
+# ─────────────────────────────────────────────────────────
+YEARS = tuple(range(2005, 2024))            # SARAH-3 coverage in PVGIS 5.3
+DAYS  = 365
+SLOTS_PER_DAY = 48
+PRICE_YEAR = 2023                           # calendar the price year is laid on
+PERCENTILES = (10, 50, 90)
+
+
+def _dispatch_rows(pv_rows: np.ndarray, prices: np.ndarray, demand: np.ndarray,
+                   battery: tuple, strategy: str) -> np.ndarray:
+    """Runs in a worker process: (rows × 365) daily £ saved."""
+    run = engine(strategy)
+    out = np.empty((len(pv_rows), DAYS))
+    for i, pv in enumerate(pv_rows):
+        res = run(pv, prices, demand, *battery)
+        saved = ((demand - pv) - (res["import_grid"] - res["export_grid"])) * prices
+        out[i] = saved.reshape(DAYS, SLOTS_PER_DAY).sum(axis=1)
+    return out
+
+
+def _bands(values: np.ndarray) -> Dict[str, float]:
+    p = np.percentile(values, PERCENTILES)
+    return {**{f"p{q}": float(v) for q, v in zip(PERCENTILES, p)},
+            "mean": float(values.mean())}
+
+
+def _to_365(hourly: np.ndarray) -> np.ndarray:
+    """Drop 29 February so every year lines up day for day."""
+    if len(hourly) == 8784:
+        hourly = np.concatenate((hourly[:59 * 24], hourly[60 * 24:]))
+    return hourly[:DAYS * 24]
+
+
+def ensemble_pv(lat: float, lon: float, kwp: float,
+                years: Sequence[int] = YEARS,
+                raddatabase: str = DEFAULT_RAD_DB,
+                planes: Optional[Sequence[Plane]] = None) -> np.ndarray:
+    """``(len(years) × 17,520)`` half-hourly kWh, one row per weather year."""
+    planes = planes or [Plane(kwp)]
+    keys = orientations(planes)
+    futures = [[metrics.submit(fetch_pool, unit_profile, lat, lon, *k, year=y,
+                               raddatabase=raddatabase) for k in keys] for y in years]
+    units = np.array([[_to_365(f.result()) for f in row] for row in futures],
+                     dtype=np.float64)                 # years × orientations × hours
+    hourly = plane_weights(planes, keys) @ units
+    return np.repeat(hourly / 2.0, 2, axis=1)       # split each kWh in half
+
+
+def run_ensemble(
+    postcode: str,
+    kwp: float,
+    cap_kwh: float,
+    pow_kw: float,
+    eta: float = BatteryCfg().eta,
+    *,
+    years: Sequence[int] = YEARS,
+    tariff: str = "agile",
+    strategy: str = "greedy",
+    when: Optional[dt.date] = None,
+    workers: Optional[int] = None,
+    demand: Optional[Demand] = None,
+    planes: Optional[Sequence[Plane]] = None,
+) -> dict:
+    """JSON-ready P10/P50/P90 savings over the weather *years*."""
+    from .annual import _year_prices          # pandas – only on this path
+    import pandas as pd
+
+    if kwp <= 0 or cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
+        raise ValueError("kwp>0, cap_kwh>0, pow_kw>0, 0<eta≤1")
+    years = sorted(set(int(y) for y in years))
+    if not years or years[0] < YEARS[0] or years[-1] > YEARS[-1]:
+        raise ValueError(f"years must lie within {YEARS[0]}–{YEARS[-1]}")
+    engine(strategy)
+    when = when or dt.date.today()
+
+    site = resolve(postcode)
+    with metrics.stage("ensemble_pv"):
+        pv = ensemble_pv(site.lat, site.lon, kwp, years, planes=planes)
+
+    start = dt.datetime(PRICE_YEAR, 1, 1, tzinfo=dt.timezone.utc)
+    index = pd.date_range(start, periods=DAYS * SLOTS_PER_DAY, freq="30min", tz="UTC")
+    prices, price_basis = _year_prices(index, site.region, tariff)
+    demand = demand or DEFAULT_DEMAND
+    load = demand.year(PRICE_YEAR)              # same weekday / DST calendar as prices
+
+    battery = (cap_kwh, pow_kw, eta)
+    pool = _process_pool(workers)
+    with metrics.stage("dispatch"):
+        if pool is None or len(years) == 1:
+            daily = _dispatch_rows(pv, prices, load, battery, strategy)
+        else:
+            step = -(-len(years) // (workers or MAX_WORKERS))
+            parts = [pool.submit(_dispatch_rows, pv[a:a + step], prices, load, battery,
+                                 strategy)
+                     for a in range(0, len(years), step)]
+            daily = np.concatenate([f.result() for f in parts])
+
+    annual = daily.sum(axis=1)
+    day = dt.date(PRICE_YEAR, when.month, min(when.day, 28) if when.month == 2 else when.day)
+    doy = (day - dt.date(PRICE_YEAR, 1, 1)).days    # 365-day calendar
+    by_year: List[dict] = [
+        {"year": y, "money_saved": float(a), "pv_kwh": float(pv[i].sum())}
+        for i, (y, a) in enumerate(zip(years, annual))]
+
+    return {
+        "site": {"postcode": site.postcode, "lat": site.lat, "lon": site.lon,
+                 "region": site.region},
+        "years": years,
+        "strategy": strategy,
+        "price_basis": price_basis,
+        "battery": {"cap_kwh": cap_kwh, "pow_kw": pow_kw, "eta": eta},
+        "demand": demand.describe(),
+        "annual_savings": _bands(annual),
+        "daily_savings": _bands(daily.ravel()),
+        "today": {"date": when.isoformat(), **_bands(daily[:, doy])},
+        "by_year": by_year,
+    }
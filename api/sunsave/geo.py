@@ -0,0 +1,245 @@
+"""
+Postcode → (lat, lon, Agile region) in one call.
+
+Lookup order
+------------
+1.  memo            – LRU of everything resolved in this process
+2.  outcode index   – outward code → centroid + region, loaded from
+                      ``SUNSAVE_OUTCODE_INDEX`` or the bundled
+                      ``data/outcodes.csv`` (build one with
+                      ``python -m api.sunsave.geo build postcodes.txt``)
+3.  postcodes.io    – single GET, or the bulk POST for many at once
+
+Both ``simulate.geocode`` and ``octopus_prices`` go through here, so a
+dispatch request costs at most one postcodes.io round trip, and none once
+the postcode (or its district) is known.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from . import upstream
+from .singleflight import SingleFlight
+
+# ─────────────────────────────────────────────────────────
+POSTCODES_URL = "https://api.postcodes.io/postcodes"
+BULK_LIMIT    = 100                      # postcodes.io max per bulk POST
+
+_DNO_TO_REGION: Dict[int, str] = {
+    10: "A", 11: "B", 12: "C", 13: "D", 14: "E", 15: "F",
+    16: "G", 17: "H", 18: "J", 19: "K", 20: "L", 21: "M",
+    22: "N", 23: "P",
+}
+
+INDEX_PATH = Path(os.environ.get(
+    "SUNSAVE_OUTCODE_INDEX", Path(__file__).with_name("data") / "outcodes.csv"))
+
+
+@dataclass(frozen=True, slots=True)
+class Site:
+    postcode: str
+    lat: float
+    lon: float
+    region: str
+    exact: bool = True                   # False → outward-code centroid
+
+
+# ─── helpers ─────────────────────────────────────────────
+def normalise(postcode: str) -> str:
+    return "".join(postcode.split()).upper()
+
+
+def outcode(postcode: str) -> str:
+    """Outward code – everything but the last three characters."""
+    return normalise(postcode)[:-3]
+
+
+def region_from_result(result: dict) -> str:
+    dno = result["codes"]["nuts"]                  # e.g. UKI31
+    dno_num = int(dno[-2:])                        # last two digits
+    return _DNO_TO_REGION.get(dno_num, "C")        # default London
+
+
+def _site_from_result(postcode: str, result: dict) -> Site:
+    return Site(postcode, float(result["latitude"]), float(result["longitude"]),
+                region_from_result(result))
+
+
+# ─── memo + outcode index ────────────────────────────────
+_MEMO_SIZE = 4096
+_memo: "OrderedDict[str, Site]" = OrderedDict()
+_index: Optional[Dict[str, Site]] = None
+_lock = threading.Lock()
+counters: Dict[str, int] = {"hit": 0, "index_hit": 0, "miss": 0}
+_flight = SingleFlight("postcode")
+
+
+def _memo_get(pc: str) -> Optional[Site]:
+    with _lock:
+        site = _memo.get(pc)
+        if site is not None:
+            _memo.move_to_end(pc)
+            counters["hit"] += 1
+        return site
+
+
+def _memo_put(site: Site) -> None:
+    with _lock:
+        _memo[site.postcode] = site
+        _memo.move_to_end(site.postcode)
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def load_index(path: Path | str = INDEX_PATH) -> Dict[str, Site]:
+    """Read an ``outcode,lat,lon,region`` CSV; missing file → empty index."""
+    index: Dict[str, Site] = {}
+    try:
+        with open(path, newline="") as fh:
+            for row in csv.DictReader(fh):
+                oc = normalise(row["outcode"])
+                index[oc] = Site(oc, float(row["lat"]), float(row["lon"]),
+                                 row["region"], exact=False)
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def _outcode_index() -> Dict[str, Site]:
+    global _index
+    if _index is None:
+        _index = load_index()
+    return _index
+
+
+# ─── postcodes.io ────────────────────────────────────────
+def _lookup_one(pc: str) -> Site:
+    r = upstream.get(f"{POSTCODES_URL}/{pc}", timeout=10)
+    return _site_from_result(pc, r.json()["result"])
+
+
+def _lookup_bulk(pcs: List[str]) -> Dict[str, Site]:
+    found: Dict[str, Site] = {}
+    for i in range(0, len(pcs), BULK_LIMIT):
+        chunk = pcs[i:i + BULK_LIMIT]
+        r = upstream.post(POSTCODES_URL, json={"postcodes": chunk}, timeout=20)
+        for item in r.json()["result"]:
+            if item.get("result"):
+                pc = normalise(item["query"])
+                found[pc] = _site_from_result(pc, item["result"])
+    return found
+
+
+# ─── public API ──────────────────────────────────────────
+def resolve(postcode: str, *, exact: bool = False) -> Site:
+    """
+    Resolve one postcode.  With ``exact=False`` (default) a known outward
+    code answers immediately from the local index; ``exact=True`` always
+    returns the postcode's own coordinates.
+    """
+    pc = normalise(postcode)
+    site = _memo_get(pc)
+    if site is not None:
+        return site
+
+    if not exact:
+        approx = _outcode_index().get(pc[:-3])
+        if approx is not None:
+            counters["index_hit"] += 1
+            return Site(pc, approx.lat, approx.lon, approx.region, exact=False)
+
+    counters["miss"] += 1
+    return _flight.do(pc, lambda: _fetch_site(pc))
+
+
+def _fetch_site(pc: str) -> Site:
+    with _lock:                         # a leader may have filled it since our miss
+        site = _memo.get(pc)
+    if site is None:
+        site = _lookup_one(pc)
+        _memo_put(site)
+    return site
+
+
+def resolve_many(postcodes: Iterable[str], *, exact: bool = False) -> Dict[str, Site]:
+    """
+    Resolve many postcodes, keyed by normalised postcode.  Cache/index
+    misses go to postcodes.io in bulk; unknown postcodes are omitted.
+    """
+    out: Dict[str, Site] = {}
+    misses: List[str] = []
+    index = {} if exact else _outcode_index()
+
+    for pc in dict.fromkeys(normalise(p) for p in postcodes):
+        site = _memo_get(pc)
+        if site is None and pc[:-3] in index:
+            approx = index[pc[:-3]]
+            site = Site(pc, approx.lat, approx.lon, approx.region, exact=False)
+            counters["index_hit"] += 1
+        if site is None:
+            misses.append(pc)
+        else:
+            out[pc] = site
+
+    if misses:
+        counters["miss"] += len(misses)
+        for pc, site in _lookup_bulk(misses).items():
+            _memo_put(site)
+            out[pc] = site
+    return out
+
+
+def build_index(postcodes: Iterable[str], path: Path | str = INDEX_PATH) -> int:
+    """
+    Resolve *postcodes* in bulk and write one centroid row per outward
+    code (mean lat/lon, most common region).  Returns rows written.
+    """
+    groups: Dict[str, List[Site]] = {}
+    for site in _lookup_bulk(list(dict.fromkeys(map(normalise, postcodes)))).values():
+        groups.setdefault(site.postcode[:-3], []).append(site)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["outcode", "lat", "lon", "region"])
+        for oc, sites in sorted(groups.items()):
+            regions = [s.region for s in sites]
+            w.writerow([oc,
+                        round(sum(s.lat for s in sites) / len(sites), 5),
+                        round(sum(s.lon for s in sites) / len(sites), 5),
+                        max(set(regions), key=regions.count)])
+
+    global _index
+    _index = None                       # reload on next lookup
+    return len(groups)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Postcode resolver utilities")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Build the outward-code index")
+    b.add_argument("postcodes", help="Text file with one postcode per line")
+    b.add_argument("-o", "--output", default=str(INDEX_PATH))
+
+    r = sub.add_parser("resolve", help="Resolve postcodes and print them")
+    r.add_argument("postcode", nargs="+")
+
+    args = p.parse_args()
+    if args.cmd == "build":
+        with open(args.postcodes) as fh:
+            n = build_index((line for line in fh if line.strip()), args.output)
+        print(f"Wrote {n} outward codes to {args.output}")
+    else:
+        for site in resolve_many(args.postcode, exact=True).values():
+            print(f"{site.postcode}: {site.lat:.5f}, {site.lon:.5f}  region {site.region}")
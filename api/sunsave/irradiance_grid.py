@@ -0,0 +1,242 @@
+"""
+Precomputed UK PV grid – per-kWp hourly profiles with zero network I/O.
+
+Layout
+------
+``SUNSAVE_IRRADIANCE_GRID`` points at one ``.npy`` file (plus a ``.json``
+sidecar describing it) holding a float32 array
+
+    [lat, lon, tilt, azim, hour]      kWh per kWp, NaN where not built
+
+on a regular lat/lon grid over Great Britain and Northern Ireland, for a
+small set of tilt/azimuth bins, one SARAH year.  The file is opened with
+``mmap_mode="r"``, so a lookup touches only the pages it reads and every
+worker process on the machine shares them through the OS page cache.
+
+Lookup
+------
+:func:`lookup` answers any site inside the grid by bilinear interpolation
+of the four surrounding cells (``SUNSAVE_GRID_INTERP=nearest`` for the
+nearest cell).  Cells that were never built – or are over the sea, where
+PVGIS has no answer – are left out and the remaining weights
+renormalised.  ``None`` means "ask PVGIS": no grid configured, site out of
+bounds, an orientation or year the grid does not carry.
+
+Build
+-----
+Offline, resumable (cells already filled are skipped):
+
+    python -m api.sunsave.irradiance_grid build grid.npy --step 0.25 \\
+        --tilt 25 --tilt 35 --tilt 45 --azim -45 --azim 0 --azim 45
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+BOUNDS = (49.8, 61.0, -8.4, 2.0)          # lat_min, lat_max, lon_min, lon_max
+STEP       = 0.25                         # degrees between cells
+TILTS      = (25, 35, 45)
+AZIMS      = (-45, 0, 45)
+ORIENT_TOL = 5                            # ° a request may sit off a bin
+
+GRID_PATH = os.environ.get("SUNSAVE_IRRADIANCE_GRID")
+INTERP    = os.environ.get("SUNSAVE_GRID_INTERP", "bilinear")
+
+_lock = threading.Lock()
+_grid: Optional[Tuple[np.ndarray, dict]] = None
+hits = misses = 0
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+# ─── reading ─────────────────────────────────────────────
+def load() -> Optional[Tuple[np.ndarray, dict]]:
+    """(memory-mapped array, metadata) for ``GRID_PATH``, or None if absent."""
+    global _grid
+    if GRID_PATH is None:
+        return None
+    with _lock:
+        if _grid is None:
+            path = Path(GRID_PATH)
+            try:
+                meta = json.loads(_meta_path(path).read_text())
+                arr = np.load(path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                log.warning("Irradiance grid unavailable (%s) – using PVGIS.", e)
+                _grid = (None, {})
+            else:
+                _grid = (arr, meta)
+        return _grid if _grid[0] is not None else None
+
+
+def _bin(values: Sequence[int], x: float) -> Optional[int]:
+    i = int(np.argmin([abs(v - x) for v in values]))
+    return i if abs(values[i] - x) <= ORIENT_TOL else None
+
+
+def lookup(lat: float, lon: float, tilt: float = 35, azim: float = 0,
+           year: int = 2023, raddatabase: str = "PVGIS-SARAH3",
+           method: str = INTERP) -> Optional[np.ndarray]:
+    """Hourly kWh per kWp (float32, read-only) for the site, or None."""
+    global hits, misses
+    grid = load()
+    found = None
+    if grid is not None:
+        found = _interpolate(*grid, lat, lon, tilt, azim, year, raddatabase, method)
+    with _lock:
+        if found is None:
+            misses += grid is not None
+        else:
+            hits += 1
+    return found
+
+
+def _interpolate(arr: np.ndarray, meta: dict, lat: float, lon: float,
+                 tilt: float, azim: float, year: int, raddatabase: str,
+                 method: str) -> Optional[np.ndarray]:
+    if meta["year"] != year or meta["raddatabase"] != raddatabase:
+        return None
+    t, a = _bin(meta["tilts"], tilt), _bin(meta["azims"], azim)
+    if t is None or a is None:
+        return None
+
+    fy = (lat - meta["lat0"]) / meta["step"]
+    fx = (lon - meta["lon0"]) / meta["step"]
+    ny, nx = arr.shape[:2]
+    if not (0 <= fy <= ny - 1 and 0 <= fx <= nx - 1):
+        return None
+
+    if method == "nearest":
+        cells = [(int(round(fy)), int(round(fx)), 1.0)]
+    else:
+        y0, x0 = min(int(fy), ny - 2), min(int(fx), nx - 2)
+        dy, dx = fy - y0, fx - x0
+        cells = [(y0, x0, (1 - dy) * (1 - dx)), (y0, x0 + 1, (1 - dy) * dx),
+                 (y0 + 1, x0, dy * (1 - dx)), (y0 + 1, x0 + 1, dy * dx)]
+
+    out, total = None, 0.0
+    for y, x, w in cells:
+        if w <= 0:
+            continue
+        profile = arr[y, x, t, a]
+        if not np.isfinite(profile[0]):            # unbuilt or sea cell
+            continue
+        out = profile * np.float32(w) if out is None else out + profile * np.float32(w)
+        total += w
+    if out is None:
+        return None
+    out = out / np.float32(total)
+    out.flags.writeable = False
+    return out
+
+
+def reset() -> None:
+    """Forget the mapped grid (next lookup re-opens ``GRID_PATH``)."""
+    global _grid
+    with _lock:
+        _grid = None
+
+
+# ─── building ────────────────────────────────────────────
+def build(path: Path | str, step: float = STEP, tilts: Sequence[int] = TILTS,
+          azims: Sequence[int] = AZIMS, year: int = 2023,
+          raddatabase: str = "PVGIS-SARAH3", bounds: Tuple[float, ...] = BOUNDS,
+          workers: int = 4) -> Dict[str, int]:
+    """
+    Fill *path* from PVGIS, one ``seriescalc`` call per cell × orientation.
+    Re-running with the same layout resumes; returns fetched/skipped/failed.
+    """
+    from . import scheduler
+    from .profiles import fetch_unit_profile, year_hours   # profiles imports us
+    from .upstream import UpstreamError
+
+    path = Path(path)
+    lat_min, lat_max, lon_min, lon_max = bounds
+    lats = np.round(np.arange(lat_min, lat_max + step / 2, step), 4)
+    lons = np.round(np.arange(lon_min, lon_max + step / 2, step), 4)
+    meta = {"lat0": float(lats[0]), "lon0": float(lons[0]), "step": step,
+            "tilts": list(tilts), "azims": list(azims),
+            "year": year, "raddatabase": raddatabase}
+    shape = (len(lats), len(lons), len(tilts), len(azims), year_hours(year))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    old = json.loads(_meta_path(path).read_text()) if _meta_path(path).exists() else None
+    if path.exists() and old == meta:
+        arr = np.load(path, mmap_mode="r+")
+    else:
+        arr = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+        arr[:] = np.nan
+        _meta_path(path).write_text(json.dumps(meta))
+
+    jobs = [(i, j, k, m) for i in range(len(lats)) for j in range(len(lons))
+            for k in range(len(tilts)) for m in range(len(azims))
+            if not np.isfinite(arr[i, j, k, m, 0])]
+    counts = {"fetched": 0, "skipped": int(np.prod(shape[:4])) - len(jobs), "failed": 0}
+
+    def one(job):
+        i, j, k, m = job
+        return job, fetch_unit_profile(float(lats[i]), float(lons[j]), tilts[k],
+                                       azims[m], year, raddatabase)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        one_bg = scheduler.in_lane("prefetch", one)         # cache warmer: lowest lane
+        futures = [pool.submit(one_bg, job) for job in jobs]
+        for n, fut in enumerate(as_completed(futures), 1):
+            try:
+                (i, j, k, m), profile = fut.result()
+            except UpstreamError:                    # sea / outside PVGIS coverage
+                counts["failed"] += 1
+                continue
+            arr[i, j, k, m] = profile
+            counts["fetched"] += 1
+            if n % 200 == 0:
+                arr.flush()
+                log.info("%d/%d cells", n, len(jobs))
+    arr.flush()
+    return counts
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Precomputed UK PV grid")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Download the grid from PVGIS (resumable)")
+    b.add_argument("path", type=Path)
+    b.add_argument("--step", type=float, default=STEP)
+    b.add_argument("--tilt", type=int, action="append")
+    b.add_argument("--azim", type=int, action="append")
+    b.add_argument("--year", type=int, default=2023)
+    b.add_argument("--workers", type=int, default=4)
+
+    q = sub.add_parser("lookup", help="Print the annual kWh/kWp at a site")
+    q.add_argument("lat", type=float)
+    q.add_argument("lon", type=float)
+    q.add_argument("--path", default=GRID_PATH)
+
+    args = p.parse_args()
+    if args.cmd == "build":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        print(build(args.path, args.step, args.tilt or TILTS, args.azim or AZIMS,
+                    args.year, workers=args.workers))
+    else:
+        GRID_PATH = args.path
+        grid = load()
+        profile = grid and _interpolate(*grid, args.lat, args.lon, 35, 0,
+                                        grid[1]["year"], grid[1]["raddatabase"], INTERP)
+        print("outside grid" if profile is None else f"{profile.sum():.1f} kWh/kWp")
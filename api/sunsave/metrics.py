@@ -0,0 +1,207 @@
+"""
+Hot-path stage timing – ``Server-Timing`` headers and Prometheus metrics.
+
+    with metrics.stage("pvgis_download"):
+        r = upstream.get(...)
+
+Every stage is observed twice:
+
+• into the current request's timing list, which :func:`instrument` turns
+  into a ``Server-Timing`` header (visible in the browser's network tab)
+• into a process-wide histogram, rendered with the cache and upstream
+  counters by :func:`render` for ``/api/metrics``
+
+Cost per stage is two ``perf_counter`` calls, a bisect and a short lock –
+around a microsecond – so it stays on in production.  Work handed to a
+thread pool keeps reporting to its request when submitted through
+:func:`submit`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# ─────────────────────────────────────────────────────────
+BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                              0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "sunsave"
+
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar("sunsave_timings", default=None)
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by one label value."""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name, self.help, self.label = name, help, label
+        self._series: Dict[str, List[float]] = {}    # value → counts…, sum, count
+
+    def observe(self, key: str, seconds: float) -> None:
+        i = bisect_left(BUCKETS, seconds)
+        with _lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * (len(BUCKETS) + 1) + [0.0, 0]
+            s[i] += 1
+            s[-2] += seconds
+            s[-1] += 1
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with _lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for key, s in sorted(series.items()):
+            lbl = f'{self.label}="{key}"'
+            running = 0
+            for le, n in zip((*map(str, BUCKETS), "+Inf"), s[:len(BUCKETS) + 1]):
+                running += n
+                yield f'{self.name}_bucket{{{lbl},le="{le}"}} {running}'
+            yield f"{self.name}_sum{{{lbl}}} {s[-2]:.6f}"
+            yield f"{self.name}_count{{{lbl}}} {s[-1]}"
+
+
+stages   = Histogram(f"{PREFIX}_stage_seconds", "Time spent per backend stage.", "stage")
+routes   = Histogram(f"{PREFIX}_request_seconds", "Whole-request latency per route.", "route")
+
+
+# ─── recording ───────────────────────────────────────────
+def observe(name: str, seconds: float) -> None:
+    stages.observe(name, seconds)
+    current = _timings.get()
+    if current is not None:
+        current.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of :func:`stage`."""
+    def wrap(fn: Callable) -> Callable:
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def submit(pool: Executor, fn: Callable, *args, **kwargs) -> Future:
+    """``pool.submit`` that keeps the caller's request timing context."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    """``Server-Timing`` value; repeated stages are summed, order kept."""
+    total: Dict[str, float] = {}
+    for name, seconds in timings:
+        total[name] = total.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={s * 1000:.1f}" for name, s in total.items())
+
+
+# ─── exposition ──────────────────────────────────────────
+def _counter_lines() -> Iterator[str]:
+    from . import geo, irradiance_grid, pv_cache, scheduler, singleflight, upstream
+    from .octopus_prices import store
+    from .response_cache import responses
+
+    def family(name: str, help: str, kind: str, rows: List[Tuple[str, float]]):
+        yield f"# HELP {PREFIX}_{name} {help}"
+        yield f"# TYPE {PREFIX}_{name} {kind}"
+        for labels, value in rows:
+            yield f"{PREFIX}_{name}{{{labels}}} {value}"
+
+    p = pv_cache.profiles
+    yield from family("cache_events_total", "Cache lookups by cache and outcome.", "counter", [
+        ('cache="pv_profile",result="hit"',      p.hits),
+        ('cache="pv_profile",result="disk_hit"', p.disk_hits),
+        ('cache="pv_profile",result="miss"',     p.misses),
+        ('cache="pv_grid",result="hit"',         irradiance_grid.hits),
+        ('cache="pv_grid",result="miss"',        irradiance_grid.misses),
+        ('cache="agile_prices",result="hit"',    store.hits),
+        ('cache="agile_prices",result="stale_hit"', store.stale_hits),
+        ('cache="agile_prices",result="miss"',   store.misses),
+        ('cache="agile_prices",result="error"',  store.errors),
+        *((f'cache="postcode",result="{k}"', v) for k, v in geo.counters.items()),
+        ('cache="response",result="hit"',          responses.hits),
+        ('cache="response",result="not_modified"', responses.not_modified),
+        ('cache="response",result="miss"',         responses.misses),
+        ('cache="response",result="eviction"',     responses.evictions),
+    ])
+
+    yield from family("singleflight_calls_total",
+                      "Cache-miss fetches by group; followers shared a leader's call.",
+                      "counter", [
+        row for g in singleflight.groups
+        for row in ((f'group="{g.name}",role="leader"', g.leaders),
+                    (f'group="{g.name}",role="follower"', g.followers))])
+
+    up = upstream.stats()
+    for field, name, kind, help in (
+            ("requests",        "upstream_requests_total",        "counter", "Upstream HTTP calls"),
+            ("errors",          "upstream_errors_total",          "counter", "Upstream calls that failed"),
+            ("retries",         "upstream_retries_total",         "counter", "Upstream attempts retried"),
+            ("latency_s_total", "upstream_latency_seconds_total", "counter", "Upstream time spent"),
+            ("latency_s_max",   "upstream_latency_seconds_max",   "gauge",   "Slowest upstream attempt")):
+        yield from family(name, f"{help} per host.", kind,
+                          [(f'host="{h}"', st[field]) for h, st in sorted(up.items())])
+
+    sched = sorted(scheduler.stats().items())
+    for field, name, kind, help in (
+            ("queued",  "upstream_queue_depth",               "gauge",   "Calls waiting for a rate-limit token"),
+            ("granted", "upstream_tokens_granted_total",      "counter", "Rate-limit tokens granted"),
+            ("wait_s",  "upstream_queue_wait_seconds_total",  "counter", "Time spent waiting for a token")):
+        yield from family(name, f"{help} per host and lane.", kind,
+                          [(f'host="{h}",lane="{ln}"', v) for h, st in sched
+                           for ln, v in st[field].items()])
+    yield from family("upstream_throttled_total", "429 answers per host.", "counter",
+                      [(f'host="{h}"', st["throttled"]) for h, st in sched])
+    yield from family("upstream_rate_limit", "Current token rate (req/s) per host.", "gauge",
+                      [(f'host="{h}"', round(st["rate"], 3)) for h, st in sched])
+
+
+def render() -> str:
+    """Prometheus text exposition of every histogram and counter."""
+    return "\n".join([*stages.lines(), *routes.lines(), *_counter_lines()]) + "\n"
+
+
+def instrument(app) -> None:
+    """
+    Hook *app* so each request collects its stage timings, answers with
+    ``Server-Timing`` and feeds the per-route histogram.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start():
+        g.sunsave_t0 = time.perf_counter()
+        _timings.set([])
+
+    @app.after_request
+    def _finish(resp):
+        t0 = g.pop("sunsave_t0", None)
+        if t0 is None:
+            return resp
+        elapsed = time.perf_counter() - t0
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        routes.observe(rule, elapsed)
+        resp.headers["Server-Timing"] = server_timing([*(_timings.get() or []),
+                                                       ("total", elapsed)])
+        resp.headers["Timing-Allow-Origin"] = "*"       # readable cross-origin
+        return resp
@@ -4,84 +4,141 @@ Fetch half-hourly Agile Octopus prices, OR supply a simple mock tariff.
 
 from __future__ import annotations
 import datetime as dt
-from typing import Optional, Dict
+import os
+from typing import TYPE_CHECKING, Optional
 
 import numpy as np
-import pandas as pd
-import requests
+from . import metrics, upstream
+from .geo import _DNO_TO_REGION, resolve
+from .price_store import PriceStore, PricesUnavailable  # noqa: F401 – re-export
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ─────────────────────────────────────────────────────────
 PRODUCT_CODE = "AGILE-24-10-01"
-_DNO_TO_REGION: Dict[int, str] = {
-    10: "A", 11: "B", 12: "C", 13: "D", 14: "E", 15: "F",
-    16: "G", 17: "H", 18: "J", 19: "K", 20: "L", 21: "M",
-    22: "N", 23: "P",
-}
+
+# background fetch of tomorrow's prices for every region (see price_store).
+# Opt-in: a serverless function has no life between requests to run it in.
+REFRESHER_ENABLED = os.environ.get("SUNSAVE_PRICE_REFRESHER", "0") == "1"
 
 # ─── helper ──────────────────────────────────────────────
 def _postcode_to_region(postcode: str) -> str:
-    r = requests.get(f"https://api.postcodes.io/postcodes/{postcode}", timeout=10)
-    r.raise_for_status()
-    dno = r.json()["result"]["codes"]["nuts"]      # e.g. UKI31
-    dno_num = int(dno[-2:])                        # last two digits
-    return _DNO_TO_REGION.get(dno_num, "C")        # default London
+    return resolve(postcode).region
 
 
 # ─── Agile Octopus – LIVE data ───────────────────────────
-def agile_prices(
-    date: dt.date,
-    region: Optional[str] = None,
-    postcode: Optional[str] = None,
-) -> pd.Series:
+def _day_start(date: dt.date) -> dt.datetime:
+    return dt.datetime.combine(date, dt.time.min, tzinfo=dt.timezone.utc)
+
+
+def _fetch_day(product: str, region: str, date: dt.date) -> np.ndarray:
     """
-    Return a 48-point Series of £/kWh (VAT-inc) for *date* in UTC.
-    Missing half-hours are forward-filled then back-filled.
+    One REST call → 48 × £/kWh (VAT-inc) for *date* in UTC, NaN where
+    Octopus has not published a slot.
     """
-    if region is None:
-        if postcode is None:
-            raise ValueError("Need either region or postcode")
-        region = _postcode_to_region(postcode)
-
-    tariff_code = f"E-1R-{PRODUCT_CODE}-{region}"
-    period_from = dt.datetime.combine(date, dt.time.min, tzinfo=dt.timezone.utc)
+    tariff_code = f"E-1R-{product}-{region}"
+    period_from = _day_start(date)
     period_to   = period_from + dt.timedelta(days=1, minutes=-30)
 
     url = (
-        f"https://api.octopus.energy/v1/products/{PRODUCT_CODE}"
+        f"https://api.octopus.energy/v1/products/{product}"
         f"/electricity-tariffs/{tariff_code}/standard-unit-rates/"
     )
     params = {
         "period_from": period_from.isoformat(timespec="seconds").replace("+00:00", "Z"),
         "period_to":   period_to.isoformat(timespec="seconds").replace("+00:00", "Z"),
     }
-    r = requests.get(url, params=params, timeout=20)
-    r.raise_for_status()
-    raw = r.json()["results"]
+    with metrics.stage("octopus_download"):
+        raw = upstream.get(url, params=params, timeout=20).json()["results"]
 
-    prices = {
-        pd.to_datetime(item["valid_from"], utc=True): item["value_inc_vat"] / 100
-        for item in raw
-    }
-    s = pd.Series(prices).sort_index()
-    s.name = "agile_£pkwh"
+    values = np.full(48, np.nan)
+    for item in raw:
+        ts   = dt.datetime.fromisoformat(item["valid_from"].replace("Z", "+00:00"))
+        slot = int((ts - period_from).total_seconds() // 1800)
+        if 0 <= slot < 48:
+            values[slot] = item["value_inc_vat"] / 100
+    return values
+
+
+store = PriceStore(_fetch_day, _DNO_TO_REGION.values())
+
+
+def _fill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill then back-fill NaN slots (all-NaN stays NaN)."""
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values)
+    if ok.all() or not ok.any():
+        return values.copy()
+    idx = np.where(ok, np.arange(len(values)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    filled = values[idx]
+    filled[:np.argmax(ok)] = values[np.argmax(ok)]
+    return filled
+
+
+def agile_prices_array(
+    date: dt.date,
+    region: Optional[str] = None,
+    postcode: Optional[str] = None,
+) -> np.ndarray:
+    """
+    48 × £/kWh (VAT-inc) for *date* in UTC as a plain array, gaps
+    forward- then back-filled.  Same source and errors as
+    :func:`agile_prices`, without pandas.
+    """
+    if region is None:
+        if postcode is None:
+            raise ValueError("Need either region or postcode")
+        region = _postcode_to_region(postcode)
+
+    if REFRESHER_ENABLED:
+        store.start_refresher(PRODUCT_CODE)
+    with metrics.stage("agile_prices"):
+        values = store.get(PRODUCT_CODE, region, date)
+    return _fill(values)
+
+
+def agile_prices(
+    date: dt.date,
+    region: Optional[str] = None,
+    postcode: Optional[str] = None,
+) -> pd.Series:
+    """
+    Return a 48-point Series of £/kWh (VAT-inc) for *date* in UTC.
+    Missing half-hours are forward-filled then back-filled.
+
+    Served from the shared :data:`store`; raises ``PricesUnavailable`` only
+    when nothing has ever been fetched for this day and Octopus is down.
+    """
+    import pandas as pd
 
-    full_idx = pd.date_range(period_from, periods=48, freq="30min", tz="UTC")
-    return s.reindex(full_idx).ffill().bfill()
+    values = agile_prices_array(date, region, postcode)
+    full_idx = pd.date_range(_day_start(date), periods=48, freq="30min", tz="UTC")
+    return pd.Series(values, index=full_idx, name="agile_£pkwh")
 
 
 # ─── Mock 3-tier tariff – always available ───────────────
+def mock_prices_array(hours: np.ndarray | None = None) -> np.ndarray:
+    """The mock tariff for the UTC *hours* of each slot (default: one day)."""
+    if hours is None:
+        hours = np.arange(48) // 2
+    return np.where((hours >= 16) & (hours < 20), 0.30,
+                    np.where((hours < 6), 0.12, 0.15))
+
+
 def mock_prices(index: pd.DatetimeIndex | None = None) -> pd.Series:
     """
     Returns a 48-slot mock tariff.
     If *index* is provided we reuse it (so it always matches PV),
     otherwise we build midnight-UTC today.
     """
+    import pandas as pd
+
     if index is None:
         start = dt.datetime.utcnow().replace(hour=0, minute=0, second=0,
                                              microsecond=0, tzinfo=dt.timezone.utc)
         index = pd.date_range(start, periods=48, freq="30min", tz="UTC")
 
-    hrs  = index.hour
-    vals = np.where((hrs >= 16) & (hrs < 20), 0.30,
-            np.where((hrs < 6), 0.12, 0.15))
-    return pd.Series(vals, index, name="mock_£pkwh")
+    return pd.Series(mock_prices_array(np.asarray(index.hour)), index,
+                     name="mock_£pkwh")
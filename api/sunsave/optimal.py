@@ -0,0 +1,135 @@
+"""
+Price-aware optimal dispatch – dynamic programming over a discretised SOC.
+
+Where ``greedy_kernel`` only soaks up surplus PV and discharges at the
+first deficit, this engine sees the whole price curve: it will charge
+from the grid in cheap Agile slots and hold energy back for the 16:00–19:00
+peak when that pays.
+
+Model (same battery physics and economics as the greedy engine)
+---------------------------------------------------------------
+state     SOC on ``n_levels`` evenly spaced points in [0, cap_kwh]
+action    Δ levels per slot; charging draws Δ/√eta from the AC side,
+          discharging delivers |Δ|; both limited to pow_kw × dt
+grid      demand – pv + ac_in – ac_out   (+ import / – export)
+cost      import × price – export × export_price
+
+Backward pass: one (actions × states) array op per slot over a sliding
+window of the next-slot value function.  Forward pass: follow the stored
+argmin policy from ``soc0``.  48 slots × 101 levels run in a couple of
+milliseconds; a 17,520-slot year in well under a second.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ─────────────────────────────────────────────────────────
+N_LEVELS = 101                       # SOC grid points incl. empty and full
+MAX_LEVELS = 4001                    # finest grid a slow battery may ask for
+
+
+def optimal_arrays(
+    pv: np.ndarray,
+    prices: np.ndarray,
+    demand: np.ndarray | None = None,
+    cap_kwh: float = 5.0,
+    pow_kw:  float = 3.0,
+    eta:     float = 0.92,
+    dt_h:    float = 0.5,
+    soc0:    float = 0.0,
+    *,
+    export_prices: np.ndarray | None = None,
+    grid_charge: bool = True,
+    export_discharge: bool = True,
+    n_levels: int = N_LEVELS,
+) -> dict:
+    """
+    Cost-minimising schedule.  Same return keys as
+    :func:`dispatch.dispatch_arrays`.
+
+    ``grid_charge=False``      – battery may only charge from surplus PV
+    ``export_discharge=False`` – battery may only discharge into the home
+
+    The SOC grid is refined past *n_levels* when one level is more than a
+    slot's worth of charging, so a slow battery can still move.
+    """
+    pv     = np.ascontiguousarray(pv, dtype=np.float64)
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    demand = (np.zeros_like(pv) if demand is None
+              else np.ascontiguousarray(demand, dtype=np.float64))
+    p_exp  = prices if export_prices is None else np.asarray(export_prices, dtype=np.float64)
+
+    if not (pv.shape == prices.shape == demand.shape == p_exp.shape):
+        raise ValueError("pv, prices, demand must share the same shape")
+    if cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
+        raise ValueError("cap_kwh>0, pow_kw>0, 0<eta≤1")
+    if n_levels < 2:
+        raise ValueError("n_levels must be ≥ 2")
+
+    n   = len(pv)
+    eff = eta ** 0.5
+    step_limit = pow_kw * dt_h
+    # at least one level per slot at full charging power
+    n_levels = max(n_levels, int(np.ceil(cap_kwh / (step_limit * eff) - 1e-9)) + 1)
+    if n_levels > MAX_LEVELS:
+        raise ValueError(f"pow_kw too small for cap_kwh: needs over {MAX_LEVELS} SOC levels")
+    S   = n_levels - 1                             # index of the "full" level
+    h   = cap_kwh / S                              # kWh per level
+    # a move can never exceed the SOC grid, however large pow_kw is
+    kc = min(int(np.floor(step_limit * eff / h + 1e-9)), S)   # max levels up per slot
+    kd = min(int(np.floor(step_limit / h + 1e-9)), S)         # max levels down per slot
+
+    d = np.arange(-kd, kc + 1)                     # action = level change
+    ac = np.where(d > 0, d * h / eff, d * h)       # AC-side battery energy (+in/−out)
+    net = pv - demand
+
+    # grid energy for every (slot, action), and its cost
+    grid = ac[None, :] - net[:, None]
+    cost = np.where(grid > 0, grid * prices[:, None], grid * p_exp[:, None])
+    if not grid_charge:                            # charge ≤ surplus PV
+        cost[(ac[None, :] > np.maximum(net, 0)[:, None]) & (d > 0)[None, :]] = np.inf
+    if not export_discharge:                       # discharge ≤ deficit
+        cost[(-ac[None, :] > np.maximum(-net, 0)[:, None]) & (d < 0)[None, :]] = np.inf
+
+    # ── backward pass ──
+    policy = np.empty((n, S + 1), dtype=np.min_scalar_type(kd + kc))
+    value  = np.zeros(S + 1)                       # nothing is paid for leftover SOC
+    padded = np.full(S + 1 + kd + kc, np.inf)
+    for t in range(n - 1, -1, -1):
+        padded[kd:kd + S + 1] = value
+        window = sliding_window_view(padded, S + 1)    # row j ↔ action d[j]
+        total  = window + cost[t][:, None]
+        best   = np.argmin(total, axis=0)
+        value  = total[best, np.arange(S + 1)]
+        policy[t] = best
+
+    # ── forward pass ──
+    s = int(round(min(max(soc0, 0.0), cap_kwh) / h))
+    levels = np.empty(n, dtype=np.int64)
+    moves  = np.empty(n, dtype=np.int64)
+    for t in range(n):
+        j = int(policy[t, s])
+        moves[t] = j
+        s += j - kd
+        levels[t] = s
+
+    flow = ac[moves]
+    g    = flow - net
+    import_grid = np.maximum(g, 0.0)
+    export_grid = np.maximum(-g, 0.0)
+
+    base = demand - pv
+    baseline_cost  = float(np.dot(np.maximum(base, 0), prices) - np.dot(np.maximum(-base, 0), p_exp))
+    with_batt_cost = float(np.dot(import_grid, prices) - np.dot(export_grid, p_exp))
+
+    return {
+        "import_grid": import_grid,
+        "export_grid": export_grid,
+        "soc_kwh": levels * h,
+        "baseline_cost": baseline_cost,
+        "with_batt_cost": with_batt_cost,
+        "money_saved": baseline_cost - with_batt_cost,
+        "kwh_shifted": float(-flow[flow < 0].sum()),
+    }
@@ -0,0 +1,187 @@
+"""
+Concurrent upstream fetch for one site.
+
+    postcode ──► resolve (lat, lon, region)
+                   ├──► PVGIS hourly year      ┐ in parallel
+                   │    (one per roof plane    │
+                   │     orientation)          │
+                   └──► Agile prices for day   ┘
+
+The PVGIS leg only needs lat/lon and the Octopus leg only the region, so
+after the single postcode lookup both run side by side on a shared thread
+pool.  Wall-clock time is the geocode plus the *slower* leg, not the sum.
+
+Every stage has a timeout (``STAGE_TIMEOUTS``) and the whole fetch a
+budget.  When one is exceeded the pending legs are cancelled and
+:class:`UpstreamTimeout` is raised; a leg that is already mid-request
+finishes in the background and still warms its cache for the next caller.
+
+Nothing here imports pandas: the inputs are plain arrays, and the
+``pv_hourly`` / ``pv_halfhour`` / ``prices`` Series views are built on
+first use for the callers that want them.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+import numpy as np
+
+from . import metrics
+from .geo import Site, resolve
+from .octopus_prices import PricesUnavailable, agile_prices_array, mock_prices_array
+from .profiles import Plane, combine, day_slice_array, orientations, unit_profile
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "geocode": 10.0,
+    "pvgis":   35.0,
+    "prices":  20.0,
+}
+BUDGET_S = 40.0                          # whole fetch, all stages
+
+fetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SUNSAVE_FETCH_WORKERS", 16)),
+    thread_name_prefix="upstream-fetch")
+
+
+class UpstreamTimeout(TimeoutError):
+    """A stage of the fetch pipeline ran past its timeout or the budget."""
+
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(f"{stage} did not answer within {seconds:.1f}s")
+        self.stage = stage
+
+
+@dataclass(slots=True)
+class SiteInputs:
+    site: Site
+    pv_year: np.ndarray                  # one SARAH year, hourly kWh
+    year: int
+    price_day: np.ndarray                # 48 × £/kWh for *when*
+    when: dt.date
+    fallback: bool = False               # True → mock tariff stood in
+
+    @property
+    def pv_day(self) -> np.ndarray:
+        """PV for *when* as 48 half-hour kWh."""
+        return day_slice_array(self.pv_year, self.year, self.when)
+
+    @property
+    def day_start(self) -> dt.datetime:
+        return dt.datetime.combine(self.when, dt.time.min, tzinfo=dt.timezone.utc)
+
+    # pandas views – only built when asked for
+    @property
+    def pv_hourly(self) -> pd.Series:
+        import pandas as pd
+        from .simulate import _year_index
+        return pd.Series(self.pv_year, index=_year_index(self.year, len(self.pv_year)),
+                         name="pv_kwh")
+
+    @property
+    def pv_halfhour(self) -> pd.Series:
+        """PV for *when* on the price index (48 half-hours)."""
+        import pandas as pd
+        return pd.Series(self.pv_day, index=_day_index(self.when), name="pv_kwh")
+
+    @property
+    def prices(self) -> pd.Series:
+        import pandas as pd
+        name = "mock_£pkwh" if self.fallback else "agile_£pkwh"
+        return pd.Series(self.price_day, index=_day_index(self.when), name=name)
+
+
+# ─── helpers ─────────────────────────────────────────────
+def _wait(fut: Future, stage: str, deadline: float,
+          timeouts: Dict[str, float]):
+    limit = min(timeouts[stage], max(deadline - time.monotonic(), 0.0))
+    try:
+        return fut.result(timeout=limit)
+    except FutureTimeout:
+        fut.cancel()
+        raise UpstreamTimeout(stage, limit) from None
+
+
+def price_array_or_mock(when: dt.date, region: str) -> tuple[np.ndarray, bool]:
+    """``(48 prices, fallback)`` – Agile for *region*, or the flagged mock tariff."""
+    try:
+        prices = agile_prices_array(when, region=region)
+        if np.isnan(prices).any():               # day not published yet
+            raise PricesUnavailable("incomplete Agile dataset")
+        return prices, False
+    except PricesUnavailable as e:               # Octopus down, nothing held
+        log.warning("Agile unavailable (%s) – using mock prices.", e)
+        return mock_prices_array(), True
+
+
+def prices_or_mock(when: dt.date, region: str) -> tuple[pd.Series, bool]:
+    """:func:`price_array_or_mock` as a Series on *when*'s half-hours."""
+    import pandas as pd
+    prices, fallback = price_array_or_mock(when, region)
+    name = "mock_£pkwh" if fallback else "agile_£pkwh"
+    return pd.Series(prices, index=_day_index(when), name=name), fallback
+
+
+def _day_index(when: dt.date) -> pd.DatetimeIndex:
+    import pandas as pd
+    start = dt.datetime.combine(when, dt.time.min, tzinfo=dt.timezone.utc)
+    return pd.date_range(start, periods=48, freq="30min", tz="UTC")
+
+
+# ─── public API ──────────────────────────────────────────
+def fetch_site_inputs(
+    postcode: str,
+    kwp: float,
+    *,
+    when: Optional[dt.date] = None,
+    tariff: str = "agile",
+    year: int = 2023,
+    budget_s: float = BUDGET_S,
+    timeouts: Optional[Dict[str, float]] = None,
+    planes: Optional[Sequence[Plane]] = None,
+) -> SiteInputs:
+    """
+    Resolve *postcode*, then fetch the PVGIS year and the day's prices
+    concurrently.  ``tariff="mock"`` skips Octopus entirely.  *planes*
+    (roof faces) replace the single south-facing *kwp* array.
+    """
+    when = when or dt.date.today()
+    timeouts = {**STAGE_TIMEOUTS, **(timeouts or {})}
+    deadline = time.monotonic() + budget_s
+
+    with metrics.stage("geocode"):
+        site = _wait(metrics.submit(fetch_pool, resolve, postcode),
+                     "geocode", deadline, timeouts)
+
+    planes = planes or [Plane(kwp)]
+    pv_fs = {k: metrics.submit(fetch_pool, unit_profile, site.lat, site.lon, *k, year=year)
+             for k in orientations(planes)}
+    price_f = (metrics.submit(fetch_pool, price_array_or_mock, when, site.region)
+               if tariff == "agile" else None)
+
+    try:
+        units = {k: _wait(f, "pvgis", deadline, timeouts) for k, f in pv_fs.items()}
+        if price_f is None:
+            prices, fallback = mock_prices_array(), False
+        else:
+            prices, fallback = _wait(price_f, "prices", deadline, timeouts)
+    except BaseException:
+        for f in (*pv_fs.values(), price_f):
+            if f is not None:
+                f.cancel()
+        raise
+
+    return SiteInputs(site, combine(planes, units), year, prices, when, fallback)
@@ -0,0 +1,214 @@
+"""
+Local archive of historical Agile unit rates.
+
+Layout
+------
+``SUNSAVE_PRICE_ARCHIVE`` (default ``$SUNSAVE_CACHE_DIR/agile``) holds one
+flat float32 file per product/region:
+
+    <dir>/<product>/<region>.f32      slot i = ORIGIN + i × 30 min, £/kWh
+
+Missing slots are NaN.  Files are memory-mapped for reads, so a range
+query is an array slice and needs no network access.
+
+Backfill
+--------
+``backfill`` pulls ``standard-unit-rates`` for any date range, following
+the API's ``next`` links, for all 14 regions in parallel:
+
+    python -m api.sunsave.price_archive backfill --from 2024-10-01 --to 2025-10-01
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import upstream
+from .geo import _DNO_TO_REGION
+from .octopus_prices import PRODUCT_CODE
+from .pv_cache import CACHE_DIR
+
+# ─────────────────────────────────────────────────────────
+ORIGIN   = dt.datetime(2018, 1, 1, tzinfo=dt.timezone.utc)   # Agile launched 2018
+SLOT     = dt.timedelta(minutes=30)
+PAGE_SIZE = 1500
+REGIONS  = tuple(_DNO_TO_REGION.values())
+
+ARCHIVE_DIR = Path(os.environ.get("SUNSAVE_PRICE_ARCHIVE", CACHE_DIR / "agile"))
+
+_lock = threading.Lock()
+_maps: Dict[Path, np.memmap] = {}
+
+
+def _as_utc(when: dt.date | dt.datetime) -> dt.datetime:
+    if isinstance(when, dt.datetime):
+        return when if when.tzinfo else when.replace(tzinfo=dt.timezone.utc)
+    return dt.datetime.combine(when, dt.time.min, tzinfo=dt.timezone.utc)
+
+
+def slot_of(when: dt.date | dt.datetime) -> int:
+    """Slot number of *when* (floored to the half-hour)."""
+    return int((_as_utc(when) - ORIGIN) // SLOT)
+
+
+def _path(product: str, region: str) -> Path:
+    return ARCHIVE_DIR / product / f"{region}.f32"
+
+
+# ─── storage ─────────────────────────────────────────────
+def _write(product: str, region: str, slots: np.ndarray, values: np.ndarray) -> None:
+    """Write *values* at *slots*, growing the file with NaN as needed."""
+    if not len(slots):
+        return
+    path = _path(product, region)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    need = int(slots.max()) + 1
+    with _lock:
+        have = path.stat().st_size // 4 if path.exists() else 0
+        if need > have:
+            with open(path, "ab") as fh:
+                np.full(need - have, np.nan, dtype=np.float32).tofile(fh)
+        mm = np.memmap(path, dtype=np.float32, mode="r+")
+        mm[slots] = values
+        mm.flush()
+        del mm
+        _maps.pop(path, None)                 # readers re-map at the new size
+
+
+def _read_map(product: str, region: str) -> Optional[np.memmap]:
+    path = _path(product, region)
+    with _lock:
+        mm = _maps.get(path)
+        if mm is None:
+            if not path.exists() or path.stat().st_size == 0:
+                return None
+            mm = _maps[path] = np.memmap(path, dtype=np.float32, mode="r")
+        return mm
+
+
+def prices_array(region: str, start: dt.date | dt.datetime, end: dt.date | dt.datetime,
+                 product: str = PRODUCT_CODE) -> np.ndarray:
+    """£/kWh for every half-hour in ``[start, end)``; NaN where not archived."""
+    a, b = slot_of(start), slot_of(end)
+    out = np.full(max(b - a, 0), np.nan, dtype=np.float32)
+    mm = _read_map(product, region)
+    if mm is not None and a < len(mm):
+        lo, hi = max(a, 0), min(b, len(mm))
+        out[lo - a:hi - a] = mm[lo:hi]
+    return out
+
+
+def prices(region: str, start: dt.date | dt.datetime, end: dt.date | dt.datetime,
+           product: str = PRODUCT_CODE) -> pd.Series:
+    """:func:`prices_array` as a half-hourly UTC Series."""
+    values = prices_array(region, start, end, product)
+    idx = pd.date_range(ORIGIN + slot_of(start) * SLOT, periods=len(values),
+                        freq="30min", tz="UTC")
+    return pd.Series(values.astype(float), index=idx, name="agile_£pkwh")
+
+
+def coverage(region: str, product: str = PRODUCT_CODE) -> Tuple[Optional[dt.datetime], int]:
+    """(first archived slot as datetime, number of non-NaN slots)."""
+    mm = _read_map(product, region)
+    if mm is None:
+        return None, 0
+    finite = np.flatnonzero(np.isfinite(mm))
+    if not len(finite):
+        return None, 0
+    return ORIGIN + int(finite[0]) * SLOT, len(finite)
+
+
+def calendar_year(region: str, year: int, product: str = PRODUCT_CODE,
+                  max_gap: float = 0.01) -> Optional[np.ndarray]:
+    """
+    A whole calendar year of prices, gaps forward/back-filled, or None if
+    more than *max_gap* of the year is missing.
+    """
+    values = prices_array(region, dt.date(year, 1, 1), dt.date(year + 1, 1, 1), product)
+    missing = ~np.isfinite(values)
+    if not len(values) or missing.mean() > max_gap:
+        return None
+    return pd.Series(values.astype(float)).ffill().bfill().to_numpy()
+
+
+# ─── backfill ────────────────────────────────────────────
+def _fetch_range(product: str, region: str, start: dt.datetime,
+                 end: dt.datetime) -> Tuple[np.ndarray, np.ndarray]:
+    """All unit rates in ``[start, end)`` for one region, following ``next``."""
+    tariff_code = f"E-1R-{product}-{region}"
+    url: Optional[str] = (
+        f"https://api.octopus.energy/v1/products/{product}"
+        f"/electricity-tariffs/{tariff_code}/standard-unit-rates/"
+    )
+    params: Optional[dict] = {
+        "period_from": start.isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "period_to":   end.isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "page_size":   PAGE_SIZE,
+    }
+    slots, values = [], []
+    first, last = slot_of(start), slot_of(end)
+    while url:
+        page = upstream.get(url, params=params, timeout=30).json()
+        for item in page["results"]:
+            a = slot_of(dt.datetime.fromisoformat(item["valid_from"].replace("Z", "+00:00")))
+            b = (slot_of(dt.datetime.fromisoformat(item["valid_to"].replace("Z", "+00:00")))
+                 if item.get("valid_to") else a + 1)
+            a, b = max(a, first), min(b, last)        # open-ended/long rates → clip
+            if b > a:
+                slots.append(np.arange(a, b))
+                values.append(np.full(b - a, item["value_inc_vat"] / 100))
+        url, params = page.get("next"), None          # `next` already has the query
+    if not slots:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(slots), np.concatenate(values)
+
+
+def backfill(start: dt.date, end: dt.date, regions: Optional[Iterable[str]] = None,
+             product: str = PRODUCT_CODE, workers: int = 4) -> Dict[str, int]:
+    """
+    Archive ``[start, end)`` for *regions* (default all 14).
+    Returns slots written per region.
+    """
+    a, b = _as_utc(start), _as_utc(end)
+
+    def one(region: str) -> Tuple[str, int]:
+        slots, values = _fetch_range(product, region, a, b)
+        _write(product, region, slots, values.astype(np.float32))
+        return region, len(slots)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(one, regions or REGIONS))
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Historical Agile price archive")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("backfill", help="Download a date range into the archive")
+    b.add_argument("--from", dest="start", required=True, type=dt.date.fromisoformat)
+    b.add_argument("--to", dest="end", required=True, type=dt.date.fromisoformat)
+    b.add_argument("--region", action="append", choices=REGIONS)
+    b.add_argument("--product", default=PRODUCT_CODE)
+
+    c = sub.add_parser("coverage", help="Show what is archived")
+    c.add_argument("--product", default=PRODUCT_CODE)
+
+    args = p.parse_args()
+    if args.cmd == "backfill":
+        for region, n in backfill(args.start, args.end, args.region, args.product).items():
+            print(f"{region}: {n} slots")
+    else:
+        for region in REGIONS:
+            first, n = coverage(region, args.product)
+            print(f"{region}: {n:6d} slots from {first:%Y-%m-%d}" if first
+                  else f"{region}: empty")
@@ -0,0 +1,243 @@
+"""
+Shared Agile price store – one 48-slot vector per (product, region, date).
+
+Every user in a region sees the same prices, so they are fetched once and
+served from a dict.  Entries carry a TTL:
+
+    complete day   → ``FRESH_TTL``      (prices never change once published)
+    partial day    → ``PARTIAL_TTL``    (publication still in progress)
+
+An expired entry is returned *as is* while a background thread refetches
+it (stale-while-revalidate), and is kept if the refetch fails, so requests
+never wait on Octopus once a day has been seen.  Only a cold miss blocks.
+At most ``MAX_ENTRIES`` keys are held; the least recently used go first,
+so arbitrary dates asked for by clients cannot pile up.
+
+``start_refresher`` runs a daemon thread that fetches tomorrow's prices for
+every region as soon as they are published (~16:00 UK), polling every
+``PUBLISH_POLL`` seconds until they are all in.  Callbacks registered with
+``on_complete`` hear about each (product, region, date) the moment its
+48 prices are first held complete.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from . import scheduler
+from .singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+FRESH_TTL   = 6 * 3600          # s – complete day
+PARTIAL_TTL = 5 * 60            # s – some slots still NaN
+PUBLISH_HOUR = 16               # Agile day-ahead prices land ~16:00 UK
+PUBLISH_POLL = 60               # s – refresher cadence until tomorrow is in
+MAX_ENTRIES = 256               # (product, region, date) keys held, LRU
+UK_TZ = ZoneInfo("Europe/London")
+
+Key   = Tuple[str, str, dt.date]
+Fetch = Callable[[str, str, dt.date], np.ndarray]
+Listener = Callable[[str, str, dt.date], None]
+
+
+class PricesUnavailable(RuntimeError):
+    """No prices held for the key and the upstream fetch failed."""
+
+
+def utc_offset_slots(when: dt.date) -> int:
+    """Half-hours UK local time is ahead of UTC on *when* (0 or 2)."""
+    noon = dt.datetime.combine(when, dt.time(12), tzinfo=dt.timezone.utc)
+    return int(noon.astimezone(UK_TZ).utcoffset().total_seconds() // 1800)
+
+
+@dataclass(slots=True)
+class _Entry:
+    values: np.ndarray          # 48 × £/kWh, NaN where not yet published
+    fetched: float              # time.monotonic() of the fetch
+    refreshing: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return bool(np.isfinite(self.values).all())
+
+    def expired(self, now: float) -> bool:
+        ttl = FRESH_TTL if self.complete else PARTIAL_TTL
+        return now - self.fetched > ttl
+
+
+# ─── store ───────────────────────────────────────────────
+class PriceStore:
+
+    def __init__(self, fetch: Fetch, regions: Iterable[str], workers: int = 4,
+                 max_entries: int = MAX_ENTRIES):
+        self._fetch   = fetch
+        self.regions  = tuple(regions)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Key, _Entry] = OrderedDict()
+        self._lock    = threading.Lock()
+        self._pool    = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix="price-store")
+        self._refresher: Optional[threading.Thread] = None
+        self._listeners: List[Listener] = []
+        self.hits = self.stale_hits = self.misses = self.errors = 0
+        self._flight = SingleFlight("agile")
+
+    # ── internals ──
+    def _store(self, key: Key, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        values.flags.writeable = False
+        entry = _Entry(values, time.monotonic())
+        with self._lock:
+            old = self._entries.get(key)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            listeners = list(self._listeners)
+        if listeners and entry.complete and (old is None or not old.complete):
+            for fn in listeners:
+                try:
+                    fn(*key)
+                except Exception as e:            # a listener never breaks a fetch
+                    log.warning("Price listener failed for %s: %s", key, e)
+        return values
+
+    def _revalidate(self, key: Key) -> None:
+        try:
+            with scheduler.lane("prefetch"):        # background: yield to users
+                values = self._flight.do(key, lambda: self._fetch(*key))
+        except Exception as e:
+            log.warning("Agile refresh failed for %s (%s) – serving stale prices.", key, e)
+            with self._lock:
+                self.errors += 1
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = False
+            return
+        # never replace a complete vector with a worse one
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.complete and not np.isfinite(values).all():
+            with self._lock:
+                entry.fetched, entry.refreshing = time.monotonic(), False
+            return
+        self._store(key, values)
+
+    # ── public API ──
+    def get(self, product: str, region: str, date: dt.date) -> np.ndarray:
+        """
+        Return the 48-slot vector for *key*.  Stale entries are returned
+        immediately and refreshed in the background; a cold miss fetches
+        inline and raises :class:`PricesUnavailable` on failure.
+        """
+        key = (product, region, date)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if not entry.expired(now):
+                    self.hits += 1
+                    return entry.values
+                self.stale_hits += 1
+                if not entry.refreshing:
+                    entry.refreshing = True
+                    self._pool.submit(self._revalidate, key)
+                return entry.values
+            self.misses += 1
+
+        try:
+            return self._flight.do(key, lambda: self._cold_fetch(key))
+        except PricesUnavailable:
+            raise
+        except Exception as e:            # shared a failing background refresh
+            raise PricesUnavailable(f"Agile prices for {key} unavailable: {e}") from e
+
+    def _cold_fetch(self, key: Key) -> np.ndarray:
+        with self._lock:                  # filled by a leader since our miss?
+            entry = self._entries.get(key)
+        if entry is not None:
+            return entry.values
+        try:
+            values = self._fetch(*key)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            raise PricesUnavailable(f"Agile prices for {key} unavailable: {e}") from e
+        return self._store(key, values)
+
+    def peek(self, product: str, region: str, date: dt.date) -> Optional[np.ndarray]:
+        """Held vector (fresh or stale) without touching the network."""
+        with self._lock:
+            entry = self._entries.get((product, region, date))
+        return None if entry is None else entry.values
+
+    def prefetch(self, product: str, date: dt.date,
+                 regions: Optional[Iterable[str]] = None, wait: bool = True) -> int:
+        """
+        Fetch *date* for every region not already held complete.
+        Returns the number of regions now holding a complete day.
+        """
+        todo = []
+        with self._lock:
+            for region in regions or self.regions:
+                entry = self._entries.get((product, region, date))
+                if entry is None or not entry.complete:
+                    todo.append((product, region, date))
+        futures = [self._pool.submit(self._revalidate, key) for key in todo]
+        if wait:
+            for f in futures:
+                f.result()
+        with self._lock:
+            return sum(1 for r in regions or self.regions
+                       if (e := self._entries.get((product, r, date))) and e.complete)
+
+    def on_complete(self, fn: Listener) -> None:
+        """Call ``fn(product, region, date)`` whenever a day becomes complete."""
+        with self._lock:
+            if fn not in self._listeners:
+                self._listeners.append(fn)
+
+    # ── background refresher ──
+    def start_refresher(self, product: str, interval: float = 600.0) -> None:
+        """Idempotently start the daemon that keeps today/tomorrow warm."""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, args=(product, interval),
+                name="price-refresher", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self, product: str, interval: float) -> None:
+        while True:
+            try:
+                now_uk = dt.datetime.now(UK_TZ)
+                today  = dt.datetime.now(dt.timezone.utc).date()
+                self.prefetch(product, today)
+                pending = False
+                if now_uk.hour >= PUBLISH_HOUR:
+                    done = self.prefetch(product, today + dt.timedelta(days=1))
+                    pending = done < len(self.regions)
+                self._evict(today - dt.timedelta(days=2))
+            except Exception as e:                        # keep the daemon alive
+                log.warning("Price refresher error: %s", e)
+                pending = False
+            time.sleep(min(interval, PUBLISH_POLL) if pending else interval)
+
+    def _evict(self, before: dt.date) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[2] < before]:
+                del self._entries[key]
@@ -0,0 +1,198 @@
+"""
+PVGIS hourly profiles as plain numpy arrays.
+
+The pandas-free core under :func:`simulate.hourly_generation_series`:
+one calendar year of hourly kWh for a **1 kWp** array, served from the
+precomputed :mod:`irradiance_grid`, then :mod:`pv_cache`, then PVGIS
+``seriescalc``.  Importing this module does not import pandas, so the
+serverless fast path (``/api/site``, ``detail=summary``) starts without it.
+
+Slot *h* of a profile is hour *h* after 1 January 00:00 UTC of its year.
+
+Roofs with more than one face (east/west, split arrays) are a list of
+:class:`Plane` s.  Each distinct orientation is one unit profile – one
+grid/cache lookup – and the site profile is their kWp-weighted sum,
+computed as a single ``(orientations,) @ (orientations × hours)`` product.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import irradiance_grid, metrics, pv_cache, upstream
+from .pv_cache import profile_key
+
+# ─────────────────────────────────────────────────────────
+PVGIS_VERSION = "v5_3"                         # need ≥5.3 for SARAH-3
+BASE_URL      = f"https://re.jrc.ec.europa.eu/api/{PVGIS_VERSION}/"
+
+PVGIS_URL  = BASE_URL + "PVcalc"
+SERIES_URL = BASE_URL + "seriescalc"
+HOURLY_URL = SERIES_URL
+
+DEFAULT_RAD_DB = "PVGIS-SARAH3"                # ends 2023
+DEFAULT_YEAR   = 2023
+DEFAULT_TILT   = 35
+DEFAULT_AZIM   = 0                             # PVGIS aspect: 0 = south, -90 = east
+MAX_PLANES     = 8
+
+Orientation = Tuple[int, int]                  # (tilt, azim), rounded as in pv_cache
+
+
+@dataclass(frozen=True, slots=True)
+class Plane:
+    """One roof face: its peak power and which way it points."""
+    kwp: float
+    tilt: float = DEFAULT_TILT
+    azim: float = DEFAULT_AZIM
+
+    @property
+    def orientation(self) -> Orientation:
+        return int(round(self.tilt)), int(round(self.azim))
+
+
+def parse_planes(text: str) -> List[Plane]:
+    """
+    ``"3:35:-90,3:35:90"`` → an east/west pair; each plane is
+    ``kwp[:tilt[:azim]]`` with tilt 35° and azimuth 0 (south) by default.
+    """
+    planes = []
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        try:
+            planes.append(Plane(*(float(x) for x in item.split(":"))))
+        except (TypeError, ValueError):
+            raise ValueError(f"plane must be kwp[:tilt[:azim]]: {item.strip()!r}") from None
+    check_planes(planes)
+    return planes
+
+
+def check_planes(planes: Sequence[Plane]) -> None:
+    if not 0 < len(planes) <= MAX_PLANES:
+        raise ValueError(f"give 1–{MAX_PLANES} planes")
+    for p in planes:
+        if p.kwp <= 0 or not 0 <= p.tilt <= 90 or not -180 <= p.azim <= 180:
+            raise ValueError("each plane needs kwp>0, 0≤tilt≤90, -180≤azim≤180")
+
+
+def orientations(planes: Sequence[Plane]) -> List[Orientation]:
+    """Distinct orientations in first-seen order."""
+    return list(dict.fromkeys(p.orientation for p in planes))
+
+
+def year_hours(year: int) -> int:
+    return 8784 if year % 4 == 0 and (year % 100 or year % 400 == 0) else 8760
+
+
+def parse_hourly(src: dict, year: int) -> np.ndarray:
+    """
+    PVGIS ``seriescalc`` JSON → float32 hourly kWh pinned to the whole
+    calendar *year* (hours PVGIS did not return are 0).
+    """
+    rows = src["outputs"]["hourly"]
+    # "YYYYMMDD:HHMM" (UTC) → minutes since the epoch
+    stamps = np.array([f"{t[:4]}-{t[4:6]}-{t[6:8]}T{t[9:11]}:{t[11:13]}"
+                       for t in (r["time"] for r in rows)], dtype="datetime64[m]")
+    power_w = np.fromiter((r["P"] for r in rows), dtype=np.float64, count=len(rows))
+
+    # power [W] per sample → energy [kWh], summed per hour of the year
+    dt_h = (stamps[1] - stamps[0]).astype(np.int64) / 60 if len(stamps) > 1 else 1.0
+    hour = (stamps - np.datetime64(f"{year}-01-01T00:00")).astype(np.int64) // 60
+    n = year_hours(year)
+    keep = (hour >= 0) & (hour < n)
+    kwh = np.bincount(hour[keep], weights=power_w[keep] * dt_h / 1000.0, minlength=n)
+    return kwh.astype(np.float32)
+
+
+def fetch_unit_profile(lat: float, lon: float, tilt: int, azim: int,
+                       year: int, raddatabase: str) -> np.ndarray:
+    """
+    Download one year of PVGIS ``seriescalc`` for a **1 kWp** array and
+    return hourly kWh as a float32 array covering the whole calendar year.
+    """
+    params = {"lat": lat, "lon": lon,
+              "surface_tilt": tilt, "surface_azimuth": azim,
+              "raddatabase": raddatabase,
+              "pvcalculation": 1, "peakpower": 1, "loss": 14,
+              "pvtechchoice": "crystSi", "mountingplace": "building",
+              "outputformat": "json", "browser": 0,
+              "startyear": year, "endyear": year}
+    with metrics.stage("pvgis_download"):
+        r = upstream.get(HOURLY_URL, params=params, timeout=35)
+
+    with metrics.stage("pvgis_parse"):
+        return parse_hourly(r.json(), year)
+
+
+def unit_profile(lat: float, lon: float,
+                 tilt: int = DEFAULT_TILT, azim: int = DEFAULT_AZIM,
+                 year: int = DEFAULT_YEAR,
+                 raddatabase: str = DEFAULT_RAD_DB) -> np.ndarray:
+    """
+    Hourly kWh per kWp (read-only float32) – precomputed grid when it
+    covers the site, else the profile cache, else PVGIS.
+    Raises ``UpstreamError`` if PVGIS has to be asked and cannot answer.
+    """
+    key = profile_key(lat, lon, tilt, azim, year, raddatabase)
+    lat_r, lon_r, tilt_r, azim_r, _, _ = key
+    with metrics.stage("pv_profile"):
+        unit = irradiance_grid.lookup(lat, lon, tilt, azim, year, raddatabase)
+        if unit is None:
+            unit = pv_cache.profiles.get_or_fetch(
+                key, lambda: fetch_unit_profile(lat_r, lon_r, tilt_r, azim_r,
+                                                year, raddatabase))
+    return unit
+
+
+def day_slice_array(hourly: np.ndarray, year: int, when: dt.date) -> np.ndarray:
+    """
+    The calendar day matching *when* cut out of a one-year hourly array
+    (*year*), as 48 half-hour kWh values.
+    """
+    try:
+        src = dt.date(year, when.month, when.day)
+    except ValueError:             # 29 Feb on a non-leap year
+        src = dt.date(year, when.month, when.day - 1)
+
+    h0 = (src - dt.date(year, 1, 1)).days * 24
+    day = hourly[h0:h0 + 24]
+    if len(day) != 24:             # last-ditch fall-back
+        day = hourly[:24]
+    return np.repeat(np.asarray(day, dtype=np.float64) / 2.0, 2)
+
+
+def plane_weights(planes: Sequence[Plane], keys: Sequence[Orientation]) -> np.ndarray:
+    """kWp per orientation in *keys* (planes sharing one pool their kWp)."""
+    weights = np.zeros(len(keys))
+    for p in planes:
+        weights[keys.index(p.orientation)] += p.kwp
+    return weights
+
+
+def combine(planes: Sequence[Plane], units: Dict[Orientation, np.ndarray]) -> np.ndarray:
+    """Site kWh from per-orientation unit profiles, as one weighted sum over the stack."""
+    keys = list(units)
+    return plane_weights(planes, keys) @ np.stack([units[k] for k in keys]).astype(np.float64)
+
+
+def site_profile(lat: float, lon: float, planes: Sequence[Plane],
+                 year: int = DEFAULT_YEAR, raddatabase: str = DEFAULT_RAD_DB,
+                 pool: Optional[Executor] = None) -> np.ndarray:
+    """
+    Hourly kWh for the whole array over *year*.  With a *pool*, cold
+    orientations are fetched side by side.
+    """
+    keys = orientations(planes)
+    if pool is None or len(keys) == 1:
+        units = {k: unit_profile(lat, lon, *k, year, raddatabase) for k in keys}
+    else:
+        futures = {k: metrics.submit(pool, unit_profile, lat, lon, *k, year, raddatabase)
+                   for k in keys}
+        units = {k: f.result() for k, f in futures.items()}
+    return combine(planes, units)
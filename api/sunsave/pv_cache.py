@@ -0,0 +1,144 @@
+"""
+Two-tier cache of PVGIS hourly profiles, normalised to 1 kWp.
+
+PV output scales linearly with ``peakpower``, so one year of hourly kWh
+per kWp is enough to answer every array size at the same site.  Profiles
+are keyed on the *rounded* location plus orientation/year/database:
+
+    (lat, lon, tilt, azim, year, raddatabase)
+
+Tiers
+-----
+1.  in-process LRU   – OrderedDict of float32 arrays (≈35 kB each)
+2.  on-disk          – one ``.npy`` file per key under ``SUNSAVE_CACHE_DIR``
+                       (defaults to ``$TMPDIR/sunsave-cache``), survives restarts
+
+Nothing in here talks to PVGIS; callers pass a ``fetch`` callable that is
+only invoked on a miss in both tiers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from .singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+LATLON_DP = 2                       # 0.01° ≈ 1 km – well inside PVGIS resolution
+
+CACHE_DIR = Path(os.environ.get(
+    "SUNSAVE_CACHE_DIR", Path(tempfile.gettempdir()) / "sunsave-cache"))
+
+ProfileKey = Tuple[float, float, int, int, int, str]
+
+
+def profile_key(lat: float, lon: float, tilt: float, azim: float,
+                year: int, raddatabase: str) -> ProfileKey:
+    """Normalise request parameters into a cache key."""
+    return (round(float(lat), LATLON_DP), round(float(lon), LATLON_DP),
+            int(round(tilt)), int(round(azim)), int(year), str(raddatabase))
+
+
+# ─── cache ───────────────────────────────────────────────
+class ProfileCache:
+    """LRU in memory, write-through to ``directory`` on disk."""
+
+    def __init__(self, maxsize: int = 256, directory: Optional[Path] = CACHE_DIR):
+        self.maxsize   = maxsize
+        self.directory = Path(directory) if directory is not None else None
+        self._mem: "OrderedDict[ProfileKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        self._flight = SingleFlight("pvgis")
+
+    # ── paths ──
+    def _path(self, key: ProfileKey) -> Path:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        lat, lon, tilt, azim, year, db = key
+        return self.directory / f"pv_{db}_{year}_{lat}_{lon}_{tilt}_{azim}_{digest}.npy"
+
+    # ── memory tier ──
+    def _remember(self, key: ProfileKey, arr: np.ndarray) -> None:
+        with self._lock:
+            self._mem[key] = arr
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.maxsize:
+                self._mem.popitem(last=False)
+
+    # ── public API ──
+    def get(self, key: ProfileKey) -> Optional[np.ndarray]:
+        with self._lock:
+            arr = self._mem.get(key)
+            if arr is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return arr
+
+        if self.directory is not None:
+            try:
+                arr = np.load(self._path(key), allow_pickle=False)
+            except (OSError, ValueError):
+                arr = None
+            if arr is not None:
+                arr.flags.writeable = False
+                self._remember(key, arr)
+                with self._lock:
+                    self.disk_hits += 1
+                return arr
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: ProfileKey, arr: np.ndarray) -> np.ndarray:
+        arr = np.ascontiguousarray(arr, dtype=np.float32)
+        arr.flags.writeable = False
+        self._remember(key, arr)
+
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path = self._path(key)
+                tmp  = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp, "wb") as fh:
+                    np.save(fh, arr, allow_pickle=False)
+                os.replace(tmp, path)                   # atomic on POSIX + NTFS
+            except OSError as e:
+                log.warning("PV cache write failed (%s) – memory tier only.", e)
+        return arr
+
+    def get_or_fetch(self, key: ProfileKey,
+                     fetch: Callable[[], np.ndarray]) -> np.ndarray:
+        """Cached profile, else one :meth:`put` of *fetch()* shared by
+        every concurrent caller asking for *key*."""
+        arr = self.get(key)
+        if arr is None:
+            arr = self._flight.do(key, lambda: self._fill(key, fetch))
+        return arr
+
+    def _fill(self, key: ProfileKey, fetch: Callable[[], np.ndarray]) -> np.ndarray:
+        with self._lock:                  # a leader that just finished may have
+            arr = self._mem.get(key)      # filled it since our miss
+        return arr if arr is not None else self.put(key, fetch())
+
+    def clear(self, disk: bool = False) -> None:
+        with self._lock:
+            self._mem.clear()
+        if disk and self.directory is not None and self.directory.exists():
+            for p in self.directory.glob("pv_*.npy"):
+                p.unlink(missing_ok=True)
+
+
+# Shared by every caller in the process.
+profiles = ProfileCache(maxsize=int(os.environ.get("SUNSAVE_PV_CACHE_SIZE", 256)))
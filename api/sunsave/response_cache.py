@@ -0,0 +1,218 @@
+"""
+Whole-response cache for the GET routes, with ETags for the edge.
+
+A dispatch answer depends only on its normalised query (postcode, kwp,
+battery, tariff, strategy …) and the day it is asked on, so identical
+requests – neighbours in the same town, the React app re-submitting after
+a tweak – are answered from here without touching geocoding, PVGIS or the
+dispatch code:
+
+    @app.get("/api/dispatch")
+    @response_cache.cached()
+    def dispatch(): ...
+
+• **key**   – route + query with the postcode normalised (``geo.normalise``)
+  and numbers in canonical form (``4`` = ``4.0``), plus today's UTC date
+• **expiry** – the next Agile publish boundary (16:00 UK) or UTC midnight,
+  whichever comes first; answers that used the mock tariff
+  (``"fallback": true``) only live ``FALLBACK_TTL``
+• **LRU**   – ``SUNSAVE_RESPONSE_CACHE_SIZE`` entries and
+  ``SUNSAVE_RESPONSE_CACHE_MB`` of bodies at most
+• **HTTP**  – strong ``ETag`` (body hash), ``304`` on ``If-None-Match`` and
+  ``Cache-Control: public, max-age=…, s-maxage=…`` up to the same expiry,
+  so the Vercel edge absorbs repeats before they reach the function
+
+Only ``200`` JSON responses are stored; errors and streams pass through.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from .geo import normalise
+from .price_store import PUBLISH_HOUR, UK_TZ
+
+# ─────────────────────────────────────────────────────────
+MAX_ENTRIES  = int(os.environ.get("SUNSAVE_RESPONSE_CACHE_SIZE", 1024))
+MAX_BYTES    = int(float(os.environ.get("SUNSAVE_RESPONSE_CACHE_MB", 64)) * 2**20)
+FALLBACK_TTL = 5 * 60           # s – mock tariff stood in; retry Agile soon
+ENABLED      = os.environ.get("SUNSAVE_RESPONSE_CACHE", "1") != "0"
+
+Key = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass(slots=True)
+class _Entry:
+    body: bytes
+    mimetype: str
+    etag: str                   # quoted, strong
+    expires: float              # time.time()
+
+
+# ─── expiry ──────────────────────────────────────────────
+def next_boundary(now: Optional[dt.datetime] = None) -> dt.datetime:
+    """Earliest of the next Agile publish time (UK) and the next UTC midnight."""
+    now = now or dt.datetime.now(dt.timezone.utc)
+    uk = now.astimezone(UK_TZ)
+    publish = uk.replace(hour=PUBLISH_HOUR, minute=0, second=0, microsecond=0)
+    if publish <= uk:
+        publish = (uk + dt.timedelta(days=1)).replace(
+            hour=PUBLISH_HOUR, minute=0, second=0, microsecond=0)
+    midnight = dt.datetime.combine(now.astimezone(dt.timezone.utc).date()
+                                   + dt.timedelta(days=1), dt.time.min,
+                                   tzinfo=dt.timezone.utc)
+    return min(publish.astimezone(dt.timezone.utc), midnight)
+
+
+# ─── key ─────────────────────────────────────────────────
+def _canonical(name: str, value: str) -> str:
+    if name == "postcode":
+        return normalise(value)
+    try:
+        x = float(value)
+    except ValueError:
+        return value.strip().lower()
+    return repr(x) if math.isfinite(x) else value
+
+
+def request_key(path: str, args, today: dt.date) -> Key:
+    """Normalised cache key for *path* + query *args* (a MultiDict)."""
+    items = tuple(sorted((k, _canonical(k, v)) for k, v in args.items(multi=True)))
+    return path, today.isoformat(), items
+
+
+# ─── cache ───────────────────────────────────────────────
+class ResponseCache:
+    """Bounded LRU of response bodies with absolute expiry."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock  = threading.Lock()
+        self.hits = self.misses = self.not_modified = self.evictions = 0
+
+    def get(self, key: Key) -> Optional[_Entry]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Key, entry: _Entry) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Key) -> None:
+        self._bytes -= len(self._entries.pop(key).body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+responses = ResponseCache()
+
+
+# ─── HTTP ────────────────────────────────────────────────
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, and a gzip-suffixed tag (see ``encoding``) matches too."""
+    bare = etag.strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag.removeprefix("W/").strip('"').removesuffix("-gzip")
+        if tag == bare:
+            return True
+    return False
+
+
+def _answer(entry: _Entry, hit: bool):
+    from flask import Response, request
+
+    max_age = max(int(entry.expires - time.time()), 0)
+    if _matches(request.headers.get("If-None-Match", ""), entry.etag):
+        with responses._lock:
+            responses.not_modified += 1
+        resp = Response(status=304)
+    else:
+        resp = Response(entry.body, mimetype=entry.mimetype)
+    resp.headers["ETag"] = entry.etag
+    resp.headers["Cache-Control"] = f"public, max-age={max_age}, s-maxage={max_age}"
+    resp.headers["X-Sunsave-Cache"] = "hit" if hit else "miss"
+    return resp
+
+
+def _fallback(resp) -> bool:
+    data = resp.get_json(silent=True)
+    return isinstance(data, dict) and bool(data.get("fallback"))
+
+
+def cached(bypass: Callable[[], bool] = lambda: False) -> Callable:
+    """
+    Decorator for a GET view: serve repeats from :data:`responses`.
+    *bypass* is checked per request (e.g. for streamed formats).
+    """
+    def wrap(view: Callable) -> Callable:
+        @wraps(view)
+        def inner(*args, **kwargs):
+            from flask import make_response, request
+
+            if not ENABLED or request.method != "GET" or bypass():
+                return view(*args, **kwargs)
+
+            now = dt.datetime.now(dt.timezone.utc)
+            key = request_key(request.path, request.args, now.date())
+            entry = responses.get(key)
+            if entry is not None:
+                return _answer(entry, hit=True)
+
+            resp = make_response(view(*args, **kwargs))
+            if (resp.status_code != 200 or resp.is_streamed
+                    or resp.mimetype != "application/json"):
+                return resp
+
+            body = resp.get_data()
+            expires = next_boundary(now).timestamp()
+            if _fallback(resp):
+                expires = min(expires, time.time() + FALLBACK_TTL)
+            entry = _Entry(body, resp.mimetype, _etag(body), expires)
+            responses.put(key, entry)
+
+            return _answer(entry, hit=False)
+        return inner
+    return wrap
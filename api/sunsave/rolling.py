@@ -0,0 +1,496 @@
+"""
+Rolling-horizon dispatch – keep a real battery's plan current.
+
+Every other path plans a fresh day from an empty battery.  Here each
+registered site keeps its state in a local SQLite file
+(``SUNSAVE_ROLLING_DB``):
+
+    sites   battery, roof planes, demand, last known SOC and its slot
+    plans   the schedule from ``start_slot`` on – PV, demand, prices,
+            grid flows and SOC as packed float32 blobs, one row per site
+
+Slots are absolute UTC half-hours (Unix seconds // 1800).  A replan starts
+at the current slot from the best SOC known – telemetry if it is newer,
+else the stored plan walked forward to now – and runs the engine over the
+remaining slots only, through the end of the last published price day
+(tomorrow once Agile lands, ~16:00 UK).  Work per site is the length of
+that horizon, never the history behind it.
+
+Replans are batched like :mod:`batch`: one price vector per region, one
+PV profile per rounded location and orientation, one demand day per
+profile, dispatch chunked across the process pool, and every plan
+written back in a single transaction.  :func:`watch` hooks the price
+store so each region is replanned as soon as its new prices are held;
+``python -m api.sunsave.rolling watch`` runs the refresher and the
+watcher as a standalone worker.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from . import encoding, metrics, scheduler
+from .batch import _process_pool, _row_planes, check_workers
+from .demand import demand_from
+from .dispatch import BatteryCfg, engine
+from .geo import normalise, resolve_many
+from .octopus_prices import PRODUCT_CODE, _fill, store
+from .pipeline import fetch_pool
+from .price_store import PricesUnavailable
+from .profiles import DEFAULT_YEAR, Plane, combine, day_slice_array, orientations, unit_profile
+from .pv_cache import CACHE_DIR
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+SLOT_S      = 1800
+CHUNK_SITES = 64                      # sites per process-pool task
+DEBOUNCE_S  = 2.0                     # regions land together – replan them together
+PV_YEAR     = DEFAULT_YEAR
+
+DB_PATH = Path(os.environ.get("SUNSAVE_ROLLING_DB", CACHE_DIR / "rolling.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    site_id    TEXT PRIMARY KEY,
+    postcode   TEXT NOT NULL,
+    lat        REAL NOT NULL,
+    lon        REAL NOT NULL,
+    region     TEXT NOT NULL,
+    planes     TEXT NOT NULL,             -- kwp:tilt:azim,…
+    cap_kwh    REAL NOT NULL,
+    pow_kw     REAL NOT NULL,
+    eta        REAL NOT NULL,
+    strategy   TEXT NOT NULL,
+    profile    TEXT,
+    annual_kwh REAL,
+    soc_kwh    REAL NOT NULL DEFAULT 0,   -- SOC at the start of soc_slot
+    soc_slot   INTEGER NOT NULL DEFAULT 0,
+    version    INTEGER NOT NULL DEFAULT 0 -- bumped by register / report_soc
+);
+CREATE INDEX IF NOT EXISTS sites_region ON sites (region);
+CREATE TABLE IF NOT EXISTS plans (
+    site_id     TEXT PRIMARY KEY REFERENCES sites ON DELETE CASCADE,
+    start_slot  INTEGER NOT NULL,
+    planned_at  REAL NOT NULL,
+    version     INTEGER NOT NULL,         -- sites.version it was planned from
+    pv          BLOB NOT NULL,
+    demand      BLOB NOT NULL,
+    price       BLOB NOT NULL,
+    import_grid BLOB NOT NULL,
+    export_grid BLOB NOT NULL,
+    soc_kwh     BLOB NOT NULL             -- SOC at the end of each slot
+);
+"""
+_PLAN_COLS = ("pv", "demand", "price", "import_grid", "export_grid", "soc_kwh")
+
+_conn: Optional[sqlite3.Connection] = None
+_db_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        for table in ("sites", "plans"):            # files from before versioning
+            if "version" not in {c["name"] for c in conn.execute(f"PRAGMA table_info({table})")}:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        _conn = conn
+    return _conn
+
+
+def _pack(a: np.ndarray) -> bytes:
+    return np.asarray(a, dtype=np.float32).tobytes()
+
+
+def _unpack(b: bytes) -> np.ndarray:
+    return np.frombuffer(b, dtype=np.float32).astype(np.float64)
+
+
+def slot_of(t: float) -> int:
+    """Absolute UTC half-hour holding Unix time *t*."""
+    return int(t // SLOT_S)
+
+
+def _slot_date(slot: int) -> dt.date:
+    return dt.datetime.fromtimestamp(slot * SLOT_S, dt.timezone.utc).date()
+
+
+def _day_slot(day: dt.date) -> int:
+    return slot_of(dt.datetime.combine(day, dt.time.min, tzinfo=dt.timezone.utc).timestamp())
+
+
+def _planes_text(planes: Sequence[Plane]) -> str:
+    return ",".join(f"{p.kwp:g}:{p.tilt:g}:{p.azim:g}" for p in planes)
+
+
+def _planes_from(text: str) -> List[Plane]:
+    return [Plane(*(float(x) for x in item.split(":"))) for item in text.split(",")]
+
+
+# ─── registration and telemetry ──────────────────────────
+def register(raw: dict) -> str:
+    """
+    Add or update a site.  *raw* takes the batch row fields (``postcode``,
+    ``kwp`` or ``planes``, ``cap_kwh``, ``pow_kw``, ``eta``, ``strategy``,
+    ``profile``, ``annual_kwh``) plus ``site_id`` and optional ``soc_kwh``.
+    """
+    try:
+        site_id = str(raw["site_id"])
+        postcode = normalise(str(raw["postcode"]))
+        planes = _row_planes(raw)
+        cfg = BatteryCfg(float(raw.get("cap_kwh", BatteryCfg().cap_kwh)),
+                         float(raw.get("pow_kw", BatteryCfg().pow_kw)),
+                         float(raw.get("eta", BatteryCfg().eta)))
+        strategy = str(raw.get("strategy", "greedy"))
+        profile = None if raw.get("profile") is None else str(raw["profile"])
+        annual_kwh = None if raw.get("annual_kwh") is None else float(raw["annual_kwh"])
+        soc = raw.get("soc_kwh")
+        soc = None if soc is None else float(soc)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"need site_id, postcode and kwp or planes ({e})") from None
+    if cfg.cap_kwh <= 0 or cfg.pow_kw <= 0 or not 0 < cfg.eta <= 1:
+        raise ValueError("cap_kwh>0, pow_kw>0, 0<eta≤1")
+    if soc is not None and not 0 <= soc <= cfg.cap_kwh:
+        raise ValueError("soc_kwh must lie within 0–cap_kwh")
+    engine(strategy)
+    demand_from(profile, annual_kwh)
+
+    site = resolve_many([postcode]).get(postcode)
+    if site is None:
+        raise ValueError(f"unknown postcode {postcode}")
+    for o in orientations(planes):                # warm the PV cache for replans
+        unit_profile(site.lat, site.lon, *o, year=PV_YEAR)
+
+    now = slot_of(time.time())
+    with _db_lock:
+        db = _db()
+        db.execute("BEGIN")
+        db.execute(
+            """INSERT INTO sites (site_id, postcode, lat, lon, region, planes, cap_kwh, pow_kw,
+                                  eta, strategy, profile, annual_kwh, soc_kwh, soc_slot)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (site_id) DO UPDATE SET
+                   postcode=excluded.postcode, lat=excluded.lat, lon=excluded.lon,
+                   region=excluded.region, planes=excluded.planes, cap_kwh=excluded.cap_kwh,
+                   pow_kw=excluded.pow_kw, eta=excluded.eta, strategy=excluded.strategy,
+                   profile=excluded.profile, annual_kwh=excluded.annual_kwh,
+                   version=version + 1""",
+            (site_id, postcode, site.lat, site.lon, site.region, _planes_text(planes),
+             cfg.cap_kwh, cfg.pow_kw, cfg.eta, strategy, profile, annual_kwh,
+             soc or 0.0, now))
+        if soc is not None:
+            db.execute("UPDATE sites SET soc_kwh = ?, soc_slot = ? WHERE site_id = ?",
+                       (soc, now, site_id))
+        db.execute("DELETE FROM plans WHERE site_id = ?", (site_id,))   # inputs changed
+        db.execute("COMMIT")
+    return site_id
+
+
+def report_soc(site_id: str, soc_kwh: float, at: Optional[float] = None) -> None:
+    """Measured SOC at Unix time *at* (default now); newer than any plan."""
+    with _db_lock:
+        cur = _db().execute(
+            "UPDATE sites SET soc_kwh = MIN(MAX(?, 0), cap_kwh), soc_slot = ?, "
+            "version = version + 1 WHERE site_id = ?",
+            (float(soc_kwh), slot_of(time.time() if at is None else at), site_id))
+    if not cur.rowcount:
+        raise KeyError(site_id)
+
+
+def remove(site_id: str) -> None:
+    with _db_lock:
+        _db().execute("DELETE FROM sites WHERE site_id = ?", (site_id,))
+
+
+# ─── state ───────────────────────────────────────────────
+def _soc_at(site: sqlite3.Row, plan: Optional[sqlite3.Row], slot: int) -> float:
+    """
+    Best estimate of SOC at the start of *slot*: telemetry (or the last
+    replan's start) if it is that recent, else the plan walked forward –
+    as long as nothing has touched the site since the plan was made.
+    """
+    soc_slot = site["soc_slot"]
+    if soc_slot >= slot or plan is None or plan["start_slot"] != soc_slot \
+            or plan["version"] != site["version"]:
+        return float(site["soc_kwh"])
+    done = slot - plan["start_slot"]
+    planned = np.frombuffer(plan["soc_kwh"], dtype=np.float32)
+    if done > len(planned):                      # plan ran out – last planned SOC
+        return float(planned[-1]) if len(planned) else float(site["soc_kwh"])
+    return float(planned[done - 1])
+
+
+# ─── replanning ──────────────────────────────────────────
+def _plan_chunk(tasks: List[tuple]) -> List[tuple]:
+    """Runs in a worker process: ``(site_id, import, export, soc)`` or ``(site_id, error)``."""
+    out = []
+    for site_id, pv, prices, demand, (cap_kwh, pow_kw, eta), strategy, soc0 in tasks:
+        try:
+            res = engine(strategy)(pv, prices, demand, cap_kwh, pow_kw, eta, soc0=soc0)
+        except ValueError as e:
+            out.append((site_id, str(e)))
+            continue
+        out.append((site_id, res["import_grid"], res["export_grid"], res["soc_kwh"]))
+    return out
+
+
+def _horizon_prices(region: str, first: dt.date) -> np.ndarray:
+    """Published prices from *first* on (today, then tomorrow if in), UTC slots."""
+    days = []
+    for day in (first, first + dt.timedelta(days=1)):
+        try:
+            values = store.get(PRODUCT_CODE, region, day)
+        except PricesUnavailable:
+            break
+        if not np.isfinite(values).any():
+            break
+        ok = np.isfinite(values)
+        days.append(_fill(values) if ok.all() else _fill(values)[:np.argmin(ok)])
+        if not ok.all():
+            break
+    return np.concatenate(days) if days else np.zeros(0)
+
+
+def replan(site_ids: Optional[Iterable[str]] = None, *,
+           regions: Optional[Iterable[str]] = None,
+           now: Optional[float] = None,
+           workers: Optional[int] = None) -> dict:
+    """
+    Re-dispatch the remaining horizon of the selected sites (all by
+    default) from their current SOC.  Returns counts, timing and per-site
+    errors.
+
+    A site whose row changed while it was being planned (new telemetry or
+    a re-registration) keeps its newer state: its plan is dropped and
+    reported in ``errors`` for the next replan to pick up.
+    """
+    workers = check_workers(workers)
+    t0 = time.perf_counter()
+    slot = slot_of(time.time() if now is None else now)
+    today = _slot_date(slot)
+    offset = slot - _day_slot(today)
+
+    query = "SELECT s.*, p.start_slot, p.version AS plan_version, p.soc_kwh AS plan_soc " \
+            "FROM sites s LEFT JOIN plans p USING (site_id)"
+    args: list = []
+    if site_ids is not None:
+        ids = list(site_ids)
+        query += f" WHERE s.site_id IN ({','.join('?' * len(ids))})"
+        args = ids
+    elif regions is not None:
+        regs = list(regions)
+        query += f" WHERE s.region IN ({','.join('?' * len(regs))})"
+        args = regs
+    with _db_lock:
+        sites = _db().execute(query, args).fetchall()
+
+    # shared inputs: prices per region, PV per location/orientation, demand per profile
+    days = (today, today + dt.timedelta(days=1))
+    planes = {s["site_id"]: _planes_from(s["planes"]) for s in sites}
+    with metrics.stage("rolling_inputs"):
+        price_jobs = {r: fetch_pool.submit(scheduler.in_lane("batch", _horizon_prices), r, today)
+                      for r in {s["region"] for s in sites}}
+        pv_jobs = {key: fetch_pool.submit(scheduler.in_lane("batch", unit_profile), *key,
+                                          year=PV_YEAR)
+                   for key in {(s["lat"], s["lon"], *o)
+                               for s in sites for o in orientations(planes[s["site_id"]])}}
+        prices: Dict[str, object] = {}
+        for r, f in price_jobs.items():
+            try:
+                prices[r] = f.result()[offset:]
+            except Exception as e:
+                prices[r] = e                                   # reported per site
+        units: Dict[tuple, object] = {}
+        for key, f in pv_jobs.items():
+            try:
+                unit = f.result()
+                units[key] = np.concatenate([day_slice_array(unit, PV_YEAR, d) for d in days])
+            except Exception as e:
+                units[key] = e                                  # reported per site
+
+    loads: Dict[tuple, np.ndarray] = {}
+    errors: Dict[str, str] = {}
+    tasks = []
+    for s in sites:
+        price = prices[s["region"]]
+        if isinstance(price, Exception):
+            errors[s["site_id"]] = f"prices unavailable: {price}"
+            continue
+        if not len(price):
+            errors[s["site_id"]] = "no published prices for the rest of today"
+            continue
+        n = len(price)
+        site_planes = planes[s["site_id"]]
+        day_units = {o: units[(s["lat"], s["lon"], *o)] for o in orientations(site_planes)}
+        failed = next((u for u in day_units.values() if isinstance(u, Exception)), None)
+        if failed is not None:
+            errors[s["site_id"]] = f"PV unavailable: {failed}"
+            continue
+        pv = combine(site_planes, day_units)[offset:offset + n]
+        dkey = (s["profile"], s["annual_kwh"])
+        if dkey not in loads:
+            demand = demand_from(*dkey)
+            loads[dkey] = np.concatenate([demand.day(d) for d in days])
+        plan = None if s["start_slot"] is None else \
+            {"start_slot": s["start_slot"], "version": s["plan_version"],
+             "soc_kwh": s["plan_soc"]}
+        soc0 = _soc_at(s, plan, slot)
+        tasks.append((s["site_id"], pv, price, loads[dkey][offset:offset + n],
+                      (s["cap_kwh"], s["pow_kw"], s["eta"]), s["strategy"], soc0))
+    versions = {s["site_id"]: s["version"] for s in sites}
+
+    inputs = {t[0]: t for t in tasks}
+    chunks = [tasks[k:k + CHUNK_SITES] for k in range(0, len(tasks), CHUNK_SITES)]
+    pool = _process_pool(workers)
+    with metrics.stage("rolling_dispatch"):
+        if pool is None or len(chunks) <= 1:
+            results = [r for c in chunks for r in _plan_chunk(c)]
+        else:
+            futures = [pool.submit(_plan_chunk, c) for c in chunks]
+            results = [r for f in as_completed(futures) for r in f.result()]
+
+    planned_at = time.time()
+    insert = (f"INSERT OR REPLACE INTO plans (site_id, start_slot, planned_at, version, "
+              f"{', '.join(_PLAN_COLS)}) VALUES ({', '.join('?' * (4 + len(_PLAN_COLS)))})")
+    planned = 0
+    with metrics.stage("rolling_store"), _db_lock:
+        db = _db()
+        db.execute("BEGIN")
+        for res in results:
+            if len(res) == 2:
+                errors[res[0]] = res[1]
+                continue
+            site_id, imp, exp, soc = res
+            _, pv, price, demand, _, _, soc0 = inputs[site_id]
+            # the plan's starting point becomes the state it walks forward
+            # from – unless telemetry or a re-registration landed meanwhile
+            cur = db.execute("UPDATE sites SET soc_kwh = ?, soc_slot = ? "
+                             "WHERE site_id = ? AND version = ? AND soc_slot <= ?",
+                             (soc0, slot, site_id, versions[site_id], slot))
+            if not cur.rowcount:
+                errors[site_id] = "site changed during replan – plan dropped"
+                continue
+            db.execute(insert, (site_id, slot, planned_at, versions[site_id], _pack(pv),
+                                _pack(demand), _pack(price), _pack(imp), _pack(exp),
+                                _pack(soc)))
+            planned += 1
+        db.execute("COMMIT")
+
+    return {"planned": planned, "sites": len(sites), "start_slot": slot,
+            "seconds": round(time.perf_counter() - t0, 3), "errors": errors}
+
+
+# ─── reading plans ───────────────────────────────────────
+def schedule(site_id: str, now: Optional[float] = None,
+             decimals: Optional[int] = None) -> dict:
+    """JSON-ready remaining plan for *site_id* from the current slot."""
+    slot = slot_of(time.time() if now is None else now)
+    with _db_lock:
+        db = _db()
+        site = db.execute("SELECT * FROM sites WHERE site_id = ?", (site_id,)).fetchone()
+        plan = db.execute("SELECT * FROM plans WHERE site_id = ?", (site_id,)).fetchone()
+    if site is None:
+        raise KeyError(site_id)
+
+    out = {"site_id": site_id, "postcode": site["postcode"], "region": site["region"],
+           "battery": {"cap_kwh": site["cap_kwh"], "pow_kw": site["pow_kw"],
+                       "eta": site["eta"]},
+           "strategy": site["strategy"], "soc_kwh": _soc_at(site, plan, slot)}
+    if plan is None:
+        return {**out, "planned_at": None, "slots": None}
+    skip = max(slot - plan["start_slot"], 0)
+    cols = {name: _unpack(plan[name])[skip:] for name in _PLAN_COLS}
+    out["planned_at"] = dt.datetime.fromtimestamp(
+        plan["planned_at"], dt.timezone.utc).isoformat(timespec="seconds")
+    out["slots"] = encoding.columns((plan["start_slot"] + skip) * SLOT_S, SLOT_S,
+                                    cols, decimals)
+    return out
+
+
+# ─── price-driven replans ────────────────────────────────
+_dirty: set = set()
+_dirty_cond = threading.Condition()
+_watcher: Optional[threading.Thread] = None
+
+
+def _on_prices(product: str, region: str, date: dt.date) -> None:
+    """Price store callback: a region's day just became complete."""
+    if product != PRODUCT_CODE or date < dt.datetime.now(dt.timezone.utc).date():
+        return
+    with _dirty_cond:
+        _dirty.add(region)
+        _dirty_cond.notify()
+
+
+def _watch_loop() -> None:
+    while True:
+        with _dirty_cond:
+            while not _dirty:
+                _dirty_cond.wait()
+        time.sleep(DEBOUNCE_S)                    # let the other regions land
+        with _dirty_cond:
+            regions = sorted(_dirty)
+            _dirty.clear()
+        try:
+            res = replan(regions=regions)
+            log.info("Replanned %d/%d sites in %s (%.1fs)", res["planned"], res["sites"],
+                     ", ".join(regions), res["seconds"])
+        except Exception as e:                    # keep the watcher alive
+            log.warning("Rolling replan failed for %s: %s", ", ".join(regions), e)
+
+
+def watch() -> None:
+    """Idempotently replan each region as soon as new prices are held."""
+    global _watcher
+    with _dirty_cond:
+        if _watcher is not None and _watcher.is_alive():
+            return
+        store.on_complete(_on_prices)
+        _watcher = threading.Thread(target=_watch_loop, name="rolling-replan", daemon=True)
+        _watcher.start()
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Rolling-horizon battery plans")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("replan", help="Replan every registered site now")
+    r.add_argument("--workers", type=int)
+    sub.add_parser("watch", help="Fetch prices and replan as each region publishes")
+    s = sub.add_parser("show", help="Print a site's remaining plan")
+    s.add_argument("site_id")
+
+    args = p.parse_args()
+    if args.cmd == "replan":
+        res = replan(workers=args.workers)
+        print(f"Replanned {res['planned']}/{res['sites']} sites in {res['seconds']:.2f}s")
+        for site_id, err in res["errors"].items():
+            print(f"  {site_id}: {err}")
+    elif args.cmd == "watch":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        watch()
+        store.start_refresher(PRODUCT_CODE)
+        print(f"Watching Agile publication for {DB_PATH} – Ctrl-C to stop.")
+        while True:
+            time.sleep(3600)
+    else:
+        plan = schedule(args.site_id, decimals=3)
+        print(plan)
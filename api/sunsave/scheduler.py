@@ -0,0 +1,198 @@
+"""
+Client-side rate limiting for upstream hosts – token buckets, priority lanes.
+
+PVGIS and postcodes.io limit calls per IP.  Every attempt made by
+:func:`upstream.request` first takes a token from its host's bucket
+(``SUNSAVE_UPSTREAM_RATES``); hosts without a bucket are not throttled.
+
+Lanes
+-----
+Callers run in one of three lanes, highest priority first:
+
+    interactive   a user is waiting on the response (default)
+    batch         portfolio runs (``batch.py``)
+    prefetch      cache warmers – price refresher, grid build
+
+A waiter is only served once no higher lane is queued for the host, and
+the lower lanes may not take the last ``RESERVE`` share of the burst, so
+a user request arriving during a batch run finds a token at once while
+background work soaks up whatever quota is left.
+
+    with scheduler.lane("batch"):
+        ...                           # every upstream call in here
+
+A 429 pauses the host for ``Retry-After`` (or the backoff) and halves its
+rate; the rate then climbs back to the configured value as calls succeed.
+Queue depth, waits, grants and 429s per host and lane are exported by
+:mod:`metrics`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+# ─────────────────────────────────────────────────────────
+LANES = ("interactive", "batch", "prefetch")
+RESERVE      = 0.25                 # share of the burst kept for interactive
+MIN_RATE     = 0.1                  # floor after repeated 429s, × configured rate
+RECOVERY     = 0.02                 # rate regained per granted call, × configured
+
+# req/s and burst per host – PVGIS documents 30 calls/s per IP
+DEFAULT_RATES = "re.jrc.ec.europa.eu=25:25,api.postcodes.io=20:20,api.octopus.energy=10:10"
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("sunsave_lane", default="interactive")
+
+
+class QueueTimeout(TimeoutError):
+    """No token for the host before the caller's timeout."""
+
+
+def _parse_rates(spec: str) -> Dict[str, Tuple[float, float]]:
+    """``"host=rate[:burst],…"`` → {host: (rate, burst)}; rate 0 = unlimited."""
+    out = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        host, value = item.split("=", 1)
+        rate, _, burst = value.partition(":")
+        out[host.strip()] = (float(rate), float(burst or max(float(rate), 1.0)))
+    return out
+
+
+RATES = _parse_rates(os.environ.get("SUNSAVE_UPSTREAM_RATES", DEFAULT_RATES))
+
+
+# ─── lanes ───────────────────────────────────────────────
+@contextmanager
+def lane(name: str) -> Iterator[None]:
+    if name not in LANES:
+        raise ValueError(f"lane must be one of {', '.join(LANES)}")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def in_lane(name: str, fn: Callable) -> Callable:
+    """*fn* wrapped to run in lane *name* (for pool submissions)."""
+    def run(*args, **kwargs):
+        with lane(name):
+            return fn(*args, **kwargs)
+    return run
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+# ─── buckets ─────────────────────────────────────────────
+class Bucket:
+    """Token bucket with per-lane queues and a 429 pause."""
+
+    def __init__(self, rate: float, burst: float):
+        self.configured = rate
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = burst
+        self.paused_until = 0.0
+        self._t     = time.monotonic()
+        self._cond  = threading.Condition()
+        self.queued  = {name: 0 for name in LANES}
+        self.granted = {name: 0 for name in LANES}
+        self.wait_s  = {name: 0.0 for name in LANES}
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._t) * self.rate)
+        self._t = now
+
+    def acquire(self, lane_name: str, timeout: Optional[float] = None) -> float:
+        """Block until a token is granted to *lane_name*; returns seconds waited."""
+        rank  = LANES.index(lane_name)
+        floor = min(1.0 + (RESERVE * self.burst if rank else 0.0), self.burst)
+        t0 = time.monotonic()
+        deadline = None if timeout is None else t0 + timeout
+        with self._cond:
+            self.queued[lane_name] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ahead = any(self.queued[name] for name in LANES[:rank])
+                    if now >= self.paused_until and not ahead and self.tokens >= floor:
+                        self.tokens -= 1
+                        self.rate = min(self.configured,
+                                        self.rate + RECOVERY * self.configured)
+                        waited = now - t0
+                        self.granted[lane_name] += 1
+                        self.wait_s[lane_name] += waited
+                        return waited
+                    if now < self.paused_until:
+                        need = self.paused_until - now
+                    elif ahead:
+                        need = 1.0 / self.rate          # woken early by notify
+                    else:
+                        need = (floor - self.tokens) / self.rate
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise QueueTimeout(f"no upstream token within {timeout:.1f}s")
+                        need = min(need, deadline - now)
+                    self._cond.wait(need)
+            finally:
+                self.queued[lane_name] -= 1
+                self._cond.notify_all()
+
+    def throttle(self, pause_s: float) -> None:
+        """The host answered 429: pause everyone and back the rate off."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + pause_s)
+            self.rate = max(self.rate / 2, MIN_RATE * self.configured)
+            self.throttled += 1
+
+
+_buckets: Dict[str, Bucket] = {}
+_lock = threading.Lock()
+
+
+def bucket(host: str) -> Optional[Bucket]:
+    """The host's bucket, or None when it is not rate limited."""
+    b = _buckets.get(host)
+    if b is None:
+        rate, burst = RATES.get(host, (0.0, 0.0))
+        if rate <= 0:
+            return None
+        with _lock:
+            b = _buckets.setdefault(host, Bucket(rate, burst))
+    return b
+
+
+# ─── public API ──────────────────────────────────────────
+def acquire(host: str, timeout: Optional[float] = None) -> float:
+    """Wait for a token for *host* in the current lane; seconds waited."""
+    b = bucket(host)
+    return 0.0 if b is None else b.acquire(current_lane(), timeout)
+
+
+def throttled(host: str, pause_s: float) -> None:
+    b = bucket(host)
+    if b is not None:
+        b.throttle(pause_s)
+
+
+def stats() -> Dict[str, dict]:
+    """Per-host snapshot: rate, tokens, 429s, and queued/granted/wait_s per lane."""
+    with _lock:
+        items = list(_buckets.items())
+    out = {}
+    for host, b in items:
+        with b._cond:
+            out[host] = {"rate": b.rate, "tokens": b.tokens, "throttled": b.throttled,
+                         "queued": dict(b.queued), "granted": dict(b.granted),
+                         "wait_s": dict(b.wait_s)}
+    return out
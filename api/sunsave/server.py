@@ -5,39 +5,88 @@ Endpoints
 ---------
 /simulate  – average daily generation (kWh)
 /dispatch  – 24 h battery schedule & full economics
+/site      – both of the above from one geocode + one PVGIS series
+/tariffs   – the same day's bills under every catalogue tariff
+/metrics   – Prometheus stage timings and cache counters
 """
 
 from __future__ import annotations
 
 from datetime import date
+from typing import List, Optional
 import datetime as dt
-import numpy as np
 import pandas as pd
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+from . import metrics, response_cache
+from .encoding import install_gzip
 from .simulate import forecast_day
-from .octopus_prices import agile_prices, mock_prices
-from .dispatch import greedy_dispatch, BatteryCfg   # BatteryCfg only echoed
+from .pipeline import fetch_site_inputs, UpstreamTimeout
+from .upstream import UpstreamError
+from .dispatch import greedy_dispatch, BatteryCfg, ARRAY_ENGINES   # BatteryCfg only echoed
+from .demand import Demand, demand_from
+from .profiles import Plane, parse_planes
+from .summary import run_site_summary
+from .tariffs import run_tariff_comparison
 
 # ────────────────────────────────────────────────────────
 app = Flask(__name__)
 CORS(app)  # allow localhost React dev-server
+metrics.instrument(app)     # Server-Timing on every response
+install_gzip(app)
+
+
+@app.errorhandler(UpstreamTimeout)
+def upstream_timeout(e: UpstreamTimeout):
+    return jsonify(error=str(e), stage=e.stage), 504
+
+
+@app.errorhandler(UpstreamError)
+def upstream_error(e: UpstreamError):
+    # postcodes.io 404 → the user typed a bad postcode
+    status = 400 if e.status in (400, 404) else 502
+    return jsonify(error=str(e), upstream=e.host), status
+
+
+def _demand() -> Demand:
+    """
+    Household load for this request: ``profile`` / ``annual_kwh`` query
+    parameters, or a smart-meter CSV POSTed as the body or a ``file`` part.
+    """
+    csv = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        csv = upload.read() if upload else request.get_data()
+    return demand_from(request.args.get("profile"),
+                       request.args.get("annual_kwh", type=float), csv)
+
+
+def _planes() -> Optional[List[Plane]]:
+    """``planes=kwp:tilt:azim,…`` roof faces; None → one south-facing ``kwp`` array."""
+    text = request.args.get("planes")
+    return parse_planes(text) if text else None
 
 
 # ─── /simulate ───────────────────────────────────────────
 @app.route("/simulate")
+@response_cache.cached()
 def simulate_route():
     """Return estimated **daily** PV generation for a given array & postcode."""
     postcode = request.args["postcode"]
     kwp      = float(request.args.get("kwp", 4))
 
-    pv = forecast_day(postcode, kwp)        # 48 × ½ h series
+    try:
+        planes = _planes()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    pv = forecast_day(postcode, kwp, planes=planes)     # 48 × ½ h series
     return jsonify({"daily_kwh": pv.sum()})
 
 
 # ─── /dispatch ───────────────────────────────────────────
-@app.route("/dispatch")
+@app.route("/dispatch", methods=["GET", "POST"])
+@response_cache.cached()
 def dispatch_route():
     """
     24-hour battery dispatch simulation (live Agile by default).
@@ -46,16 +95,26 @@ def dispatch_route():
     ----------------
     postcode  : str   (required)
     kwp       : float – array size (default 4)
+    planes    : str   – roof faces 'kwp:tilt:azim,…' instead of kwp,
+                        e.g. '3:35:-90,3:35:90' for east/west
     tariff    : str   – 'agile' (default) or 'mock'
+    strategy  : str   – 'greedy' (default) or 'optimal' (price-aware DP)
 
     cap_kwh   : float – battery capacity     (default 5)
     pow_kw    : float – max power            (default 3)
     eta       : float – round-trip efficiency (default 0.92)
+
+    profile    : str   – load profile: 'domestic' (default), 'economy7',
+                         'business' or 'none'
+    annual_kwh : float – scale the load to this yearly use (default 2700)
+
+    POST a half-hourly smart-meter CSV to use the household's own load.
     """
     # ── core args ──
     postcode = request.args["postcode"]
     kwp      = float(request.args.get("kwp", 4))
     tariff   = request.args.get("tariff", "agile")
+    strategy = request.args.get("strategy", "greedy")
 
     # ── battery spec ──
     cap_kwh = float(request.args.get("cap_kwh", 5.0))
@@ -64,45 +123,103 @@ def dispatch_route():
 
     if cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
         return jsonify(error="cap_kwh>0, pow_kw>0 and 0<eta≤1 required"), 400
-
-    # ── PV forecast ──
+    if strategy not in ARRAY_ENGINES:
+        return jsonify(error=f"strategy must be one of {', '.join(ARRAY_ENGINES)}"), 400
+    try:
+        load = _demand()
+        planes = _planes()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    # ── PV forecast + price curve, fetched concurrently ──
     target_day = date.today() 
-    pv = forecast_day(postcode, kwp, when=target_day)
-
-    # ── fixed evening household load (0.6 kWh 17:00–22:00) ──
-    hrs  = pv.index.hour
-    load_vals = np.where((hrs >= 17) & (hrs < 22), 0.6, 0.0)
-    demand = pd.Series(load_vals, index=pv.index, name="demand_kwh")
-
-    # ── price curve ──
-    fallback = False
-    if tariff == "agile":
-        try:
-            prices = agile_prices(target_day, postcode=postcode)
-            if len(prices) < 48:
-                raise ValueError("incomplete Agile dataset")
-        except Exception as e:
-            print(f"⚠️  Agile fetch failed ({e}) – using mock prices.")
-            prices   = mock_prices(pv.index)   # keep index identical
-            fallback = True
-    else:
-        prices = mock_prices(pv.index)         # user explicitly asked for mock
+    inputs = fetch_site_inputs(postcode, kwp, when=target_day, tariff=tariff,
+                               planes=planes)
+    pv       = inputs.pv_halfhour
+    prices   = inputs.prices            # mock if asked for, or if Agile is down
+    fallback = inputs.fallback
+
+    # ── household load for the same UTC half-hours ──
+    demand = pd.Series(load.day(inputs.when), index=pv.index, name="demand_kwh")
 
     # ── dispatch ──
-    res = greedy_dispatch(
-        pv, prices,
-        cap_kwh=cap_kwh, pow_kw=pow_kw, eta=eta,
-        demand_kwh=demand,
-    )
-
-    return jsonify(
-        money_saved    = res["money_saved"],
-        baseline_cost  = res["baseline_cost"],
-        with_batt_cost = res["with_batt_cost"],
-        kwh_shifted    = res["kwh_shifted"],
-        battery        = {"cap_kwh": cap_kwh, "pow_kw": pow_kw, "eta": eta},
-        fallback       = fallback,
-    )
+    with metrics.stage("dispatch"):
+        res = greedy_dispatch(
+            pv, prices,
+            cap_kwh=cap_kwh, pow_kw=pow_kw, eta=eta,
+            demand_kwh=demand,
+            strategy=strategy,
+        )
+
+    with metrics.stage("serialise"):
+        return jsonify(
+            money_saved    = res["money_saved"],
+            baseline_cost  = res["baseline_cost"],
+            with_batt_cost = res["with_batt_cost"],
+            kwh_shifted    = res["kwh_shifted"],
+            battery        = {"cap_kwh": cap_kwh, "pow_kw": pow_kw, "eta": eta},
+            demand         = load.describe(),
+            fallback       = fallback,
+            strategy       = strategy,
+        )
+
+
+# ─── /site ───────────────────────────────────────────────
+@app.route("/site", methods=["GET", "POST"])
+@response_cache.cached()
+def site_route():
+    """
+    Generation summary + dispatch economics together (same query
+    parameters and defaults as /dispatch).
+    """
+    try:
+        summary = run_site_summary(
+            request.args["postcode"],
+            float(request.args.get("kwp", 4)),
+            float(request.args.get("cap_kwh", 5.0)),
+            float(request.args.get("pow_kw", 3.0)),
+            float(request.args.get("eta", 0.92)),
+            strategy=request.args.get("strategy", "greedy"),
+            tariff=request.args.get("tariff", "agile"),
+            demand=_demand(),
+            planes=_planes(),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(summary)
+
+
+# ─── /tariffs ────────────────────────────────────────────
+@app.route("/tariffs")
+@response_cache.cached()
+def tariffs_route():
+    """
+    Bills with and without the battery under each tariff (same battery
+    parameters as /dispatch; ``tariffs=agile,go,flux`` to pick).
+    """
+    names = [n.strip() for n in request.args.get("tariffs", "").split(",") if n.strip()]
+    try:
+        result = run_tariff_comparison(
+            request.args["postcode"],
+            float(request.args.get("kwp", 4)),
+            float(request.args.get("cap_kwh", 5.0)),
+            float(request.args.get("pow_kw", 3.0)),
+            float(request.args.get("eta", 0.92)),
+            tariffs=names,
+            strategy=request.args.get("strategy", "greedy"),
+            demand=_demand(),
+            planes=_planes(),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result)
+
+
+# ─── /metrics ────────────────────────────────────────────
+@app.route("/metrics")
+def metrics_route():
+    """Prometheus text: stage/route histograms, cache and upstream counters."""
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
 
 
 # ─── dev helper ──────────────────────────────────────────
@@ -1,21 +1,17 @@
 # simulate.py  
-import argparse
-import requests
 import pandas as pd
 import numpy as np
 import datetime as dt
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
 from .octopus_prices import agile_prices
-
-
-PVGIS_VERSION = "v5_3"                         # need ≥5.3 for SARAH-3
-BASE_URL      = f"https://re.jrc.ec.europa.eu/api/{PVGIS_VERSION}/"
-
-PVGIS_URL  = BASE_URL + "PVcalc"
-SERIES_URL = BASE_URL + "seriescalc"
-HOURLY_URL = SERIES_URL
-
-DEFAULT_RAD_DB = "PVGIS-SARAH3"                # ends 2023  :contentReference[oaicite:0]{index=0}
+from . import upstream
+from .geo import resolve
+from .profiles import (  # noqa: F401 – PVGIS constants re-exported
+    BASE_URL, DEFAULT_RAD_DB, HOURLY_URL, PVGIS_URL, PVGIS_VERSION, SERIES_URL,
+    Plane, day_slice_array, fetch_unit_profile as _fetch_unit_profile, site_profile,
+    unit_profile,
+)
 
 # ──────────────────────────────────────────────────────────────────────
 def estimate_generation(lat: float, lon: float, kwp: float,
@@ -25,12 +21,20 @@ def estimate_generation(lat: float, lon: float, kwp: float,
               "peakpower": kwp, "loss": 14,
               "raddatabase": raddatabase,
               "outputformat": "json", "browser": 0}
-    r = requests.get(PVGIS_URL, params=params, timeout=20)
-    r.raise_for_status()
+    r = upstream.get(PVGIS_URL, params=params, timeout=20)
     annual_kwh = r.json()["outputs"]["totals"]["fixed"]["E_y"]
     return annual_kwh / 365
 
 
+@lru_cache(maxsize=32)
+def _year_index(year: int, n: Optional[int] = None) -> pd.DatetimeIndex:
+    start = pd.Timestamp(year=year, month=1, day=1, tz="UTC")
+    if n is None:
+        n = int((pd.Timestamp(year=year + 1, month=1, day=1, tz="UTC") - start)
+                / pd.Timedelta(hours=1))
+    return pd.date_range(start, periods=n, freq="h", tz="UTC", name="time")
+
+
 def hourly_generation_series(
     lat: float,
     lon: float,
@@ -39,44 +43,25 @@ def hourly_generation_series(
     azim: int = 0,
     year: Optional[int] = None,
     raddatabase: str = DEFAULT_RAD_DB,
+    planes: Optional[Sequence[Plane]] = None,
 ) -> pd.Series:
     """
     Return *hourly* PV energy (kWh) for one calendar year.
+
+    The per-kWp profile comes from the precomputed :mod:`irradiance_grid`
+    when one is configured and covers the site; otherwise it is fetched
+    once per rounded site/orientation and kept in :mod:`pv_cache`.  Every
+    call just scales it by *kwp* – or, given roof *planes* (which replace
+    kwp/tilt/azim), sums one profile per distinct orientation.
+    Raises ``UpstreamError`` if PVGIS cannot be reached.
     """
-    params = {"lat": lat, "lon": lon,
-              "surface_tilt": tilt, "surface_azimuth": azim,
-              "raddatabase": raddatabase,
-              "pvcalculation": 1, "peakpower": kwp, "loss": 14,
-              "pvtechchoice": "crystSi", "mountingplace": "building",
-              "outputformat": "json", "browser": 0}
     if year is None:
-        year = 2023            #
-    params["startyear"] = params["endyear"] = year
-
-    try:
-        r = requests.get(HOURLY_URL, params=params, timeout=35)
-        r.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        # Log the error and return an empty series
-        print(f"Error fetching data from PVGIS: {e}")
-        return pd.Series([], dtype=float)
-    src = r.json()
-
-    # ---- parse the hourly table ------------------------------------------------
-    df = pd.DataFrame(src["outputs"]["hourly"])
-    # YYYYMMDD:HHMM  → pandas datetime (UTC)
-    df["time"] = pd.to_datetime(df["time"],
-                                format="%Y%m%d:%H%M",  # <-- key line ### CHANGED ###
-                                utc=True)              # PVGIS gives UTC stamps  :contentReference[oaicite:1]{index=1}
-    df.set_index("time", inplace=True)
-
-    # power [W] every 10 min → energy [kWh] and sum per ISO hour
-    power_w = df["P"].astype(float)
-    dt_h = (df.index[1] - df.index[0]).total_seconds() / 3600   # 0.166… for SARAH
-    energy_each = power_w * dt_h / 1000.0                      # kWh per sample
-    hourly_kwh = energy_each.resample("h").sum()               # 60-min buckets
-    hourly_kwh.name = "pv_kwh"
-    return hourly_kwh
+        year = 2023
+
+    from .pipeline import fetch_pool
+    kwh = site_profile(lat, lon, planes or [Plane(kwp, tilt, azim)], year, raddatabase,
+                       pool=fetch_pool)
+    return pd.Series(kwh, index=_year_index(year, len(kwh)), name="pv_kwh")
 
 def mock_price_series(index: pd.DatetimeIndex) -> pd.Series:
     """
@@ -89,14 +74,13 @@ def mock_price_series(index: pd.DatetimeIndex) -> pd.Series:
     return pd.Series(base, index=index, name="price_£pkWh")
 
 def geocode(postcode: str) -> Tuple[float, float]:
-    r = requests.get(f"https://api.postcodes.io/postcodes/{postcode}", timeout=10)
-    r.raise_for_status()
-    res = r.json()["result"]
-    return res["latitude"], res["longitude"]
+    site = resolve(postcode)
+    return site.lat, site.lon
 
 
 # ── CLI ───────────────────────────────────────────────────────────────
 if __name__ == "__main__":
+    import argparse
     from .dispatch import greedy_dispatch, BatteryCfg  
     p = argparse.ArgumentParser(
         description="Estimate solar generation for a UK site")
@@ -169,7 +153,8 @@ import datetime as _dt
 import numpy as np
 import pandas as pd
 
-def forecast_day(postcode: str, kwp: float, *, when: _dt.date | None = None):
+def forecast_day(postcode: str, kwp: float, *, when: _dt.date | None = None,
+                 planes: Optional[Sequence[Plane]] = None):
     """
     Half-hour PV forecast (kWh) for the next 24 h, **aligned to today’s date**.
 
@@ -177,6 +162,8 @@ def forecast_day(postcode: str, kwp: float, *, when: _dt.date | None = None):
     • Lifts the right month-and-day out of 2023 and re-dates it to *when*.
     • Splits each 1-hour kWh equally into two 30-min slots so the series lines
       up with price data.
+    • *planes* (kWp, tilt, azimuth per roof face) replace the single *kwp*
+      south-facing array.
 
     Returns
     -------
@@ -189,32 +176,36 @@ def forecast_day(postcode: str, kwp: float, *, when: _dt.date | None = None):
     lat, lon = geocode(postcode)
 
     # 2) One-year hourly series (latest SARAH-3 year = 2023)
-    hourly_2023 = hourly_generation_series(lat, lon, kwp, year=2023)
+    hourly_2023 = hourly_generation_series(lat, lon, kwp, year=2023, planes=planes)
 
-    # 3) Grab the matching 24 h in 2023
-    try:
-        src_start = _dt.datetime(2023, when.month, when.day,
-                                 tzinfo=_dt.timezone.utc)
-    except ValueError:             # 29 Feb on a non-leap year
-        src_start = _dt.datetime(2023, when.month, when.day - 1,
-                                 tzinfo=_dt.timezone.utc)
+    # 3) + 4) matching 24 h in 2023, re-dated and split into half-hours
+    return day_slice(hourly_2023, when)
 
-    src_slice = hourly_2023.loc[src_start : src_start + _dt.timedelta(hours=23)]
-    if len(src_slice) != 24:       # last-ditch fall-back
-        src_slice = hourly_2023.head(24)
 
-    # 4) Re-date to the requested day & split into half-hours
+def day_slice(hourly: pd.Series, when: _dt.date) -> pd.Series:
+    """
+    Cut the calendar day matching *when* out of a one-year hourly series
+    and return it as 48 half-hour kWh values re-dated to *when*.
+    """
+    year = hourly.index[0].year if len(hourly) else 2023
+
+    # Re-date to the requested day & split into half-hours
     tgt_start = _dt.datetime(when.year, when.month, when.day,
                              tzinfo=_dt.timezone.utc)
     half_idx  = pd.date_range(tgt_start, periods=48, freq="30min", tz="UTC")
-    half_vals = np.repeat(src_slice.values / 2.0, 2)
+    half_vals = day_slice_array(hourly.to_numpy(), year, when)
 
     return pd.Series(half_vals, index=half_idx, name="pv_kwh")
 
-def calculate_daily_solar_generation(postcode: str, kwp: float) -> float:
+def calculate_daily_solar_generation(postcode: str, kwp: float,
+                                     planes: Optional[Sequence[Plane]] = None) -> float:
     """
     Wrapper so api/index.py can import the legacy name.
-    Converts postcode -> (lat, lon) and calls estimate_generation().
+    Converts postcode -> (lat, lon) and calls estimate_generation(); with
+    roof *planes* the average comes from their (cached) hourly profiles.
     """
     lat, lon = geocode(postcode)
+    if planes:
+        hourly = hourly_generation_series(lat, lon, kwp, planes=planes)
+        return float(hourly.sum()) / (len(hourly) / 24)
     return estimate_generation(lat, lon, kwp)
\ No newline at end of file
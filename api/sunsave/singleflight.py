@@ -0,0 +1,66 @@
+"""
+Single-flight call coalescing.
+
+When many requests miss a cache for the same key at the same moment –
+dozens of users from one postcode district after a local news story –
+only the first (the *leader*) calls upstream.  Everyone else arriving
+while that call is in flight (the *followers*) waits on it and gets the
+same result, or the same exception:
+
+    flight = SingleFlight("pvgis")
+    profile = flight.do(key, lambda: fetch(key))
+
+Upstream load is then bounded by distinct keys, not by concurrent users.
+Nothing is remembered once the call returns – caching stays with the
+caller – so a failure is retried by the next request, not replayed.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+# every group, for the metrics exposition
+groups: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """One in-flight call per key; concurrent callers share its outcome."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = self.followers = 0
+        groups.append(self)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,73 @@
+"""
+Everything the Tool page shows, from one fetch per upstream.
+
+``/simulate`` (PVGIS ``PVcalc``) and ``/dispatch`` (PVGIS ``seriescalc``)
+used to be called side by side for every submit, each geocoding the
+postcode and each hitting PVGIS.  Here the site is resolved once, the
+hourly year is fetched once (alongside the day's prices) and both the
+generation summary and the dispatch economics are derived from it.
+
+The daily average is the SARAH year's total / days in the year, so it
+uses the same series the dispatch runs on.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Optional, Sequence
+
+from . import metrics
+from .demand import DEFAULT as DEFAULT_DEMAND, Demand
+from .dispatch import BatteryCfg, engine
+from .pipeline import fetch_site_inputs
+from .profiles import Plane
+
+
+def run_site_summary(
+    postcode: str,
+    kwp: float,
+    cap_kwh: float,
+    pow_kw: float,
+    eta: float = BatteryCfg().eta,
+    *,
+    strategy: str = "greedy",
+    tariff: str = "agile",
+    when: Optional[dt.date] = None,
+    demand: Optional[Demand] = None,
+    planes: Optional[Sequence[Plane]] = None,
+) -> dict:
+    """JSON-ready generation summary + one-day dispatch economics."""
+    if kwp <= 0 or cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
+        raise ValueError("kwp>0, cap_kwh>0, pow_kw>0, 0<eta≤1")
+    run = engine(strategy)                      # reject bad names before fetching
+
+    inputs = fetch_site_inputs(postcode, kwp, when=when, tariff=tariff, planes=planes)
+    pv_day = inputs.pv_day
+    demand = demand or DEFAULT_DEMAND
+
+    with metrics.stage("dispatch"):
+        res = run(pv_day, inputs.price_day, demand.day(inputs.when), cap_kwh, pow_kw, eta)
+
+    hourly = inputs.pv_year
+    annual_kwh = float(hourly.sum())
+    site = inputs.site
+    return {
+        "site": {"postcode": site.postcode, "lat": site.lat, "lon": site.lon,
+                 "region": site.region},
+        "generation": {
+            "daily_kwh":  annual_kwh / (len(hourly) / 24),
+            "annual_kwh": annual_kwh,
+            "today_kwh":  float(pv_day.sum()),
+        },
+        "dispatch": {
+            "money_saved":    res["money_saved"],
+            "baseline_cost":  res["baseline_cost"],
+            "with_batt_cost": res["with_batt_cost"],
+            "kwh_shifted":    res["kwh_shifted"],
+            "strategy":       strategy,
+        },
+        "battery":  {"cap_kwh": cap_kwh, "pow_kw": pow_kw, "eta": eta},
+        "demand":   demand.describe(),
+        "date":     inputs.when.isoformat(),
+        "fallback": inputs.fallback,
+    }
@@ -0,0 +1,129 @@
+"""
+Battery-sizing sweep – every (cap_kwh, pow_kw, eta) combination in one pass.
+
+The greedy rule only branches on the *sign* of PV – demand, which is the
+same for every battery, so the slot loop runs once and each step updates
+all configurations together as NumPy vectors.  The site's PV and prices
+are fetched once, however large the grid.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .demand import DEFAULT as DEFAULT_DEMAND, Demand
+from .pipeline import fetch_site_inputs
+from .profiles import Plane
+
+# ─────────────────────────────────────────────────────────
+MAX_CONFIGS = 10_000
+
+
+def parse_axis(text: str) -> np.ndarray:
+    """
+    ``"5,10,13.5"`` → listed values,  ``"5:15:2.5"`` → 5 to 15 inclusive.
+    A bare number is a one-point axis.  ``nan`` / ``inf`` are refused.
+    """
+    text = text.strip()
+    if ":" in text:
+        start, stop, step = (float(x) for x in text.split(":"))
+        if not np.isfinite([start, stop, step]).all():
+            raise ValueError(f"axis values must be finite: {text!r}")
+        if step <= 0:
+            raise ValueError(f"range step must be > 0: {text!r}")
+        n = int(np.floor((stop - start) / step + 1e-9)) + 1
+        if n > MAX_CONFIGS:
+            raise ValueError(f"range too long: {text!r}")
+        return start + step * np.arange(max(n, 0))
+    values = np.array([float(x) for x in text.split(",") if x.strip()])
+    if not np.isfinite(values).all():
+        raise ValueError(f"axis values must be finite: {text!r}")
+    return values
+
+
+# ─── vectorised dispatch ─────────────────────────────────
+def sweep_arrays(
+    pv: np.ndarray,
+    prices: np.ndarray,
+    demand: np.ndarray | None,
+    cap_kwh: Sequence[float],
+    pow_kw: Sequence[float],
+    eta: Sequence[float],
+    dt_h: float = 0.5,
+) -> dict:
+    """
+    Greedy dispatch for the full ``cap × pow × eta`` grid.
+
+    Returns ``baseline_cost`` (scalar) and ``with_batt_cost``,
+    ``money_saved``, ``kwh_shifted`` as arrays shaped
+    ``(len(cap_kwh), len(pow_kw), len(eta))``.
+    """
+    pv     = np.asarray(pv, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    demand = np.zeros_like(pv) if demand is None else np.asarray(demand, dtype=np.float64)
+
+    cap_ax, pow_ax, eta_ax = (np.asarray(a, dtype=np.float64) for a in (cap_kwh, pow_kw, eta))
+    if (cap_ax <= 0).any() or (pow_ax <= 0).any() or ((eta_ax <= 0) | (eta_ax > 1)).any():
+        raise ValueError("cap_kwh>0, pow_kw>0, 0<eta≤1")
+    shape = (len(cap_ax), len(pow_ax), len(eta_ax))
+
+    cap, pow_, eta_ = (g.ravel() for g in np.meshgrid(cap_ax, pow_ax, eta_ax, indexing="ij"))
+    step = pow_ * dt_h
+    eff  = np.sqrt(eta_)
+
+    soc     = np.zeros(cap.size)
+    cost    = np.zeros(cap.size)
+    shifted = np.zeros(cap.size)
+    tmp     = np.empty(cap.size)
+
+    net = pv - demand
+    for x, p in zip(net.tolist(), prices.tolist()):
+        if x > 0:                                   # surplus → battery, rest exported
+            np.minimum(step, cap - soc, out=tmp)
+            np.minimum(tmp, x, out=tmp)
+            soc  += tmp * eff
+            cost -= (x - tmp) * p
+        else:                                       # deficit → battery, rest imported
+            np.minimum(step, soc, out=tmp)
+            np.minimum(tmp, -x, out=tmp)
+            soc     -= tmp
+            shifted += tmp
+            cost    += (-x - tmp) * p
+
+    baseline_cost = float(np.dot(demand - pv, prices))
+    return {
+        "baseline_cost": baseline_cost,
+        "with_batt_cost": cost.reshape(shape),
+        "money_saved": (baseline_cost - cost).reshape(shape),
+        "kwh_shifted": shifted.reshape(shape),
+    }
+
+
+def run_sweep(postcode: str, kwp: float, cap_kwh: Sequence[float],
+              pow_kw: Sequence[float], eta: Sequence[float],
+              demand: Optional[Demand] = None,
+              planes: Optional[Sequence[Plane]] = None) -> dict:
+    """Fetch the site once, sweep the grid, return a JSON-ready surface."""
+    n = len(cap_kwh) * len(pow_kw) * len(eta)
+    if not 0 < n <= MAX_CONFIGS:
+        raise ValueError(f"grid must have 1–{MAX_CONFIGS} combinations (got {n})")
+
+    demand = demand or DEFAULT_DEMAND
+    inputs = fetch_site_inputs(postcode, kwp, planes=planes)
+    res = sweep_arrays(inputs.pv_day, inputs.price_day, demand.day(inputs.when),
+                       cap_kwh, pow_kw, eta)
+
+    return {
+        "axes": {
+            "cap_kwh": [round(float(v), 4) for v in cap_kwh],
+            "pow_kw":  [round(float(v), 4) for v in pow_kw],
+            "eta":     [round(float(v), 4) for v in eta],
+        },
+        "baseline_cost": res["baseline_cost"],
+        "money_saved": np.round(res["money_saved"], 4).tolist(),
+        "kwh_shifted": np.round(res["kwh_shifted"], 3).tolist(),
+        "demand": demand.describe(),
+        "fallback": inputs.fallback,
+    }
@@ -0,0 +1,274 @@
+"""
+Tariff catalogue and many-tariff costing.
+
+Each tariff is two 48-slot price profiles – import and export £/kWh by UK
+local half-hour – plus a daily standing charge.  Rule-based tariffs
+(flat, two-rate, time-of-use) are built from bands; Agile and other
+half-hourly products are fetched from Octopus through the shared
+:data:`octopus_prices.store`.  For a given day every selected tariff is
+laid onto the UTC slot grid and stacked into ``(tariffs × slots)``
+import / export matrices.
+
+Costing is then one matrix product: with the baseline (PV only) and
+with-battery grid flows stacked as a ``(2 × slots)`` matrix ``F``,
+
+    cost = P_import @ F_importᵀ − P_export @ F_exportᵀ + standing
+
+gives every tariff's bill for both cases at once, so 20 tariffs cost
+barely more than one.  The greedy schedule does not look at prices and is
+run once; ``strategy="optimal"`` plans against each tariff's own import
+and export prices, one kernel run per tariff.
+
+Rates in :data:`CATALOGUE` are indicative (VAT-inc, 2025) – override or
+extend it with :func:`flat`, :func:`two_rate`, :func:`tou` and
+:func:`octopus`.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .demand import DEFAULT as DEFAULT_DEMAND, Demand
+from .dispatch import BatteryCfg, engine
+from .octopus_prices import PRODUCT_CODE, _fill, store
+from .price_store import PricesUnavailable, utc_offset_slots
+from .profiles import Plane
+
+log = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+SEG_EXPORT = 0.15                          # £/kWh – typical fixed export rate
+AGILE_OUTGOING = "AGILE-OUTGOING-19-05-13"
+
+Band = Tuple[float, float, float]          # start hour, end hour (local), £/kWh
+
+
+@dataclass(slots=True)
+class Tariff:
+    name: str
+    kind: str                              # flat | two_rate | tou | octopus
+    import_p: Optional[np.ndarray]         # 48 × £/kWh by local half-hour; None → fetched
+    export_p: Optional[np.ndarray]         # idem
+    standing: float = 0.0                  # £/day
+    product: Optional[str] = None          # Octopus import product (kind="octopus")
+    export_product: Optional[str] = None   # Octopus export product, if any
+    export_fallback: float = SEG_EXPORT
+
+
+# ─── builders ────────────────────────────────────────────
+def _profile(default: float, bands: Sequence[Band] = ()) -> np.ndarray:
+    """48 local half-hours at *default*, overridden by (start, end, rate) bands."""
+    p = np.full(48, float(default))
+    hours = np.arange(48) / 2
+    for start, end, rate in bands:
+        inside = ((hours >= start) & (hours < end) if start < end
+                  else (hours >= start) | (hours < end))          # wraps midnight
+        p[inside] = rate
+    return p
+
+
+def flat(name: str, rate: float, export: float = SEG_EXPORT,
+         standing: float = 0.0) -> Tariff:
+    return Tariff(name, "flat", _profile(rate), _profile(export), standing)
+
+
+def two_rate(name: str, day: float, night: float, night_start: float,
+             night_end: float, export: float = SEG_EXPORT,
+             standing: float = 0.0) -> Tariff:
+    """Economy 7 / Go style: one cheap window, one day rate."""
+    return Tariff(name, "two_rate", _profile(day, [(night_start, night_end, night)]),
+                  _profile(export), standing)
+
+
+def tou(name: str, default: float, bands: Sequence[Band],
+        export: float = SEG_EXPORT, export_bands: Sequence[Band] = (),
+        standing: float = 0.0) -> Tariff:
+    """Time-of-use: any number of import (and export) bands."""
+    return Tariff(name, "tou", _profile(default, bands),
+                  _profile(export, export_bands), standing)
+
+
+def octopus(name: str, product: str, export_product: Optional[str] = None,
+            export: float = SEG_EXPORT, standing: float = 0.0) -> Tariff:
+    """Half-hourly prices fetched per region and day from Octopus."""
+    return Tariff(name, "octopus", None, None if export_product else _profile(export),
+                  standing, product, export_product, export)
+
+
+CATALOGUE: Dict[str, Tariff] = {t.name: t for t in (
+    octopus("agile", PRODUCT_CODE, AGILE_OUTGOING, standing=0.48),
+    flat("flat", 0.245, standing=0.60),
+    two_rate("economy7", day=0.28, night=0.14, night_start=0.5, night_end=7.5,
+             standing=0.58),
+    two_rate("go", day=0.27, night=0.085, night_start=0.5, night_end=5.5,
+             standing=0.60),
+    two_rate("intelligent_go", day=0.27, night=0.07, night_start=23.5, night_end=5.5,
+             standing=0.60),
+    tou("flux", 0.28, [(2, 5, 0.17), (16, 19, 0.38)],
+        export=0.19, export_bands=[(2, 5, 0.08), (16, 19, 0.29)], standing=0.60),
+    tou("cosy", 0.27, [(4, 7, 0.14), (13, 16, 0.14), (22, 24, 0.14), (16, 19, 0.40)],
+        standing=0.60),
+)}
+
+
+def select(names: Optional[Sequence[str]] = None) -> List[Tariff]:
+    """Catalogue entries by name (all of them by default)."""
+    if not names:
+        return list(CATALOGUE.values())
+    unknown = [n for n in names if n not in CATALOGUE]
+    if unknown:
+        raise ValueError(f"unknown tariff(s) {', '.join(unknown)}; "
+                         f"choose from {', '.join(CATALOGUE)}")
+    return [CATALOGUE[n] for n in dict.fromkeys(names)]
+
+
+# ─── laying tariffs onto a day ───────────────────────────
+def _fetched(product: str, region: str, when: dt.date) -> np.ndarray:
+    values = _fill(store.get(product, region, when))
+    if np.isnan(values).any():
+        raise PricesUnavailable(f"{product} not published for {when}")
+    return values
+
+
+def day_prices(tariff: Tariff, when: dt.date,
+               region: str) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """``(import, export, fallback)`` on *when*'s 48 UTC half-hours."""
+    shift = utc_offset_slots(when)                       # UTC slot i = local slot i + shift
+    utc = lambda local: np.roll(local, -shift)       # noqa: E731
+    fallback = False
+    if tariff.import_p is not None:
+        imp = utc(tariff.import_p)
+    else:
+        try:
+            imp = _fetched(tariff.product, region, when)
+        except PricesUnavailable as e:
+            log.warning("%s unavailable (%s) – skipped.", tariff.name, e)
+            raise
+    if tariff.export_p is not None:
+        exp = utc(tariff.export_p)
+    else:
+        try:
+            exp = _fetched(tariff.export_product, region, when)
+        except PricesUnavailable:
+            exp, fallback = np.full(48, tariff.export_fallback), True
+    return imp, exp, fallback
+
+
+def price_matrices(tariffs: Sequence[Tariff], when: dt.date, region: str) -> dict:
+    """
+    ``(T × 48)`` import and export matrices for the tariffs that could be
+    priced, their standing charges, names and export-fallback flags, plus
+    the names that could not (``unavailable``).
+    """
+    rows, unavailable = [], []
+    for t in tariffs:
+        try:
+            rows.append((t, *day_prices(t, when, region)))
+        except PricesUnavailable:
+            unavailable.append(t.name)
+    return {
+        "names":    [t.name for t, *_ in rows],
+        "import":   np.array([imp for _, imp, _, _ in rows]).reshape(len(rows), -1),
+        "export":   np.array([exp for _, _, exp, _ in rows]).reshape(len(rows), -1),
+        "standing": np.array([t.standing for t, *_ in rows]),
+        "fallback": [fb for *_, fb in rows],
+        "unavailable": unavailable,
+    }
+
+
+# ─── costing ─────────────────────────────────────────────
+def cost_matrix(imp_p: np.ndarray, exp_p: np.ndarray,
+                imports: np.ndarray, exports: np.ndarray) -> np.ndarray:
+    """``(T × S)`` prices against ``(K × S)`` grid flows → ``(T × K)`` energy £."""
+    return imp_p @ np.atleast_2d(imports).T - exp_p @ np.atleast_2d(exports).T
+
+
+def compare(
+    pv: np.ndarray,
+    matrices: dict,
+    battery: BatteryCfg,
+    demand: Optional[np.ndarray] = None,
+    strategy: str = "greedy",
+) -> List[dict]:
+    """
+    Per-tariff bills for one day of *pv* / *demand*: without a battery
+    (PV only) and with it, cheapest with-battery bill first.
+    """
+    pv = np.asarray(pv, dtype=np.float64)
+    demand = np.zeros_like(pv) if demand is None else np.asarray(demand, dtype=np.float64)
+    imp_p, exp_p, standing = matrices["import"], matrices["export"], matrices["standing"]
+    if not len(imp_p):
+        return []
+
+    net = demand - pv
+    base = cost_matrix(imp_p, exp_p, np.maximum(net, 0.0), np.maximum(-net, 0.0))[:, 0]
+    run = engine(strategy)
+    if strategy == "greedy":                          # price-blind: one schedule for all
+        res = run(pv, imp_p[0], demand, battery.cap_kwh, battery.pow_kw, battery.eta)
+        batt = cost_matrix(imp_p, exp_p, res["import_grid"], res["export_grid"])[:, 0]
+        shifted = np.full(len(imp_p), res["kwh_shifted"])
+    else:                                             # each tariff plans its own day
+        flows = [run(pv, imp_p[t], demand, battery.cap_kwh, battery.pow_kw, battery.eta,
+                     export_prices=exp_p[t]) for t in range(len(imp_p))]
+        batt = np.einsum("ts,ts->t", imp_p, np.array([f["import_grid"] for f in flows])) \
+            - np.einsum("ts,ts->t", exp_p, np.array([f["export_grid"] for f in flows]))
+        shifted = np.array([f["kwh_shifted"] for f in flows])
+
+    rows = [{
+        "tariff":         name,
+        "baseline_cost":  float(base[t] + standing[t]),
+        "with_batt_cost": float(batt[t] + standing[t]),
+        "money_saved":    float(base[t] - batt[t]),
+        "kwh_shifted":    float(shifted[t]) + 0.0,          # no "-0.0"
+        "export_fallback": matrices["fallback"][t],
+    } for t, name in enumerate(matrices["names"])]
+    return sorted(rows, key=lambda r: r["with_batt_cost"])
+
+
+def run_tariff_comparison(
+    postcode: str,
+    kwp: float,
+    cap_kwh: float,
+    pow_kw: float,
+    eta: float = BatteryCfg().eta,
+    *,
+    tariffs: Optional[Sequence[str]] = None,
+    strategy: str = "greedy",
+    when: Optional[dt.date] = None,
+    demand: Optional[Demand] = None,
+    planes: Optional[Sequence[Plane]] = None,
+) -> dict:
+    """JSON-ready comparison of *tariffs* (catalogue names) for one site and day."""
+    from . import metrics
+    from .pipeline import fetch_site_inputs
+
+    battery = BatteryCfg(cap_kwh, pow_kw, eta)
+    if kwp <= 0 or cap_kwh <= 0 or pow_kw <= 0 or not 0 < eta <= 1:
+        raise ValueError("kwp>0, cap_kwh>0, pow_kw>0, 0<eta≤1")
+    engine(strategy)
+    chosen = select(tariffs)
+    demand = demand or DEFAULT_DEMAND
+
+    inputs = fetch_site_inputs(postcode, kwp, when=when, tariff="mock", planes=planes)
+    with metrics.stage("tariff_prices"):
+        matrices = price_matrices(chosen, inputs.when, inputs.site.region)
+    with metrics.stage("dispatch"):
+        rows = compare(inputs.pv_day, matrices, battery, demand.day(inputs.when),
+                       strategy=strategy)
+
+    site = inputs.site
+    return {
+        "site": {"postcode": site.postcode, "lat": site.lat, "lon": site.lon,
+                 "region": site.region},
+        "date": inputs.when.isoformat(),
+        "strategy": strategy,
+        "battery": {"cap_kwh": cap_kwh, "pow_kw": pow_kw, "eta": eta},
+        "demand": demand.describe(),
+        "tariffs": rows,
+        "unavailable": matrices["unavailable"],
+    }
@@ -0,0 +1,176 @@
+"""
+Shared HTTP client for PVGIS, postcodes.io and Octopus.
+
+• one pooled ``requests.Session`` per host – connections are kept alive,
+  so only the first call to a host pays the TCP + TLS handshake
+• gzip/deflate responses (PVGIS ``seriescalc`` JSON shrinks ~10×)
+• bounded retries with full-jitter exponential backoff on connection
+  errors, timeouts and 429/5xx (``Retry-After`` honoured, capped)
+• every failure surfaces as :class:`UpstreamError`
+• per-host counters – see :func:`stats`
+• every attempt waits for a token from :mod:`scheduler` (per-host rate
+  limit, priority lanes); a 429 pauses and slows the whole host
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics, scheduler
+
+# ─────────────────────────────────────────────────────────
+RETRIES      = 2                     # extra attempts after the first
+BACKOFF_S    = 0.25                  # base of the exponential backoff
+MAX_BACKOFF  = 4.0                   # cap on any single sleep
+POOL_SIZE    = 32                    # keep-alive connections per host
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "solarlink-sunsave/1.0",
+}
+
+
+def _parse_overrides(spec: str) -> Dict[str, str]:
+    """``"host=http://127.0.0.1:8001,host2=…"`` → {host: base URL}."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {host.strip(): base.strip().rstrip("/") for host, base in pairs}
+
+
+# Point an upstream host at a local stand-in (used by bench/); counters
+# and sessions stay keyed on the real host name.
+OVERRIDES: Dict[str, str] = _parse_overrides(os.environ.get("SUNSAVE_UPSTREAM_OVERRIDES", ""))
+
+
+class UpstreamError(requests.RequestException):
+    """An upstream call failed after retries (network error or HTTP status)."""
+
+    def __init__(self, host: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{host}: {message}")
+        self.host   = host
+        self.status = status
+
+
+# ─── sessions ────────────────────────────────────────────
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def session(host: str) -> requests.Session:
+    """Pooled keep-alive session for *host* (created on first use)."""
+    s = _sessions.get(host)
+    if s is None:
+        with _lock:
+            s = _sessions.get(host)
+            if s is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers.update(HEADERS)
+                _sessions[host] = s
+    return s
+
+
+# ─── counters ────────────────────────────────────────────
+_stats: Dict[str, Dict[str, float]] = defaultdict(
+    lambda: {"requests": 0, "errors": 0, "retries": 0,
+             "latency_s_total": 0.0, "latency_s_max": 0.0})
+
+
+def _record(host: str, elapsed: float, *, error: bool = False,
+            retry: bool = False) -> None:
+    with _lock:
+        st = _stats[host]
+        st["requests"] += 1
+        st["errors"]   += error
+        st["retries"]  += retry
+        st["latency_s_total"] += elapsed
+        st["latency_s_max"] = max(st["latency_s_max"], elapsed)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Snapshot of per-host counters (requests, errors, retries, latency)."""
+    with _lock:
+        return {host: dict(st) for host, st in _stats.items()}
+
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass                                 # HTTP-date form – ignore
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF_S * 2 ** attempt))
+
+
+# ─── public API ──────────────────────────────────────────
+def request(method: str, url: str, *, timeout: float = 20,
+            retries: int = RETRIES, **kwargs) -> requests.Response:
+    """
+    ``requests``-style call through the host's pooled session.
+    Returns the response for 2xx/3xx, raises :class:`UpstreamError` otherwise.
+    """
+    parts = urlsplit(url)
+    host  = parts.netloc
+    sess  = session(host)
+    if host in OVERRIDES:
+        base = urlsplit(OVERRIDES[host])
+        url  = urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        try:
+            waited = scheduler.acquire(host, timeout=timeout)
+        except scheduler.QueueTimeout as e:
+            _record(host, 0.0, error=True)
+            raise UpstreamError(host, str(e), status=429) from None
+        if waited > 0.001:
+            metrics.observe("upstream_queue", waited)
+
+        t0 = time.perf_counter()
+        try:
+            r = sess.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record(host, time.perf_counter() - t0, error=last, retry=not last)
+            if last:
+                raise UpstreamError(host, f"{type(e).__name__}: {e}") from e
+            time.sleep(_backoff(attempt))
+            continue
+
+        elapsed = time.perf_counter() - t0
+        if r.status_code == 429:
+            pause = _backoff(attempt, r.headers.get("Retry-After"))
+            scheduler.throttled(host, pause)            # slows every lane
+            if not last:
+                _record(host, elapsed, retry=True)
+                continue                                # acquire() waits out the pause
+        if r.status_code in RETRY_STATUS and not last:
+            _record(host, elapsed, retry=True)
+            time.sleep(_backoff(attempt, r.headers.get("Retry-After")))
+            continue
+        if r.status_code >= 400:
+            _record(host, elapsed, error=True)
+            raise UpstreamError(host, f"HTTP {r.status_code} for {parts.path}",
+                                status=r.status_code)
+        _record(host, elapsed)
+        return r
+
+    raise AssertionError("unreachable")
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,114 @@
+"""
+Micro-benchmark: greedy dispatch slots/second, legacy pandas loop vs the
+array kernel.
+
+    python bench/dispatch_kernel.py [--slots 17520] [--repeat 5]
+
+The pre-kernel loop is kept below as the reference implementation, so the
+script also checks that both agree to float tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from api.sunsave.dispatch import dispatch_arrays, greedy_dispatch  # noqa: E402
+
+
+# ─── reference: the original per-slot pandas loop ────────
+def legacy_greedy_dispatch(pv_kwh, prices, cap_kwh=5.0, pow_kw=3.0, eta=0.92,
+                           demand_kwh=None) -> dict:
+    if demand_kwh is None:
+        demand_kwh = pd.Series(0.0, index=pv_kwh.index)
+    dt_h = (pv_kwh.index[1] - pv_kwh.index[0]).total_seconds()/3600
+    step_limit = pow_kw * dt_h
+    eff        = eta ** 0.5
+
+    n = len(pv_kwh)
+    soc = 0.0
+    soc_log, import_grid, export_grid = np.zeros(n), np.zeros(n), np.zeros(n)
+    batt_in_kwh = 0.0
+    for i in range(n):
+        net = pv_kwh.iat[i] - demand_kwh.iat[i]
+        if net > 0:
+            charge = min(net, cap_kwh - soc, step_limit)
+            soc   += charge * eff
+            export_grid[i] = net - charge
+        else:
+            discharge = min(-net, soc, step_limit)
+            soc      -= discharge
+            batt_in_kwh += discharge
+            import_grid[i] = -net - discharge
+        soc_log[i] = soc
+
+    baseline_cost  = ((demand_kwh - pv_kwh) * prices).sum()
+    with_batt_cost = ((import_grid - export_grid) * prices).sum()
+    df = pd.DataFrame({"pv_kwh": pv_kwh, "demand_kwh": demand_kwh,
+                       "import_grid": import_grid, "export_grid": export_grid,
+                       "soc_kwh": soc_log})
+    return {"frame": df, "baseline_cost": baseline_cost,
+            "with_batt_cost": with_batt_cost,
+            "money_saved": baseline_cost - with_batt_cost,
+            "kwh_shifted": batt_in_kwh}
+
+
+# ─── synthetic inputs ────────────────────────────────────
+def make_inputs(n: int, seed: int = 0):
+    rng  = np.random.default_rng(seed)
+    idx  = pd.date_range("2023-01-01", periods=n, freq="30min", tz="UTC")
+    hour = idx.hour + idx.minute / 60
+    pv   = np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None) * rng.uniform(0, 2, n)
+    load = 0.15 + 0.45 * ((hour >= 17) & (hour < 22)) + rng.uniform(0, 0.1, n)
+    price = 0.15 + 0.15 * ((hour >= 16) & (hour < 19)) + rng.normal(0, 0.02, n)
+    return (pd.Series(pv, idx), pd.Series(price, idx), pd.Series(load, idx))
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--slots", type=int, default=17_520)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    pv, price, load = make_inputs(args.slots)
+    arrays = [s.to_numpy() for s in (pv, price, load)]
+
+    ref = legacy_greedy_dispatch(pv, price, demand_kwh=load)
+    new = greedy_dispatch(pv, price, demand_kwh=load)
+    for col in ("import_grid", "export_grid", "soc_kwh"):
+        np.testing.assert_allclose(new["frame"][col], ref["frame"][col], atol=1e-9)
+    for key in ("baseline_cost", "with_batt_cost", "money_saved", "kwh_shifted"):
+        np.testing.assert_allclose(new[key], ref[key], rtol=1e-9, atol=1e-9)
+
+    t_legacy  = best_of(lambda: legacy_greedy_dispatch(pv, price, demand_kwh=load), args.repeat)
+    t_adapter = best_of(lambda: greedy_dispatch(pv, price, demand_kwh=load), args.repeat)
+    t_kernel  = best_of(lambda: dispatch_arrays(*arrays[:2], arrays[2]), args.repeat)
+
+    n = args.slots
+    print(json.dumps({
+        "slots": n,
+        "legacy_slots_per_s":  round(n / t_legacy),
+        "adapter_slots_per_s": round(n / t_adapter),
+        "kernel_slots_per_s":  round(n / t_kernel),
+        "kernel_speedup":      round(t_legacy / t_kernel, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
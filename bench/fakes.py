@@ -0,0 +1,333 @@
+"""
+Local stand-ins for PVGIS, postcodes.io and Octopus.
+
+One threaded HTTP server answers the paths the backend calls on all three
+hosts; point the backend at it with ``SUNSAVE_UPSTREAM_OVERRIDES`` (see
+:meth:`FakeUpstreams.overrides`).  Payloads are replayed from recorded
+JSON when a payload directory is given, synthesised otherwise:
+
+    <dir>/pvgis_seriescalc.json    raw seriescalc response (any year)
+    <dir>/pvgis_pvcalc.json        raw PVcalc response
+    <dir>/postcodes.json           {postcode: postcodes.io "result"}
+    <dir>/octopus_rates.json       raw standard-unit-rates page
+
+Latency and failures are injected per service (``pvgis``, ``postcodes``,
+``octopus``) through :class:`Faults`.
+
+    python bench/fakes.py record bench/payloads --postcode "SW1A 1AA"
+    python bench/fakes.py serve  [--payloads DIR] [--latency-ms 50] [--fail-rate 0.05]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+HOSTS = {
+    "re.jrc.ec.europa.eu": "pvgis",
+    "api.postcodes.io":    "postcodes",
+    "api.octopus.energy":  "octopus",
+}
+OCTOPUS_BASE = "https://api.octopus.energy"
+
+
+@dataclass(slots=True)
+class Faults:
+    latency_s: float = 0.0           # added to every response
+    jitter_s:  float = 0.0           # + uniform(0, jitter_s)
+    fail_rate: float = 0.0           # share of requests answered with fail_status
+    fail_status: int = 503
+
+    def apply(self, rng: random.Random) -> Optional[int]:
+        delay = self.latency_s + (rng.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+        if delay:
+            time.sleep(delay)
+        return self.fail_status if rng.random() < self.fail_rate else None
+
+
+# ─── payloads ────────────────────────────────────────────
+def _crc(text: str) -> int:
+    return zlib.crc32(text.encode())
+
+
+def synth_postcode(pc: str) -> dict:
+    """Deterministic GB-ish coordinates, distinct per postcode at 2 dp."""
+    pc = pc.replace(" ", "").upper()
+    h = _crc(pc)
+    return {
+        "postcode":  f"{pc[:-3]} {pc[-3:]}",
+        "outcode":   pc[:-3],
+        "latitude":  50.5 + (h % 400) / 100,
+        "longitude": -4.0 + ((h >> 9) % 500) / 100,
+        "codes":     {"nuts": "TLI31"},
+        "region":    "London",
+    }
+
+
+def _unit_year(recorded: Optional[dict]) -> list[float]:
+    """8,760 hourly W for 1 kWp – recorded shape or a clear-sky-ish curve."""
+    if recorded is not None:
+        rows = recorded["outputs"]["hourly"]
+        peak = float(recorded.get("inputs", {}).get("pv_module", {}).get("peak_power", 1) or 1)
+        watts = [float(r["P"]) / peak for r in rows[:8760]]
+        return (watts * (8760 // max(len(watts), 1) + 1))[:8760]
+    out = []
+    for hour in range(8760):
+        doy, h = divmod(hour, 24)
+        season = 0.55 + 0.45 * math.sin(math.pi * (doy - 80) / 365) ** 2
+        sun = max(0.0, math.sin(math.pi * (h + 0.5 - 5) / 14))
+        cloud = 0.6 + 0.4 * ((_crc(f"{doy}") >> (h % 16)) & 1)
+        out.append(800.0 * season * sun * cloud)
+    return out
+
+
+def _rate(t: dt.datetime, day_shape: Optional[list[float]]) -> float:
+    slot = t.hour * 2 + t.minute // 30
+    if day_shape:
+        return day_shape[slot % len(day_shape)]
+    peak = 18.0 if 16 <= t.hour < 19 else 0.0
+    return round(12.0 + peak + 6.0 * math.sin(math.pi * slot / 24) + (_crc(t.date().isoformat()) % 5), 2)
+
+
+@dataclass
+class Payloads:
+    pvgis_series: Optional[dict] = None
+    pvgis_pvcalc: Optional[dict] = None
+    postcodes: Dict[str, dict] = field(default_factory=dict)
+    octopus: Optional[dict] = None
+    _unit: list = field(default_factory=list)
+    _day:  list = field(default_factory=list)
+
+    @classmethod
+    def load(cls, directory: Optional[Path]) -> "Payloads":
+        def read(name):
+            p = directory / name if directory else None
+            return json.loads(p.read_text()) if p and p.exists() else None
+        pl = cls(read("pvgis_seriescalc.json"), read("pvgis_pvcalc.json"),
+                 {k.replace(" ", "").upper(): v for k, v in (read("postcodes.json") or {}).items()},
+                 read("octopus_rates.json"))
+        pl._unit = _unit_year(pl.pvgis_series)
+        if pl.octopus:
+            rows = sorted(pl.octopus["results"], key=lambda r: r["valid_from"])
+            pl._day = [float(r["value_inc_vat"]) for r in rows[-48:]]
+        return pl
+
+    # each returns the JSON body for one request
+    def seriescalc(self, q: dict) -> dict:
+        year = int(q.get("startyear", 2023))
+        kwp = float(q.get("peakpower", 1))
+        t0 = dt.datetime(year, 1, 1)
+        n = 8784 if year % 4 == 0 else 8760
+        rows = [{"time": (t0 + dt.timedelta(hours=i)).strftime("%Y%m%d:%H10"),
+                 "P": round(self._unit[i % 8760] * kwp, 2)} for i in range(n)]
+        return {"inputs": {"location": {"latitude": float(q.get("lat", 0)),
+                                        "longitude": float(q.get("lon", 0))}},
+                "outputs": {"hourly": rows}}
+
+    def pvcalc(self, q: dict) -> dict:
+        if self.pvgis_pvcalc is not None:
+            return self.pvgis_pvcalc
+        e_y = sum(self._unit) / 1000 * float(q.get("peakpower", 1)) * 0.86
+        return {"outputs": {"totals": {"fixed": {"E_y": round(e_y, 1), "E_d": round(e_y / 365, 2)}}}}
+
+    def postcode(self, pc: str) -> dict:
+        return self.postcodes.get(pc.replace(" ", "").upper()) or synth_postcode(pc)
+
+    def rates(self, path: str, q: dict) -> dict:
+        start = dt.datetime.fromisoformat(q["period_from"].replace("Z", "+00:00"))
+        end = dt.datetime.fromisoformat(q["period_to"].replace("Z", "+00:00"))
+        slots = max(int((end - start).total_seconds() // 1800), 0)
+        size, page = int(q.get("page_size", 100)), int(q.get("page", 1))
+
+        # newest first, like Octopus
+        first = (page - 1) * size
+        results = []
+        for i in range(first, min(first + size, slots)):
+            t = end - dt.timedelta(minutes=30 * (i + 1))
+            results.append({
+                "value_exc_vat": round(_rate(t, self._day) / 1.05, 4),
+                "value_inc_vat": _rate(t, self._day),
+                "valid_from": t.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "valid_to": (t + dt.timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            })
+        nxt = None
+        if first + size < slots:
+            nxt = f"{OCTOPUS_BASE}{path}?{urlencode({**q, 'page': page + 1})}"
+        return {"count": slots, "next": nxt, "previous": None, "results": results}
+
+
+# ─── server ──────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):                 # keep bench output clean
+        pass
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _serve(self, body: Optional[dict] = None) -> None:
+        parts = urlsplit(self.path)
+        q = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path
+        service = ("pvgis" if path.startswith("/api/v") else
+                   "postcodes" if path.startswith("/postcodes") else
+                   "octopus" if path.startswith("/v1/") else None)
+        if service is None:
+            return self._send(404, {"error": f"no fake for {path}"})
+
+        fakes = self.server.owner
+        fakes.count(service)
+        failed = fakes.faults.get(service, Faults()).apply(fakes.rng)
+        if failed:
+            return self._send(failed, {"error": "injected failure"})
+
+        pl = fakes.payloads
+        if path.endswith("/seriescalc"):
+            return self._send(200, pl.seriescalc(q))
+        if path.endswith("/PVcalc"):
+            return self._send(200, pl.pvcalc(q))
+        if service == "postcodes":
+            if body is not None:
+                return self._send(200, {"status": 200, "result": [
+                    {"query": pc, "result": pl.postcode(pc)} for pc in body.get("postcodes", [])]})
+            pc = unquote(path.rsplit("/", 1)[-1])
+            return self._send(200, {"status": 200, "result": pl.postcode(pc)})
+        if path.endswith("/standard-unit-rates/"):
+            return self._send(200, pl.rates(path, q))
+        return self._send(404, {"error": f"no fake for {path}"})
+
+    def do_GET(self):
+        self._serve()
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length", 0))
+        self._serve(json.loads(self.rfile.read(n) or b"{}"))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    owner: "FakeUpstreams"
+
+
+class FakeUpstreams:
+    """
+    ``with FakeUpstreams(faults={"pvgis": Faults(0.2)}) as fakes:``
+    then export ``fakes.overrides()`` as ``SUNSAVE_UPSTREAM_OVERRIDES``
+    before the backend is imported.
+    """
+
+    def __init__(self, faults: Optional[Dict[str, Faults]] = None,
+                 payloads: Optional[Path] = None, port: int = 0, seed: int = 0):
+        self.faults = faults or {}
+        self.payloads = Payloads.load(payloads)
+        self.rng = random.Random(seed)
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def overrides(self) -> str:
+        return ",".join(f"{host}={self.url}" for host in HOSTS)
+
+    def count(self, service: str) -> None:
+        with self._lock:
+            self.requests[service] += 1
+
+    def start(self) -> "FakeUpstreams":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="fake-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeUpstreams":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+# ─── recording ───────────────────────────────────────────
+def record(directory: Path, postcode: str, year: int = 2023) -> None:
+    """Fetch one live payload per service into *directory* for replay."""
+    import requests
+
+    directory.mkdir(parents=True, exist_ok=True)
+    pc = requests.get(f"https://api.postcodes.io/postcodes/{postcode}", timeout=10).json()["result"]
+    lat, lon = pc["latitude"], pc["longitude"]
+    pvgis = "https://re.jrc.ec.europa.eu/api/v5_3/"
+    common = {"lat": lat, "lon": lon, "peakpower": 1, "loss": 14,
+              "angle": 35, "aspect": 0, "outputformat": "json"}
+    series = requests.get(pvgis + "seriescalc", timeout=60, params={
+        **common, "pvcalculation": 1, "startyear": year, "endyear": year,
+        "raddatabase": "PVGIS-SARAH3"}).json()
+    pvcalc = requests.get(pvgis + "PVcalc", timeout=30, params=common).json()
+    day = dt.date.today() - dt.timedelta(days=1)
+    rates = requests.get(
+        f"{OCTOPUS_BASE}/v1/products/AGILE-24-10-01/electricity-tariffs/"
+        f"E-1R-AGILE-24-10-01-C/standard-unit-rates/", timeout=20,
+        params={"period_from": f"{day}T00:00Z", "period_to": f"{day + dt.timedelta(days=1)}T00:00Z"}).json()
+
+    for name, body in (("pvgis_seriescalc.json", series), ("pvgis_pvcalc.json", pvcalc),
+                       ("postcodes.json", {pc["postcode"]: pc}), ("octopus_rates.json", rates)):
+        (directory / name).write_text(json.dumps(body))
+        print(f"wrote {directory / name}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("record", help="capture live payloads for replay")
+    r.add_argument("directory", type=Path)
+    r.add_argument("--postcode", default="SW1A 1AA")
+    r.add_argument("--year", type=int, default=2023)
+    s = sub.add_parser("serve", help="run the fakes in the foreground")
+    s.add_argument("--payloads", type=Path)
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--latency-ms", type=float, default=0.0)
+    s.add_argument("--fail-rate", type=float, default=0.0)
+    args = p.parse_args()
+
+    if args.cmd == "record":
+        record(args.directory, args.postcode, args.year)
+        return
+    faults = Faults(args.latency_ms / 1000, fail_rate=args.fail_rate)
+    fakes = FakeUpstreams({svc: faults for svc in HOSTS.values()}, args.payloads, args.port)
+    fakes.start()
+    print(f"SUNSAVE_UPSTREAM_OVERRIDES={fakes.overrides()}")
+    try:
+        fakes._thread.join()
+    except KeyboardInterrupt:
+        fakes.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Offline backend benchmark – no internet needed.
+
+    python bench/run.py [--requests 20] [--concurrency 1,4,16]
+                        [--latency-ms 40] [--fail-rate 0] [--payloads DIR]
+                        [--out results.json]
+
+Starts the local upstream fakes (``bench/fakes.py``), points the backend
+at them through ``SUNSAVE_UPSTREAM_OVERRIDES`` with throw-away cache
+directories, then measures
+
+• per-route latency p50/p95/p99 through the Flask test client, cold
+  (a new postcode each call) and warm (the same postcode again)
+• requests/second at each concurrency against a real threaded WSGI server
+• dispatch-kernel slots/second (greedy and optimal, day and year)
+• peak RSS of the process
+
+and prints one JSON document (also written to ``--out``) so runs can be
+diffed over time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+from fakes import HOSTS, Faults, FakeUpstreams  # noqa: E402
+
+# (app, path template) – {pc} is replaced by a postcode
+ROUTES = {
+    "index /api/simulate": ("index",  "/api/simulate?postcode={pc}&kwp=4"),
+    "index /api/dispatch": ("index",  "/api/dispatch?postcode={pc}&kwp=4&cap_kwh=5&pow_kw=3&eta=0.92"),
+    "index /api/dispatch optimal":
+                           ("index",  "/api/dispatch?postcode={pc}&kwp=4&cap_kwh=5&pow_kw=3&eta=0.92&strategy=optimal"),
+    "index /api/sweep":    ("index",  "/api/sweep?postcode={pc}&kwp=4&cap_kwh=2:20:2&pow_kw=2,3,5"),
+    "server /simulate":    ("server", "/simulate?postcode={pc}&kwp=4"),
+    "server /dispatch":    ("server", "/dispatch?postcode={pc}&kwp=4"),
+}
+THROUGHPUT_ROUTE = "index /api/dispatch"
+
+
+# ─── helpers ─────────────────────────────────────────────
+def postcodes(tag: str, n: int) -> List[str]:
+    """*n* distinct, well-formed postcodes (fresh sites for cold runs)."""
+    return [f"{tag}{k // 10 + 1} {k % 10}AB" for k in range(n)]
+
+
+def percentiles(samples_s: List[float]) -> Dict[str, float]:
+    if not samples_s:
+        return {}
+    ms = np.asarray(samples_s) * 1000
+    return {"n": len(ms), "mean_ms": round(float(ms.mean()), 2),
+            **{f"p{q}_ms": round(float(np.percentile(ms, q)), 2) for q in (50, 95, 99)},
+            "max_ms": round(float(ms.max()), 2)}
+
+
+def timed(call: Callable[[], int]) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    status = call()
+    return time.perf_counter() - t0, status
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ─── stages ──────────────────────────────────────────────
+def bench_latency(apps: dict, n: int) -> dict:
+    out = {}
+    for i, (name, (app, tmpl)) in enumerate(ROUTES.items()):
+        client = apps[app].test_client()
+        statuses: Dict[int, int] = {}
+
+        def call(pc: str) -> int:
+            st = client.get(tmpl.format(pc=pc.replace(" ", "%20"))).status_code
+            statuses[st] = statuses.get(st, 0) + 1
+            return st
+
+        cold = [timed(lambda pc=pc: call(pc))[0] for pc in postcodes(f"B{chr(65 + i)}", n)]
+        warm_pc = postcodes(f"W{chr(65 + i)}", 1)[0]
+        call(warm_pc)                                   # prime
+        warm = [timed(lambda: call(warm_pc))[0] for _ in range(n)]
+        out[name] = {"cold": percentiles(cold), "warm": percentiles(warm),
+                     "status": {str(k): v for k, v in sorted(statuses.items())}}
+    return out
+
+
+def bench_throughput(app, levels: List[int], per_level: int) -> List[dict]:
+    import requests
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class Quiet(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=Quiet)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    tmpl = ROUTES[THROUGHPUT_ROUTE][1]
+    local = threading.local()
+
+    def hit(url: str) -> tuple[float, int]:
+        s = getattr(local, "session", None) or requests.Session()
+        local.session = s
+        return timed(lambda: s.get(url, timeout=60).status_code)
+
+    results = []
+    try:
+        hit(base + tmpl.format(pc="TP1%201AB"))               # warm the site
+        for c in levels:
+            total = max(per_level, 4 * c)
+            # half the requests revisit the warm site, half bring a new one
+            urls = [base + tmpl.format(pc=("TP1%201AB" if k % 2 else
+                                           f"T{c}X{k // 10 + 1}%20{k % 10}AB"))
+                    for k in range(total)]
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=c) as ex:
+                runs = list(ex.map(hit, urls))
+            wall = time.perf_counter() - t0
+            ok = sum(1 for _, st in runs if st < 400)
+            results.append({"concurrency": c, "requests": total, "ok": ok,
+                            "rps": round(total / wall, 1),
+                            "latency": percentiles([t for t, _ in runs])})
+    finally:
+        server.shutdown()
+    return results
+
+
+def bench_kernel(repeat: int) -> dict:
+    from dispatch_kernel import best_of, make_inputs
+    from api.sunsave.dispatch import dispatch_arrays
+    from api.sunsave.optimal import optimal_arrays
+
+    out = {}
+    for label, n in (("day", 48), ("year", 17_520)):
+        pv, price, load = (s.to_numpy() for s in make_inputs(n))
+        for name, fn in (("greedy", dispatch_arrays), ("optimal", optimal_arrays)):
+            reps = repeat if name == "greedy" or n <= 48 else max(1, repeat // 3)
+            t = best_of(lambda: fn(pv, price, load), reps)
+            out[f"{name}_{label}_slots_per_s"] = round(n / t)
+    return out
+
+
+# ─── main ────────────────────────────────────────────────
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--requests", type=int, default=20, help="calls per route and phase")
+    p.add_argument("--concurrency", default="1,4,16")
+    p.add_argument("--latency-ms", type=float, default=40.0, help="added to every upstream reply")
+    p.add_argument("--jitter-ms", type=float, default=20.0)
+    p.add_argument("--fail-rate", type=float, default=0.0, help="share of upstream replies → 503")
+    p.add_argument("--payloads", type=Path, help="recorded payloads (see fakes.py record)")
+    p.add_argument("--repeat", type=int, default=5, help="kernel timing repeats")
+    p.add_argument("--out", type=Path)
+    args = p.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    faults = Faults(args.latency_ms / 1000, args.jitter_ms / 1000, args.fail_rate)
+    with FakeUpstreams({svc: faults for svc in HOSTS.values()}, args.payloads) as fakes, \
+            tempfile.TemporaryDirectory(prefix="sunsave-bench-") as tmp:
+        # must be in place before the backend is imported
+        os.environ.update({
+            "SUNSAVE_UPSTREAM_OVERRIDES": fakes.overrides(),
+            "SUNSAVE_CACHE_DIR":          tmp,
+            "SUNSAVE_PRICE_ARCHIVE":      str(Path(tmp) / "agile"),
+            "SUNSAVE_PRICE_REFRESHER":    "0",
+        })
+        t0 = time.perf_counter()
+        from api.index import app as index_app
+        from api.sunsave import upstream
+        from api.sunsave.server import app as server_app
+        import_s = time.perf_counter() - t0
+        apps = {"index": index_app, "server": server_app}
+
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            },
+            "import_s": round(import_s, 3),
+            "latency": bench_latency(apps, args.requests),
+            "throughput": bench_throughput(index_app, levels, args.requests),
+            "kernel": bench_kernel(args.repeat),
+            "upstream": {"fake_requests": dict(fakes.requests),
+                         "client": upstream.stats()},
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cold-start benchmark – what a fresh serverless instance pays.
+
+    python bench/startup.py [--runs 5] [--import-budget-ms 400]
+                            [--first-budget-ms 1500] [--out startup.json]
+
+Each run is a new Python process (no warm imports, empty caches) that
+
+• times ``import api.index`` – the module the Vercel function loads
+• times the first ``/api/site`` request through the test client, against
+  the local upstream fakes started here
+• reports whether pandas got imported on the way
+
+and the parent prints the median of each.  The exit status is 1 when a
+median is over its budget or pandas appears on the ``/api/site`` path, so
+this can gate CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "bench"))
+from fakes import HOSTS, Faults, FakeUpstreams  # noqa: E402
+
+FIRST_PATH = "/api/site?postcode=SW1A 1AA&kwp=4&cap_kwh=5&pow_kw=3&eta=0.92"
+
+# runs inside the child process
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from api.index import app
+t1 = time.perf_counter()
+status = app.test_client().get(sys.argv[1]).status_code
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "first_s": t2 - t1, "status": status,
+                  "pandas": "pandas" in sys.modules}))
+"""
+
+
+def one_run(path: str, env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD, path], env=env, cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--import-budget-ms", type=float, default=400.0)
+    p.add_argument("--first-budget-ms", type=float, default=1500.0,
+                   help="first /api/site after import, fakes answering instantly")
+    p.add_argument("--out", type=Path)
+    args = p.parse_args()
+
+    runs = []
+    with FakeUpstreams({svc: Faults() for svc in HOSTS.values()}) as fakes:
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory(prefix="sunsave-cold-") as tmp:
+                env = {**os.environ,
+                       "PYTHONPATH":                 str(ROOT),
+                       "SUNSAVE_UPSTREAM_OVERRIDES": fakes.overrides(),
+                       "SUNSAVE_CACHE_DIR":          tmp,
+                       "SUNSAVE_PRICE_ARCHIVE":      str(Path(tmp) / "agile"),
+                       "SUNSAVE_PRICE_REFRESHER":    "0"}
+                runs.append(one_run(FIRST_PATH, env))
+
+    import_ms = statistics.median(r["import_s"] for r in runs) * 1000
+    first_ms = statistics.median(r["first_s"] for r in runs) * 1000
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import {import_ms:.0f} ms > {args.import_budget_ms:.0f} ms")
+    if first_ms > args.first_budget_ms:
+        failures.append(f"first request {first_ms:.0f} ms > {args.first_budget_ms:.0f} ms")
+    if any(r["pandas"] for r in runs):
+        failures.append("pandas imported on the /api/site path")
+    if any(r["status"] != 200 for r in runs):
+        failures.append(f"/api/site answered {[r['status'] for r in runs]}")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "runs": len(runs),
+        "import_ms": round(import_ms, 1),
+        "first_request_ms": round(first_ms, 1),
+        "pandas_loaded": any(r["pandas"] for r in runs),
+        "budget": {"import_ms": args.import_budget_ms, "first_request_ms": args.first_budget_ms},
+        "failures": failures,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    print(text)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
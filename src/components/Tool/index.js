@@ -155,21 +155,18 @@ export default function Tool() {
         `&pow_kw=${powKw}` +
         `&eta=${eta}`;
 
-      const [genRes, saveRes] = await Promise.all([
-        fetch(`${base}/simulate${qs}`),
-        fetch(`${base}/dispatch${qs}`),
-      ]);
-      if (!genRes.ok || !saveRes.ok) throw new Error('API error');
+      // one request: the site is geocoded and PVGIS fetched once
+      const res = await fetch(`${base}/site${qs}`);
+      if (!res.ok) throw new Error('API error');
 
-      const genData  = await genRes.json();
-      const saveData = await saveRes.json();
+      const data = await res.json();
 
-      setGeneration(genData.daily_kwh);
-      setMoneySaved(saveData.money_saved);
-      setBaselineCost(saveData.baseline_cost);
-      setWithBattCost(saveData.with_batt_cost);
-      setKwhShifted(saveData.kwh_shifted);
-      setFallback(Boolean(saveData.fallback));
+      setGeneration(data.generation.daily_kwh);
+      setMoneySaved(data.dispatch.money_saved);
+      setBaselineCost(data.dispatch.baseline_cost);
+      setWithBattCost(data.dispatch.with_batt_cost);
+      setKwhShifted(data.dispatch.kwh_shifted);
+      setFallback(Boolean(data.fallback));
     } catch (e) {
       setError(String(e));
     } finally {
@@ -316,7 +313,7 @@ export default function Tool() {
             <h2 className="font-semibold">Default assumptions</h2>
             <ul className="list-disc list-inside mt-2 text-sm">
               <li>Uses the PVGIS-SARAH3 solar radiation database for generation estimates.</li>
-              <li>Assumes zero baseline household electricity consumption; all PV generation is considered surplus available for battery charging or export.</li>
+              <li>Household consumption follows a standard UK domestic load profile scaled to 2,700 kWh a year, unless you upload your own half-hourly smart-meter CSV; PV first covers that load, and only the surplus charges the battery or is exported.</li>
               <li>Falls back to a tiered mock tariff if live Octopus Agile prices are unavailable for your region.</li>
               <li>Battery defaults are pre-filled – edit them to match your system for an accurate simulation.</li>
             </ul>
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _greedy_loop(pv, prices, demand, cap_kwh=5.0, pow_kw=3.0, eta=0.92,
+                 dt_h=0.5, soc0=0.0) -> dict:
+    """The original per-slot greedy dispatch, kept as the reference."""
+    step_limit = pow_kw * dt_h
+    eff = eta ** 0.5
+    n = len(pv)
+    soc = soc0
+    soc_log, import_grid, export_grid = np.zeros(n), np.zeros(n), np.zeros(n)
+    discharged = 0.0
+    for i in range(n):
+        net = pv[i] - demand[i]
+        if net > 0:
+            charge = min(net, cap_kwh - soc, step_limit)
+            soc += charge * eff
+            export_grid[i] = net - charge
+        else:
+            discharge = min(-net, soc, step_limit)
+            soc -= discharge
+            discharged += discharge
+            import_grid[i] = -net - discharge
+        soc_log[i] = soc
+
+    baseline_cost = float(np.dot(demand - pv, prices))
+    with_batt_cost = float(np.dot(import_grid - export_grid, prices))
+    return {"import_grid": import_grid, "export_grid": export_grid, "soc_kwh": soc_log,
+            "baseline_cost": baseline_cost, "with_batt_cost": with_batt_cost,
+            "money_saved": baseline_cost - with_batt_cost, "kwh_shifted": discharged}
+
+
+@pytest.fixture
+def reference_greedy():
+    return _greedy_loop
@@ -0,0 +1,28 @@
+"""Laying an archived price year over the PV year."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from api.sunsave.annual import _align_year
+
+
+def half_hours(year: int) -> pd.DatetimeIndex:
+    days = 366 if year % 4 == 0 else 365
+    return pd.date_range(f"{year}-01-01", periods=days * 48, freq="30min", tz="UTC")
+
+
+def test_leap_archive_on_a_common_pv_year():
+    archive = np.arange(366 * 48, dtype=float)          # 2024: value = slot of the year
+    prices = _align_year(archive, 2024, half_hours(2023))
+    assert len(prices) == 365 * 48
+    assert prices[59 * 48] == 60 * 48                   # 1 March ← 1 March, not 29 Feb
+    assert prices[-1] == archive[-1]
+
+
+def test_common_archive_on_a_leap_pv_year():
+    archive = np.arange(365 * 48, dtype=float)
+    prices = _align_year(archive, 2023, half_hours(2024))
+    np.testing.assert_array_equal(prices[59 * 48:60 * 48], archive[58 * 48:59 * 48])
+    assert prices[60 * 48] == 59 * 48                   # 1 March ← 1 March
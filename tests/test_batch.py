@@ -0,0 +1,106 @@
+import datetime as dt
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from api.sunsave import batch
+from api.sunsave.geo import Site
+from api.sunsave.pipeline import UpstreamTimeout
+
+WHEN = dt.date(2025, 6, 1)
+
+SITES = {
+    "SW1A1AA": Site("SW1A1AA", 51.501, -0.142, "C"),
+    "SW1A2AA": Site("SW1A2AA", 51.503, -0.128, "C"),
+    "M11AE":   Site("M11AE",   53.477, -2.230, "G"),
+}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Count upstream calls through stubs for geocoding, PV and prices."""
+    seen = Counter()
+
+    def resolve_many(postcodes):
+        postcodes = list(postcodes)
+        seen["geocode"] += 1
+        return {p: SITES[p] for p in postcodes if p in SITES}
+
+    def unit_profile(lat, lon, tilt, azim, year):
+        seen["pv", lat, lon, tilt, azim] += 1
+        return np.full(8760, 0.1, dtype=np.float32)
+
+    def price_array_or_mock(when, region):
+        seen["prices", region] += 1
+        return np.full(48, 20.0), False
+
+    monkeypatch.setattr(batch, "resolve_many", resolve_many)
+    monkeypatch.setattr(batch, "unit_profile", unit_profile)
+    monkeypatch.setattr(batch, "price_array_or_mock", price_array_or_mock)
+    return seen
+
+
+def test_shared_sites_and_regions_are_fetched_once(calls):
+    rows = [{"postcode": "sw1a 1aa", "kwp": kwp} for kwp in (2, 4, 6)]
+    rows += [{"postcode": "SW1A2AA", "kwp": 4}, {"postcode": "M1 1AE", "kwp": 3},
+             {"postcode": "M11AE", "planes": "2:35:-90,2:35:90"}]
+
+    out = sorted(batch.run_batch(rows, when=WHEN, workers=1), key=lambda r: r["row"])
+
+    assert [r["row"] for r in out] == list(range(len(rows)))
+    assert not any("error" in r for r in out)
+    assert calls["geocode"] == 1
+    assert calls["prices", "C"] == calls["prices", "G"] == 1
+    pv = {k: n for k, n in calls.items() if k[0] == "pv"}
+    assert len(pv) == 5                     # 2 London sites; M1 south, east and west
+    assert set(pv.values()) == {1}
+
+
+def test_unknown_postcode_fails_its_row_only(calls):
+    rows = [{"postcode": "ZZ99 9ZZ", "kwp": 4}, {"postcode": "SW1A1AA", "kwp": 4}]
+    out = {r["row"]: r for r in batch.run_batch(rows, when=WHEN, workers=1)}
+    assert "unknown postcode" in out[0]["error"]
+    assert "money_saved" in out[1]
+
+
+def test_stuck_price_fetch_times_out(calls, monkeypatch):
+    release = threading.Event()
+
+    def stuck(when, region):
+        release.wait(5)
+        return np.zeros(48), False
+
+    monkeypatch.setattr(batch, "price_array_or_mock", stuck)
+    monkeypatch.setattr(batch, "STAGE_TIMEOUTS", {**batch.STAGE_TIMEOUTS, "prices": 0.2})
+    t0 = time.monotonic()
+    try:
+        with pytest.raises(UpstreamTimeout) as e:
+            batch.run_batch([{"postcode": "SW1A1AA", "kwp": 4}], when=WHEN, workers=1)
+    finally:
+        release.set()
+    assert e.value.stage == "prices"
+    assert time.monotonic() - t0 < 2
+
+
+def test_stuck_pv_fetch_fails_its_rows(calls, monkeypatch):
+    release = threading.Event()
+    fetch = batch.unit_profile
+
+    def slow_in_manchester(lat, lon, *args, **kwargs):
+        if lat > 53:
+            release.wait(5)
+        return fetch(lat, lon, *args, **kwargs)
+
+    monkeypatch.setattr(batch, "unit_profile", slow_in_manchester)
+    monkeypatch.setattr(batch, "STAGE_TIMEOUTS", {**batch.STAGE_TIMEOUTS, "pvgis": 0.2})
+    try:
+        out = {r["row"]: r for r in batch.run_batch(
+            [{"postcode": "M11AE", "kwp": 4}, {"postcode": "SW1A1AA", "kwp": 4}],
+            when=WHEN, workers=1)}
+    finally:
+        release.set()
+    assert "pvgis did not answer" in out[0]["error"]
+    assert "money_saved" in out[1]
@@ -0,0 +1,57 @@
+"""Smart-meter CSV parsing at the resolutions meters export."""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from api.sunsave.demand import DAYS, Demand, demand_from, parse_csv
+
+START = dt.datetime(2023, 1, 2)
+HALF_HOURS = 0.1 + 0.02 * np.arange(48)          # kWh in each half-hour of a day
+
+
+def csv(step_min: int, days: int = 7, stamp="%Y-%m-%dT%H:%M:%SZ") -> str:
+    kwh = {15: np.repeat(HALF_HOURS / 2, 2),                 # meter steps, same day
+           30: HALF_HOURS,
+           60: HALF_HOURS.reshape(24, 2).sum(axis=1)}[step_min]
+    per_day = len(kwh)
+    lines = ["Start,Consumption (kWh)"]
+    for k in range(days * per_day):
+        t = START + dt.timedelta(minutes=step_min * k)
+        lines.append(f"{t.strftime(stamp)},{kwh[k % per_day]:.6f}")
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("step_min", [15, 30, 60])
+def test_resolutions_land_on_half_hours(step_min):
+    year = parse_csv(csv(step_min))
+    assert year.shape == (DAYS, 48)
+    expected = HALF_HOURS if step_min <= 30 else np.repeat(HALF_HOURS.reshape(24, 2).mean(1), 2)
+    np.testing.assert_allclose(year[1:8], np.tile(expected, (7, 1)), atol=1e-6)
+    # days without readings take the same half-hour's mean
+    np.testing.assert_allclose(year[200], expected, atol=1e-6)
+
+
+def test_uk_day_first_timestamps():
+    year = parse_csv(csv(30, stamp="%d/%m/%Y %H:%M"))
+    np.testing.assert_allclose(year[1], HALF_HOURS, atol=1e-6)
+
+
+def test_scaled_to_annual_kwh():
+    demand = demand_from(csv=csv(30), annual_kwh=3000)
+    assert demand.year365().sum() == pytest.approx(3000)
+    assert isinstance(demand, Demand) and demand.describe()["profile"] == "upload"
+
+
+@pytest.mark.parametrize("body, message", [
+    ("when,what\n2023-01-01,1", "timestamp column"),
+    ("Start,kWh\n" + "\n".join(f"2023-01-01T{h // 2:02d}:{30 * (h % 2):02d}:00Z,0"
+                               for h in range(48)), "0 kWh"),
+    ("Start,kWh\n2023-01-01T00:00:00Z,1", "fewer than one day"),
+])
+def test_rejects_unusable_uploads(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_csv(body)
@@ -0,0 +1,37 @@
+"""The greedy array kernel against the original per-slot loop."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from api.sunsave.dispatch import dispatch_arrays
+
+
+def random_day(seed: int, n: int = 96):
+    rng = np.random.default_rng(seed)
+    pv = rng.uniform(0, 2, n) * (rng.random(n) < 0.6)
+    load = rng.uniform(0, 1.5, n)
+    price = rng.uniform(0.05, 0.4, n)
+    return pv, price, load
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("soc0", [0.0, 2.5, 5.0])
+def test_kernel_matches_reference_loop(reference_greedy, seed, soc0):
+    pv, price, load = random_day(seed)
+    rng = np.random.default_rng(100 + seed)
+    battery = dict(cap_kwh=5.0, pow_kw=float(rng.uniform(0.5, 4)), eta=0.92)
+
+    ref = reference_greedy(pv, price, load, soc0=soc0, **battery)
+    new = dispatch_arrays(pv, price, load, soc0=soc0, **battery)
+
+    for col in ("import_grid", "export_grid", "soc_kwh"):
+        np.testing.assert_allclose(new[col], ref[col], atol=1e-9)
+    for key in ("baseline_cost", "with_batt_cost", "money_saved", "kwh_shifted"):
+        assert new[key] == pytest.approx(ref[key], abs=1e-9)
+
+
+def test_rejects_mismatched_shapes():
+    with pytest.raises(ValueError):
+        dispatch_arrays(np.zeros(48), np.zeros(47))
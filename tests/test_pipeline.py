@@ -0,0 +1,85 @@
+import datetime as dt
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from api.sunsave import pipeline
+from api.sunsave.geo import Site
+from api.sunsave.pipeline import UpstreamTimeout, fetch_site_inputs
+
+WHEN = dt.date(2025, 6, 1)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Stub fetchers that take ``delay[stage]`` seconds and log when they ran."""
+    delay = {"geocode": 0.0, "pvgis": 0.0, "prices": 0.0}
+    spans = {}
+    release = threading.Event()             # lets stuck stubs go at teardown
+
+    def stub(stage, value):
+        def fetch(*args, **kwargs):
+            t0 = time.monotonic()
+            release.wait(delay[stage])
+            spans[stage] = (t0, time.monotonic())
+            return value
+        return fetch
+
+    monkeypatch.setattr(pipeline, "resolve",
+                        stub("geocode", Site("SW1A1AA", 51.501, -0.142, "C")))
+    monkeypatch.setattr(pipeline, "unit_profile",
+                        stub("pvgis", np.full(8760, 0.1, dtype=np.float32)))
+    monkeypatch.setattr(pipeline, "price_array_or_mock",
+                        stub("prices", (np.full(48, 20.0), False)))
+    yield delay, spans
+    release.set()
+
+
+def test_pv_and_price_legs_overlap(upstream):
+    delay, spans = upstream
+    delay["pvgis"] = delay["prices"] = 0.3
+
+    t0 = time.monotonic()
+    inputs = fetch_site_inputs("SW1A 1AA", 4, when=WHEN)
+    elapsed = time.monotonic() - t0
+
+    assert elapsed < 0.5                    # the slower leg, not the sum
+    (pv_start, pv_end), (price_start, price_end) = spans["pvgis"], spans["prices"]
+    assert pv_start < price_end and price_start < pv_end
+    assert inputs.site.region == "C"
+    assert not inputs.fallback
+
+
+@pytest.mark.parametrize("stage", ["geocode", "pvgis", "prices"])
+def test_slow_stage_times_out(upstream, stage):
+    delay, _ = upstream
+    delay[stage] = 5.0
+
+    t0 = time.monotonic()
+    with pytest.raises(UpstreamTimeout) as e:
+        fetch_site_inputs("SW1A 1AA", 4, when=WHEN, timeouts={stage: 0.2})
+    assert e.value.stage == stage
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_budget_caps_the_whole_fetch(upstream):
+    delay, _ = upstream
+    delay["geocode"] = 0.2
+    delay["prices"] = 5.0
+
+    t0 = time.monotonic()
+    with pytest.raises(UpstreamTimeout) as e:
+        fetch_site_inputs("SW1A 1AA", 4, when=WHEN, budget_s=0.4)
+    elapsed = time.monotonic() - t0
+    assert e.value.stage == "prices"
+    assert 0.35 < elapsed < 1.0
+
+
+def test_mock_tariff_skips_octopus(upstream):
+    delay, spans = upstream
+    delay["prices"] = 5.0
+    inputs = fetch_site_inputs("SW1A 1AA", 4, when=WHEN, tariff="mock")
+    assert "prices" not in spans
+    assert len(inputs.prices) == 48
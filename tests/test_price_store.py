@@ -0,0 +1,115 @@
+"""Stale-while-revalidate, eviction and completion callbacks of the price store."""
+
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from api.sunsave.price_store import FRESH_TTL, PriceStore, PricesUnavailable
+
+DAY = dt.date(2024, 6, 1)
+KEY = ("AGILE", "C", DAY)
+FULL = np.full(48, 0.2)
+PARTIAL = np.r_[np.full(40, 0.3), np.full(8, np.nan)]
+
+
+class Upstream:
+    """Scripted fetch: answers in order, can be held, counts calls."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, product, region, date):
+        self.calls += 1
+        self.gate.wait(5)
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def wait_for(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def expire(store: PriceStore, key=KEY) -> None:
+    store._entries[key].fetched -= FRESH_TTL + 1
+
+
+def test_expired_entry_is_served_stale_and_refreshed_once():
+    up = Upstream(FULL, np.full(48, 0.25))
+    store = PriceStore(up, ["C"])
+    store.get(*KEY)
+    expire(store)
+    up.gate.clear()                                   # hold the refresh in flight
+    for _ in range(5):
+        np.testing.assert_array_equal(store.get(*KEY), FULL)
+    assert store.stale_hits == 5
+    up.gate.set()
+    wait_for(lambda: store.peek(*KEY)[0] == 0.25)
+    assert up.calls == 2                              # the cold fetch + one refresh
+
+
+def test_failed_refresh_keeps_the_stale_vector():
+    up = Upstream(FULL, ConnectionError("octopus down"))
+    store = PriceStore(up, ["C"])
+    store.get(*KEY)
+    expire(store)
+    store.get(*KEY)
+    wait_for(lambda: store.errors == 1)
+    wait_for(lambda: not store._entries[KEY].refreshing)
+    np.testing.assert_array_equal(store.get(*KEY), FULL)
+
+
+def test_cold_miss_failure_raises():
+    store = PriceStore(Upstream(ConnectionError("octopus down")), ["C"])
+    with pytest.raises(PricesUnavailable):
+        store.get(*KEY)
+
+
+def test_complete_vector_is_never_replaced_by_a_partial_one():
+    up = Upstream(FULL, PARTIAL)
+    store = PriceStore(up, ["C"])
+    store.get(*KEY)
+    expire(store)
+    store.get(*KEY)
+    wait_for(lambda: up.calls == 2 and not store._entries[KEY].refreshing)
+    np.testing.assert_array_equal(store.peek(*KEY), FULL)
+    assert not store._entries[KEY].expired(time.monotonic())   # re-armed
+
+
+def test_least_recently_used_keys_are_evicted():
+    store = PriceStore(Upstream(FULL), ["C"], max_entries=3)
+    days = [DAY + dt.timedelta(days=i) for i in range(4)]
+    for d in days[:3]:
+        store.get("AGILE", "C", d)
+    store.get("AGILE", "C", days[0])                  # touch the oldest
+    store.get("AGILE", "C", days[3])
+    held = [k[2] for k in store._entries]
+    assert len(held) == 3 and days[1] not in held and days[0] in held
+
+
+def test_on_complete_fires_once_per_key():
+    up = Upstream(PARTIAL, FULL, FULL)
+    store = PriceStore(up, ["C"])
+    heard = []
+
+    def listener(*key):
+        heard.append(key)
+    store.on_complete(listener)
+    store.on_complete(listener)                       # registering twice is a no-op
+    store.get(*KEY)                                   # partial – nothing yet
+    assert heard == []
+    for _ in range(2):                                # complete, then complete again
+        store._revalidate(KEY)
+    assert heard == [KEY]
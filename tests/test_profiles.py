@@ -0,0 +1,39 @@
+"""PVGIS parsing and roof-plane combination."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from api.sunsave.profiles import Plane, combine, parse_hourly, parse_planes, year_hours
+
+
+def seriescalc(year: int, hours: int, minute: int = 10) -> dict:
+    rows = []
+    for h in range(hours):
+        day = np.datetime64(f"{year}-01-01") + np.timedelta64(h // 24, "D")
+        rows.append({"time": f"{str(day).replace('-', '')}:{h % 24:02d}{minute:02d}",
+                     "P": 1000.0 * (h % 24 == 12)})
+    return {"outputs": {"hourly": rows}}
+
+
+@pytest.mark.parametrize("year", [2023, 2020])
+def test_parse_hourly_pins_to_the_calendar_year(year):
+    kwh = parse_hourly(seriescalc(year, 48), year)
+    assert kwh.dtype == np.float32 and len(kwh) == year_hours(year)
+    assert kwh[12] == kwh[36] == 1.0                    # 1 kW for an hour at noon
+    assert kwh.sum() == 2.0                             # hours not returned are 0
+
+
+def test_parse_hourly_drops_other_years():
+    kwh = parse_hourly(seriescalc(2022, 48), 2023)
+    assert not kwh.any()
+
+
+def test_planes_combine_by_kwp():
+    planes = parse_planes("3:35:-90,3:35:90,1")
+    units = {(35, -90): np.full(4, 1.0), (35, 90): np.full(4, 2.0), (35, 0): np.full(4, 4.0)}
+    np.testing.assert_allclose(combine(planes, units), 3 * 1.0 + 3 * 2.0 + 1 * 4.0)
+    assert planes[2] == Plane(1.0)
+    with pytest.raises(ValueError):
+        parse_planes("3:95")
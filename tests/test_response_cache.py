@@ -0,0 +1,87 @@
+"""Response cache: expiry boundaries, ETags and what bypasses it."""
+
+from __future__ import annotations
+
+import datetime as dt
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+
+from api.sunsave import response_cache
+from api.sunsave.response_cache import FALLBACK_TTL, ResponseCache, next_boundary
+
+UTC = dt.timezone.utc
+
+
+@pytest.mark.parametrize("now, expected", [
+    # winter: UK = UTC, publish at 16:00 UTC
+    (dt.datetime(2024, 1, 10, 10, 0, tzinfo=UTC), dt.datetime(2024, 1, 10, 16, 0, tzinfo=UTC)),
+    (dt.datetime(2024, 1, 10, 16, 0, tzinfo=UTC), dt.datetime(2024, 1, 11, 0, 0, tzinfo=UTC)),
+    # summer: 16:00 BST is 15:00 UTC
+    (dt.datetime(2024, 7, 1, 10, 0, tzinfo=UTC), dt.datetime(2024, 7, 1, 15, 0, tzinfo=UTC)),
+    (dt.datetime(2024, 7, 1, 15, 30, tzinfo=UTC), dt.datetime(2024, 7, 2, 0, 0, tzinfo=UTC)),
+    # clocks go forward at 01:00 UTC on 31 March 2024
+    (dt.datetime(2024, 3, 31, 0, 30, tzinfo=UTC), dt.datetime(2024, 3, 31, 15, 0, tzinfo=UTC)),
+    # … and back at 01:00 UTC on 27 October 2024
+    (dt.datetime(2024, 10, 27, 0, 30, tzinfo=UTC), dt.datetime(2024, 10, 27, 16, 0, tzinfo=UTC)),
+])
+def test_next_boundary(now, expected):
+    assert next_boundary(now) == expected
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(response_cache, "responses", ResponseCache())
+    monkeypatch.setattr(response_cache, "ENABLED", True)
+    app = Flask(__name__)
+    app.calls = 0
+
+    @app.route("/api/x", methods=["GET", "POST"])
+    @response_cache.cached()
+    def view():
+        app.calls += 1
+        return jsonify({"kwp": request.args.get("kwp"),
+                        "fallback": request.args.get("mock") == "1"})
+
+    return app.test_client()
+
+
+def max_age(resp) -> int:
+    return int(resp.headers["Cache-Control"].split("max-age=")[1].split(",")[0])
+
+
+def test_repeat_is_a_hit_and_etag_gives_304(client):
+    first = client.get("/api/x?kwp=4&postcode=sw1a1aa")
+    again = client.get("/api/x?postcode=SW1A 1AA&kwp=4.0")          # same normalised query
+    assert first.headers["X-Sunsave-Cache"] == "miss"
+    assert again.headers["X-Sunsave-Cache"] == "hit"
+    assert again.headers["ETag"] == first.headers["ETag"]
+    cond = client.get("/api/x?kwp=4&postcode=sw1a1aa",
+                      headers={"If-None-Match": first.headers["ETag"]})
+    assert cond.status_code == 304 and cond.data == b""
+    assert client.application.calls == 1
+
+
+def test_cache_control_runs_to_the_next_boundary(client):
+    resp = client.get("/api/x?kwp=4")
+    left = next_boundary().timestamp() - time.time()
+    assert abs(max_age(resp) - left) <= 2
+    assert "s-maxage" in resp.headers["Cache-Control"]
+
+
+def test_fallback_answers_live_five_minutes(client):
+    resp = client.get("/api/x?kwp=4&mock=1")
+    assert max_age(resp) <= FALLBACK_TTL
+    key = next(iter(response_cache.responses._entries))
+    response_cache.responses._entries[key].expires = time.time() - 1    # expired
+    client.get("/api/x?kwp=4&mock=1")
+    assert client.application.calls == 2
+
+
+def test_non_get_bypasses_the_cache(client):
+    for _ in range(2):
+        resp = client.post("/api/x?kwp=4", data=b"timestamp,kwh")
+        assert "ETag" not in resp.headers
+    assert client.application.calls == 2
+    assert len(response_cache.responses) == 0
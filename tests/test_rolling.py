@@ -0,0 +1,40 @@
+"""Rolling-horizon state: where a site's SOC is between replans."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from api.sunsave.rolling import _pack, _soc_at
+
+START = 1_000_000                       # absolute half-hour of the plan's first slot
+PLANNED = [1.0, 2.0, 3.0, 2.5]          # SOC at the end of each planned slot
+
+
+def site(soc_kwh=0.5, soc_slot=START, version=3):
+    return {"soc_kwh": soc_kwh, "soc_slot": soc_slot, "version": version}
+
+
+def plan(version=3, start=START):
+    return {"start_slot": start, "version": version, "soc_kwh": _pack(np.array(PLANNED))}
+
+
+def test_walks_the_plan_forward():
+    assert _soc_at(site(), plan(), START) == 0.5          # the plan's own start
+    for done, soc in enumerate(PLANNED, start=1):
+        assert _soc_at(site(), plan(), START + done) == soc
+
+
+def test_past_the_horizon_holds_the_last_planned_soc():
+    assert _soc_at(site(), plan(), START + 10) == PLANNED[-1]
+
+
+def test_newer_telemetry_wins():
+    # reported after the plan was made: version bumped, slot moved on
+    assert _soc_at(site(4.2, START + 2, version=4), plan(), START + 2) == 4.2
+    # same slot as the plan start but a later version – not walked from the plan
+    assert _soc_at(site(4.2, START, version=4), plan(), START + 3) == 4.2
+
+
+def test_without_a_plan_the_stored_soc_stands():
+    assert _soc_at(site(1.5), None, START + 5) == 1.5
+    assert _soc_at(site(1.5), plan(start=START - 4), START + 5) == 1.5
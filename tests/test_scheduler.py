@@ -0,0 +1,120 @@
+"""Token buckets: lane priority, the interactive reserve and 429 back-off."""
+
+from __future__ import annotations
+
+import threading
+import time
+import types
+
+import pytest
+
+from api.sunsave import scheduler
+from api.sunsave.scheduler import RECOVERY, RESERVE, Bucket, QueueTimeout
+
+
+class Clock:
+    """Stands in for time.monotonic inside the scheduler."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(scheduler, "time", types.SimpleNamespace(monotonic=c))
+    return c
+
+
+def wait_for(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def advance(b: Bucket, clock: Clock, seconds: float) -> None:
+    clock.now += seconds
+    with b._cond:
+        b._cond.notify_all()
+
+
+def settle() -> None:
+    time.sleep(0.05)                    # let woken waiters look at the bucket
+
+
+def empty_bucket(rate=8.0, burst=4.0) -> Bucket:
+    b = Bucket(rate, burst)
+    b.tokens = 0.0
+    return b
+
+
+def start(b: Bucket, lane: str, granted: list) -> threading.Thread:
+    t = threading.Thread(target=lambda: (b.acquire(lane), granted.append(lane)), daemon=True)
+    t.start()
+    wait_for(lambda: b.queued[lane] == 1)
+    return t
+
+
+def test_lanes_are_served_in_priority_order(clock):
+    b, granted = empty_bucket(), []
+    threads = [start(b, "prefetch", granted), start(b, "batch", granted),
+               start(b, "interactive", granted)]
+
+    advance(b, clock, 0.125)                         # one token: the user's
+    wait_for(lambda: granted == ["interactive"])
+    advance(b, clock, 0.125)                         # one token, under the reserve
+    settle()
+    assert granted == ["interactive"]
+    advance(b, clock, 0.125)                         # two: batch goes before prefetch
+    wait_for(lambda: granted == ["interactive", "batch"])
+    advance(b, clock, 0.125)
+    wait_for(lambda: granted == ["interactive", "batch", "prefetch"])
+    for t in threads:
+        t.join(1)
+
+
+def test_reserve_is_kept_for_interactive(clock):
+    b = Bucket(8.0, 8.0)
+    floor = 1 + RESERVE * b.burst                    # 3 tokens
+    while b.tokens >= floor:
+        b.acquire("batch")
+    assert b.tokens == pytest.approx(floor - 1)
+    with pytest.raises(QueueTimeout):                # batch has to wait …
+        b.acquire("batch", timeout=0.0)
+    for _ in range(int(floor - 1)):                  # … users do not
+        assert b.acquire("interactive") == 0.0
+
+
+def test_throttle_pauses_and_halves_the_rate(clock):
+    b = Bucket(8.0, 4.0)
+    b.throttle(5.0)
+    assert b.rate == 4.0 and b.throttled == 1
+    granted = []
+    start(b, "interactive", granted)
+    advance(b, clock, 4.9)
+    settle()
+    assert granted == []                             # still paused, tokens or not
+    advance(b, clock, 0.2)
+    wait_for(lambda: granted == ["interactive"])
+    assert b.rate == pytest.approx(4.0 + RECOVERY * 8.0)   # climbing back
+
+
+def test_repeated_429s_bottom_out(clock):
+    b = Bucket(8.0, 4.0)
+    for _ in range(20):
+        b.throttle(1.0)
+    assert b.rate == pytest.approx(scheduler.MIN_RATE * 8.0)
+
+
+def test_throttled_only_touches_limited_hosts(monkeypatch):
+    monkeypatch.setattr(scheduler, "RATES", {"limited.test": (8.0, 4.0)})
+    monkeypatch.setattr(scheduler, "_buckets", {})
+    scheduler.throttled("limited.test", 0.0)
+    scheduler.throttled("open.test", 0.0)
+    assert scheduler.bucket("open.test") is None
+    assert scheduler.stats()["limited.test"]["throttled"] == 1
+    assert scheduler.acquire("open.test") == 0.0
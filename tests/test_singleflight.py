@@ -0,0 +1,77 @@
+"""Concurrent callers for one key share a single upstream call."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api.sunsave.singleflight import SingleFlight
+
+N = 8
+
+
+def wait_for(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_together(flight: SingleFlight, fn, key="k"):
+    """N callers of *key*; *fn* is held until every follower is waiting."""
+    release = threading.Event()
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(N) as pool:
+        futures = [pool.submit(flight.do, key, held) for _ in range(N)]
+        wait_for(lambda: flight.followers == N - 1)
+        release.set()
+        return futures
+
+
+def test_one_call_for_concurrent_callers():
+    flight, calls = SingleFlight("test"), []
+    futures = run_together(flight, lambda: calls.append(1) or "profile")
+    assert [f.result() for f in futures] == ["profile"] * N
+    assert len(calls) == 1
+    assert (flight.leaders, flight.followers) == (1, N - 1)
+    assert flight.in_flight() == 0
+
+
+def test_followers_get_the_leaders_exception():
+    flight, calls = SingleFlight("test"), []
+
+    def boom():
+        calls.append(1)
+        raise ConnectionError("upstream down")
+
+    futures = run_together(flight, boom)
+    for f in futures:
+        with pytest.raises(ConnectionError, match="upstream down"):
+            f.result()
+    assert len(calls) == 1
+
+
+def test_nothing_is_remembered_afterwards():
+    flight, calls = SingleFlight("test"), []
+    assert flight.do("k", lambda: calls.append(1) or 1) == 1
+    assert flight.do("k", lambda: calls.append(1) or 2) == 2     # a fresh call
+    assert len(calls) == 2 and (flight.leaders, flight.followers) == (2, 0)
+
+
+def test_distinct_keys_do_not_wait_on_each_other():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    with ThreadPoolExecutor(2) as pool:
+        slow = pool.submit(flight.do, "a", lambda: release.wait(5) and "a")
+        wait_for(lambda: flight.in_flight() == 1)
+        assert flight.do("b", lambda: "b") == "b"
+        release.set()
+        assert slow.result() == "a"
+    assert flight.followers == 0
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from api.sunsave.dispatch import dispatch_arrays
+from api.sunsave.sweep import parse_axis, sweep_arrays
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("5,10,13.5", [5, 10, 13.5]),
+    ("5:15:2.5", [5, 7.5, 10, 12.5, 15]),
+    ("0.9", [0.9]),
+    ("0.1:0.3:0.1", [0.1, 0.2, 0.3]),
+])
+def test_parse_axis(text, expected):
+    np.testing.assert_allclose(parse_axis(text), expected)
+
+
+@pytest.mark.parametrize("text", ["nan", "5,inf", "-inf,5", "0:inf:1", "0:10:nan",
+                                  "nan:10:1", "5:15:0", "1:1e9:1e-3"])
+def test_parse_axis_refuses(text):
+    with pytest.raises(ValueError):
+        parse_axis(text)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_sweep_matches_dispatch_everywhere(seed):
+    rng = np.random.default_rng(seed)
+    pv = np.clip(rng.normal(0.4, 0.6, 48), 0, None)
+    demand = rng.uniform(0.1, 1.2, 48)
+    prices = rng.uniform(0.05, 0.45, 48)
+    caps, pows, etas = [2.5, 5.0, 13.5], [0.5, 3.0], [0.81, 0.9, 1.0]
+
+    res = sweep_arrays(pv, prices, demand, caps, pows, etas)
+
+    for i, cap in enumerate(caps):
+        for j, pow_kw in enumerate(pows):
+            for k, eta in enumerate(etas):
+                one = dispatch_arrays(pv, prices, demand, cap, pow_kw, eta)
+                assert res["baseline_cost"] == pytest.approx(one["baseline_cost"])
+                for name in ("with_batt_cost", "money_saved", "kwh_shifted"):
+                    assert res[name][i, j, k] == pytest.approx(one[name], abs=1e-9), \
+                        (name, cap, pow_kw, eta)
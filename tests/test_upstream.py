@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from api.sunsave import upstream
+from api.sunsave.upstream import UpstreamError
+
+HOST = "upstream.test"                      # not rate limited by the scheduler
+URL = f"https://{HOST}/api/thing"
+
+
+class Scripted(BaseAdapter):
+    """Answers each send with the next scripted status, or raises it."""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        status, headers = step if isinstance(step, tuple) else (step, {})
+        r = requests.Response()
+        r.status_code = status
+        r.headers.update(headers)
+        r._content = b"{}"
+        r.url, r.request = request.url, request
+        return r
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Mount a :class:`Scripted` adapter for HOST; backoff sleeps are recorded."""
+    sleeps = []
+    monkeypatch.setattr(upstream, "time",
+                        SimpleNamespace(sleep=sleeps.append, perf_counter=time.perf_counter))
+    sess = upstream.session(HOST)
+
+    def mount(*script):
+        adapter = Scripted(script)
+        sess.mount(f"https://{HOST}", adapter)
+        return adapter
+
+    mount.sleeps = sleeps
+    yield mount
+    sess.adapters.pop(f"https://{HOST}", None)
+
+
+@pytest.mark.parametrize("failure", [503, 500, 429, requests.ConnectionError("reset"),
+                                     requests.Timeout("read timed out")])
+def test_transient_failures_are_retried(serve, failure):
+    adapter = serve(failure, failure, 200)
+    r = upstream.get(URL)
+    assert r.status_code == 200
+    assert adapter.sent == 3
+
+
+def test_backoff_grows_and_is_capped(serve, monkeypatch):
+    monkeypatch.setattr(upstream.random, "uniform", lambda lo, hi: hi)
+    serve(503, 503, 503, 503, 503, 503, 200)
+    upstream.get(URL, retries=6)
+    assert serve.sleeps == [0.25, 0.5, 1.0, 2.0, 4.0, 4.0]
+
+
+def test_retry_after_is_honoured(serve):
+    serve((503, {"Retry-After": "1.5"}), 200)
+    upstream.get(URL)
+    assert serve.sleeps == [1.5]
+
+
+@pytest.mark.parametrize("status", [400, 404, 422])
+def test_client_errors_are_not_retried(serve, status):
+    adapter = serve(status, 200)
+    with pytest.raises(UpstreamError) as e:
+        upstream.get(URL)
+    assert adapter.sent == 1
+    assert e.value.status == status
+    assert e.value.host == HOST
+    assert not serve.sleeps
+
+
+def test_last_status_is_reported(serve):
+    adapter = serve(503, 500, 502)
+    with pytest.raises(UpstreamError) as e:
+        upstream.get(URL)
+    assert adapter.sent == upstream.RETRIES + 1
+    assert e.value.status == 502
+
+
+def test_connection_failure_has_no_status(serve):
+    serve(*[requests.ConnectionError("refused")] * 3)
+    with pytest.raises(UpstreamError) as e:
+        upstream.get(URL)
+    assert e.value.status is None
+    assert isinstance(e.value.__cause__, requests.ConnectionError)
+
+
+def test_counters(serve):
+    before = upstream.stats().get(HOST, {"requests": 0, "errors": 0, "retries": 0})
+    serve(503, 200)
+    upstream.get(URL)
+    serve(404)
+    with pytest.raises(UpstreamError):
+        upstream.get(URL)
+    after = upstream.stats()[HOST]
+    assert after["requests"] - before["requests"] == 3
+    assert after["retries"] - before["retries"] == 1
+    assert after["errors"] - before["errors"] == 1